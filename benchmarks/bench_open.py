@@ -0,0 +1,65 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Time opening a binary log (indexing it and working out its clock), and
+opening it again from its index sidecar where the checkout has them.  Works
+with --tree on older checkouts.
+"""
+
+import inspect
+import os
+
+import common
+
+p = common.parser(__doc__)
+p.add_argument(
+        '-u', '--units',
+        action='store_true',
+        help="Give the made-up log an FMTU marking IMU.I as an instance "
+             "field, as real logs have",
+    )
+
+FMTU = (129, 'QBNN', 'TimeUS,FmtType,UnitIds,MultIds', 'QB16s16s')
+
+
+def write_with_units(filename, n):
+    import logfiles
+    formats = dict(logfiles.FORMATS, FMTU=FMTU)
+    msgs = [('FMTU', (0, logfiles.FORMATS['IMU'][0], 's#EEEo', 'F-0000'))]
+    logfiles.write_bin_messages(filename, formats,
+            msgs + logfiles.messages(n))
+
+
+def main():
+    args = p.parse_args()
+    filename = common.setup(args, write_with_units if args.units else None)
+    import src.logutils.DFReader as dfr
+
+    def open_log(use_sidecar=False):
+        if use_sidecar:
+            return dfr.DFReader_binary(filename, use_sidecar=True)
+        return dfr.DFReader_binary(filename)
+
+    taken, log = common.best_of(args.repeat, open_log)
+    common.report("open ({} messages)".format(sum(log.counts)), taken)
+
+    params = inspect.signature(dfr.DFReader_binary).parameters
+    if 'use_sidecar' not in params:
+        print("(no index sidecars in this checkout)")
+        return
+    import src.logutils.tbindex as tbindex
+    sidecar = tbindex.sidecar_path(filename)
+    existed = os.path.exists(sidecar)
+    # the first open writes the sidecar, the rest read it
+    open_log(True)
+    try:
+        taken, _ = common.best_of(args.repeat, open_log, True)
+        common.report("open from index sidecar", taken)
+    finally:
+        if not existed and os.path.exists(sidecar):
+            os.remove(sidecar)
+
+
+if __name__ == '__main__':
+    main()
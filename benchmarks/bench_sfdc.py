@@ -0,0 +1,90 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Time Same-file data comparison, with every statistic turned on: the stats
+alone worked out a point at a time and vectorised, then the whole plugin on
+one log reading messages and reading columns.
+"""
+
+import common
+
+FLAGS = {'mindiff': True, 'maxdiff': True, 'avgdiff': True, 'stddev': True,
+        'rmsdiff': True, 'r2': True, 'avg-avg': True, 'rawdiff': False}
+
+p = common.parser(__doc__)
+p.add_argument(
+        '-a', '--line-a',
+        type=str,
+        default='IMU.GyrX',
+        help="First line to compare",
+    )
+p.add_argument(
+        '-b', '--line-b',
+        type=str,
+        default='IMU.GyrY',
+        help="Second line to compare",
+    )
+p.add_argument(
+        '-m', '--mode',
+        type=int,
+        default=1,
+        help="Alignment: 0 most recent, 1 interpolated, 2 nearest",
+    )
+
+
+def main():
+    args = p.parse_args()
+    filename = common.setup(args)
+    import numpy as np
+    import batch
+    import src.plugins.sf_datacomp as sf_datacomp
+
+    def plugin(processor, vectorised, cls=sf_datacomp.SFDataCompPlugin):
+        plug = cls(batch.FakeFactory(), processor, False, True, args.line_a,
+                args.line_b, args.mode, False, dict(FLAGS))
+        plug.batch = vectorised
+        return plug
+
+    class MessagesOnly(sf_datacomp.SFDataCompPlugin):
+        # never reads the log as columns
+        def run_parsedlog(self, dflog):
+            pass
+
+    def end_to_end(vectorised, cls=sf_datacomp.SFDataCompPlugin):
+        processor = batch.FakeProcessor()
+        plug = plugin(processor, vectorised, cls)
+        batch.run_plugins(filename, [plug], processor)
+        return plug._n_points
+
+    def rolling(A, B):
+        plug = plugin(batch.FakeProcessor(), False)
+        for fieldA, fieldB in zip(A, B):
+            plug._rolling_stats(fieldB, fieldA)
+        return plug.data
+
+    def vectorised(A, B):
+        plug = plugin(batch.FakeProcessor(), True)
+        plug._batch_stats(np.asarray(B), np.asarray(A))
+        return plug.data
+
+    taken, points = common.best_of(args.repeat, end_to_end, True)
+    common.report("end to end, columns ({} points)".format(points), taken)
+    taken, points = common.best_of(args.repeat, end_to_end, True,
+            MessagesOnly)
+    common.report("end to end, messages, vectorised", taken)
+    taken, points = common.best_of(args.repeat, end_to_end, False,
+            MessagesOnly)
+    common.report("end to end, messages, point at a time", taken)
+
+    rng = np.random.default_rng(1)
+    A = rng.normal(size=points).tolist()
+    B = rng.normal(size=points).tolist()
+    taken, _ = common.best_of(args.repeat, rolling, A, B)
+    common.report("stats alone, point at a time", taken)
+    taken, _ = common.best_of(args.repeat, vectorised, A, B)
+    common.report("stats alone, vectorised", taken)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Shared bits for the benchmark scripts.
+
+Each script times some part of TrashBin on a log given on the command line,
+or on a made-up one (see tests/logfiles.py) of a given size.  --tree points
+the script at another checkout, so that an older version can be timed on the
+same log for comparison.
+"""
+
+import argparse
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parser(description):
+    p = argparse.ArgumentParser(description=description)
+    p.add_argument(
+            'log',
+            type=str,
+            nargs='?',
+            help="Log to time on (default: a made-up binary log)",
+        )
+    p.add_argument(
+            '-n', '--samples',
+            type=int,
+            default=400000,
+            help="IMU samples in the made-up log",
+        )
+    p.add_argument(
+            '-r', '--repeat',
+            type=int,
+            default=3,
+            help="Times to run each measurement; the best is reported",
+        )
+    p.add_argument(
+            '-t', '--tree',
+            type=str,
+            default=ROOT,
+            help="Checkout of TrashBin to time (default: this one)",
+        )
+    return p
+
+
+def setup(args, write=None):
+    """
+    Make the chosen checkout importable, headless, and return the log to
+    time on, writing out the made-up one if none was given.  write(filename,
+    n), if given, writes it instead of logfiles.write_bin.
+    """
+    tree = os.path.abspath(args.tree)
+    sys.path.insert(0, tree)
+    sys.path.insert(1, os.path.join(ROOT, 'tests'))
+    from src.tkstubs import tb_override_tkinter
+    tb_override_tkinter('headless')
+    os.chdir(tree)
+    if args.log is not None:
+        return args.log
+    import logfiles
+    directory = tempfile.mkdtemp(prefix='tb-bench-')
+    atexit.register(shutil.rmtree, directory, True)
+    filename = os.path.join(directory,
+            'synthetic-{}.bin'.format(args.samples))
+    (write or logfiles.write_bin)(filename, args.samples)
+    print("Made-up log: {} ({:.1f} MB)".format(filename,
+        os.path.getsize(filename) / 1e6))
+    return filename
+
+
+def best_of(repeat, func, *args):
+    """
+    Run func repeat times, returning the quickest time taken and the result
+    of the last run.
+    """
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        taken = time.perf_counter() - start
+        if best is None or taken < best:
+            best = taken
+    return best, result
+
+
+def report(label, seconds):
+    print("{:40s} {:8.3f} s".format(label, seconds))
@@ -18,6 +18,7 @@ import src.plugins._plugin_autodetect as _pad
 import src.gui.pluginloader as pluginloader
 import src.config.config as config
 import src.gui.configui as configui
+import src.processor.events as events
 
 
 class MainPanelUI(object):
@@ -35,8 +36,25 @@ class MainPanelUI(object):
 
     def start(self):
         self.spawn_ui()
+        self.root.after(int(events.FRAME_INTERVAL * 1000), self.poll_events)
         self.root.mainloop()
 
+    def poll_events(self):
+        """
+        Pick up whatever the processor has reported since the last frame.
+        Runs on the Tk thread, off a timer, so this is the only place the
+        progress bar gets touched while processing.
+        """
+        progress, others = self.mainexec.events.drain()
+        if progress:
+            self.notify_work_done(progress)
+        for kind, value in others:
+            if kind == events.EVENT_WORK_FOUND:
+                self.pbar['maximum'] += value
+            elif kind == events.EVENT_DONE:
+                self.notify_done()
+        self.root.after(int(events.FRAME_INTERVAL * 1000), self.poll_events)
+
     @property
     def config(self):
         return self.mainexec.mastercfg
@@ -259,6 +277,8 @@ class MainPanelUI(object):
                 print("Starting processor")
             self.pbar['maximum'] = self.mainexec.processor.max_work
             self.pbar_var.set(0)
+            # anything left over from a stopped run mustn't count towards this
+            self.mainexec.events.clear()
             self.btn_go.config(text="Stop")
             self.mainexec.go()
         else:
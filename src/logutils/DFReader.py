@@ -12,21 +12,37 @@ from builtins import range
 from builtins import object
 
 import array
+import atexit
+import bisect
+import collections
+import copy
+import heapq
+import itertools
 import math
+import multiprocessing
 import sys
 import os
 import mmap
 import platform
+import re
 
 import struct
 import sys
+import threading
 from . import mavutil
+from . import tbindex
 
 try:
     long        # Python 2 has long
 except NameError:
     long = int  # But Python 3 does not
 
+try:
+    import numpy as np
+except ImportError:
+    # only needed for columnar access (DFReader_binary.get_columns)
+    np = None
+
 FORMAT_TO_STRUCT = {
     "a": ("64s", None, str),
     "b": ("b", None, int),
@@ -50,6 +66,43 @@ FORMAT_TO_STRUCT = {
     "Q": ("Q", None, long),  # Backward compat
     }
 
+# numpy equivalents of FORMAT_TO_STRUCT, for decoding whole columns at once.
+# 'a' is unpacked as 64 bytes but then turned into 32 int16s
+FORMAT_TO_NUMPY = {
+    "a": ("<i2", (32,)),
+    "b": "i1",
+    "B": "u1",
+    "h": "<i2",
+    "H": "<u2",
+    "i": "<i4",
+    "I": "<u4",
+    "f": "<f4",
+    "n": "S4",
+    "N": "S16",
+    "Z": "S64",
+    "c": "<i2",
+    "C": "<u2",
+    "e": "<i4",
+    "E": "<u4",
+    "L": "<i4",
+    "d": "<f8",
+    "M": "i1",
+    "q": "<i8",
+    "Q": "<u8",
+    }
+
+# roughly how much of a log each worker process parses at a time in
+# DFReader_binary.parse_chunked
+CHUNK_BYTES = 1 << 22
+
+# message types that DFReader keeps track of flight modes, params etc from
+_STATE_TYPES = frozenset(['MODE', 'MSG', 'PARM', 'STAT'])
+
+# how much of a text log DFReader_text.iter_messages reads at a time, and the
+# whitespace bytes.rstrip() takes off the end of a line
+TEXT_BLOCK_BYTES = 1 << 20
+_TEXT_WHITESPACE = ' \t\n\r\x0b\x0c'
+
 def u_ord(c):
 	return ord(c) if sys.version_info.major < 3 else c
 
@@ -101,10 +154,49 @@ class DFFormat(object):
             if self.msg_fmts[i] == 'a':
                 self.a_indexes.append(i)
 
+        # value converters for each field, with and without multipliers, and
+        # the compiled decoders made from them
+        self._converters = {}
+        self._decoders = {}
+
         if oldfmt is not None:
             self.set_unit_ids(oldfmt.unit_ids)
             self.set_mult_ids(oldfmt.mult_ids)
 
+    def converters(self, apply_multiplier):
+        '''get a tuple of functions, one per field, turning a raw unpacked
+        element into the value DFMessage gives for that field'''
+        try:
+            return self._converters[apply_multiplier]
+        except KeyError:
+            pass
+        convs = tuple([_value_converter(self, i, apply_multiplier)
+                       for i in range(len(self.msg_fmts))])
+        self._converters[apply_multiplier] = convs
+        return convs
+
+    def __getstate__(self):
+        # the converters and decoders are closures, which can't be pickled;
+        # they're just made again when they're needed
+        state = self.__dict__.copy()
+        state['_converters'] = {}
+        state['_decoders'] = {}
+        return state
+
+    def decoder(self, apply_multiplier, native=False):
+        '''get a function turning all of a message's raw elements into the
+        list of its field values in one go.  native means the elements are
+        exactly as struct unpacked them from a binary log, so most fields can
+        be taken as they are'''
+        key = (apply_multiplier, native)
+        try:
+            return self._decoders[key]
+        except KeyError:
+            pass
+        decode = _compile_decoder(self, apply_multiplier, native)
+        self._decoders[key] = decode
+        return decode
+
     def set_unit_ids(self, unit_ids):
         '''set unit IDs string from FMTU'''
         if unit_ids is None:
@@ -157,20 +249,166 @@ def null_term(str):
         str = str[:idx]
     return str
 
+def _value_converter(fmt, i, apply_multiplier):
+    '''make a function turning the raw element for field i of a format into
+    its value: strings decoded and cut at the first null, multipliers
+    applied'''
+    fchar = fmt.msg_fmts[i]
+    mtype = fmt.msg_types[i]
+    mult = fmt.msg_mults[i]
+    if not apply_multiplier:
+        mult = None
+
+    if mtype == str:
+        def conv(v):
+            if isinstance(v, bytes):
+                v = v.decode("utf-8")
+            return null_term(str(v))
+        return conv
+    if fchar == 'a':
+        def conv(v):
+            if isinstance(v, bytes):
+                v = array.array('h', v)
+            return v
+        return conv
+    if fchar == 'M' and not apply_multiplier:
+        def conv(v):
+            if isinstance(v, bytes):
+                v = v.decode("utf-8")
+            return v
+        return conv
+    if mult is not None:
+        return lambda v: mtype(v) * mult
+    return mtype
+
+def _compile_decoder(fmt, apply_multiplier, native):
+    '''build a function decoding every field of a format at once, as a
+    single list expression over the elements.  the generic one calls each
+    field's converter; the native one inlines what the converter would do to
+    a value fresh from struct'''
+    namespace = {'_array': array.array}
+    exprs = []
+    for i, conv in enumerate(fmt.converters(apply_multiplier)):
+        e = 'e[%u]' % i
+        if not native:
+            namespace['_c%u' % i] = conv
+            exprs.append('_c%u(%s)' % (i, e))
+            continue
+        fchar = fmt.msg_fmts[i]
+        mult = fmt.msg_mults[i]
+        if fmt.msg_types[i] == str:
+            exprs.append("%s.decode('utf-8').partition('\\0')[0]" % e)
+        elif fchar == 'a':
+            exprs.append("_array('h', %s)" % e)
+        elif mult is not None and apply_multiplier:
+            exprs.append('%s * %r' % (e, mult))
+        elif fmt.msg_types[i] == float and fchar not in 'fd':
+            # integers in the file, floats once decoded
+            exprs.append('float(%s)' % e)
+        else:
+            exprs.append(e)
+    source = 'def decode(e):\n    return [%s]\n' % ', '.join(exprs)
+    exec(compile(source, '<decoder %s>' % fmt.name, 'exec'), namespace)
+    return namespace['decode']
+
+# marks a field of a DFMessage that hasn't been decoded yet
+_UNDECODED = object()
+
+_set_slot = object.__setattr__
+
+# DFMessage subclasses with a property for each field, by message layout
+_message_classes = {}
+
+def _field_getter(i, conv, raw_conv):
+    '''make the function reading field i of a message: conv decodes it with
+    multipliers applied, raw_conv without'''
+    def get(self):
+        values = self._values
+        if values is not None:
+            v = values[i]
+            if v is not _UNDECODED:
+                return v
+        elements = self._raw
+        if elements is None:
+            elements = self._elements
+        e = elements[i]
+        c = conv if self._apply_multiplier else raw_conv
+        if type(e) is c:
+            # a plain number that's already what it should be; nothing
+            # worth keeping
+            return e
+        if values is None:
+            values = [_UNDECODED] * len(elements)
+            _set_slot(self, '_values', values)
+        v = values[i] = c(e)
+        return v
+    return get
 
 class DFMessage(object):
+    '''one log message.  elements are the raw values as unpacked (a tuple,
+    or a list once any field has been changed); fields are decoded from them
+    the first time they're read, and kept if that took any work.
+
+    each message is really an instance of a subclass made for its format,
+    with the fields as properties, as going through __getattr__ costs an
+    exception per field read.
+
+    a message read from a binary log can also be compacted, dropping its
+    elements until they're next needed, when they're unpacked again from
+    the file'''
+    __slots__ = ('fmt', '_raw', '_apply_multiplier', '_parent',
+                 '_offset', '_dirty', '_timestamp', '_values')
+
+    def __new__(cls, fmt=None, *args):
+        if cls is DFMessage and fmt is not None:
+            cls = _message_class(fmt)
+        return object.__new__(cls)
+
     def __init__(self, fmt, elements, apply_multiplier, parent):
-        self.fmt = fmt
-        self._elements = elements
-        self._apply_multiplier = apply_multiplier
-        self._fieldnames = fmt.columns
-        self._parent = parent
+        # set straight into the slots, skipping the field check in
+        # __setattr__
+        _set_slot(self, 'fmt', fmt)
+        _set_slot(self, '_raw', elements)
+        _set_slot(self, '_apply_multiplier', apply_multiplier)
+        _set_slot(self, '_parent', parent)
+        # where the message starts in the source file (binary logs only), and
+        # whether any of its fields have been changed since it was read
+        _set_slot(self, '_offset', None)
+        _set_slot(self, '_dirty', False)
+        _set_slot(self, '_values', None)
+
+    @property
+    def _fieldnames(self):
+        return self.fmt.columns
+
+    @property
+    def _elements(self):
+        elements = self._raw
+        if elements is None:
+            elements = self._parent._unpack_at(self._offset, self.fmt)
+            _set_slot(self, '_raw', elements)
+        return elements
+
+    def compact(self):
+        '''drop the raw elements if they can be read back from the file,
+        for messages that are being kept around'''
+        if self._offset is not None and not self._dirty:
+            _set_slot(self, '_raw', None)
+
+    def _decode_all(self):
+        '''get the value of every field, in format order, decoded at once by
+        the format's compiled decoder'''
+        native = self._offset is not None and not self._dirty
+        decode = self.fmt.decoder(self._apply_multiplier, native)
+        return decode(self._elements)
 
     def to_dict(self):
         d = {'mavpackettype': self.fmt.name}
 
+        values = self._decode_all()
+        colhash = self.fmt.colhash
         for field in self._fieldnames:
-            d[field] = self.__getattr__(field)
+            d[field] = values[colhash[field]]
 
         return d
 
@@ -180,29 +418,21 @@ class DFMessage(object):
             i = self.fmt.colhash[field]
         except Exception:
             raise AttributeError(field)
-        if isinstance(self._elements[i], bytes):
-            v = self._elements[i].decode("utf-8")
-        else:
-            v = self._elements[i]
-        if self.fmt.format[i] == 'a':
-            pass
-        elif self.fmt.format[i] != 'M' or self._apply_multiplier:
-            v = self.fmt.msg_types[i](v)
-        if self.fmt.msg_types[i] == str:
-            v = null_term(v)
-        if self.fmt.msg_mults[i] is not None and self._apply_multiplier:
-            v *= self.fmt.msg_mults[i]
-        return v
+        return self._getters[i](self)
 
     def __setattr__(self, field, value):
         '''override field setter'''
         if not field[0].isupper() or not field in self.fmt.colhash:
-            super(DFMessage,self).__setattr__(field, value)
+            _set_slot(self, field, value)
         else:
             i = self.fmt.colhash[field]
             if self.fmt.msg_mults[i] is not None and self._apply_multiplier:
                 value /= self.fmt.msg_mults[i]
+            if not isinstance(self._elements, list):
+                _set_slot(self, '_raw', list(self._elements))
             self._elements[i] = value
+            _set_slot(self, '_dirty', True)
+            _set_slot(self, '_values', None)
 
     def get_type(self):
         return self.fmt.name
@@ -210,8 +440,10 @@ class DFMessage(object):
     def __str__(self):
         ret = "%s {" % self.fmt.name
         col_count = 0
+        values = self._decode_all()
+        colhash = self.fmt.colhash
         for c in self.fmt.columns:
-            val = self.__getattr__(c)
+            val = values[colhash[c]]
             if isinstance(val, float) and math.isnan(val):
                 # quiet nans have more non-zero values:
                 noisy_nan = "\x7f\xf8\x00\x00\x00\x00\x00\x00"
@@ -227,6 +459,8 @@ class DFMessage(object):
         '''create a binary message buffer for a message'''
         values = []
         is_py2 = sys.version_info < (3,0)
+        decoded = self._decode_all()
+        colhash = self.fmt.colhash
         for i in range(len(self.fmt.columns)):
             if i >= len(self.fmt.msg_mults):
                 continue
@@ -234,7 +468,7 @@ class DFMessage(object):
             name = self.fmt.columns[i]
             if name == 'Mode' and 'ModeNum' in self.fmt.columns:
                 name = 'ModeNum'
-            v = self.__getattr__(name)
+            v = decoded[colhash[name]]
             if is_py2:
                 if isinstance(v,unicode): # NOQA
                     v = str(v)
@@ -242,7 +476,7 @@ class DFMessage(object):
                 if isinstance(v,str):
                     v = bytes(v,'ascii')
             if isinstance(v, array.array):
-                v = v.tostring()
+                v = v.tobytes()
             if mul is not None:
                 v /= mul
                 v = int(round(v))
@@ -268,9 +502,35 @@ class DFMessage(object):
         return self._parent.messages[k]
 
 
+def _message_class(fmt):
+    '''get the DFMessage subclass for messages in the given format'''
+    key = (fmt.name, fmt.format, tuple(fmt.columns))
+    try:
+        return _message_classes[key]
+    except KeyError:
+        pass
+    getters = tuple([_field_getter(i, conv, raw_conv) for i, (conv, raw_conv)
+                     in enumerate(zip(fmt.converters(True),
+                                      fmt.converters(False)))])
+    attrs = {'__slots__': (), '_getters': getters}
+    for col, i in fmt.colhash.items():
+        # anything clashing with DFMessage's own attributes stays hidden, as
+        # it always has been
+        if i < len(getters) and not hasattr(DFMessage, col):
+            attrs[col] = property(getters[i])
+    cls = type('DFMessage_' + fmt.name, (DFMessage,), attrs)
+    _message_classes[key] = cls
+    return cls
+
+
 class DFReaderClock(object):
     '''base class for all the different ways we count time in logs'''
 
+    # the attributes that carry over from one message to the next, when
+    # that's all there is to a clock's state.  None if its state depends on
+    # the whole log so far
+    carried = None
+
     def __init__(self):
         self.set_timebase(0)
         self.timestamp = 0
@@ -292,6 +552,8 @@ class DFReaderClock(object):
 
 class DFReaderClock_usec(DFReaderClock):
     '''DFReaderClock_usec - use microsecond timestamps from messages'''
+    carried = ('timestamp',)
+
     def __init__(self):
         DFReaderClock.__init__(self)
 
@@ -335,6 +597,8 @@ class DFReaderClock_usec(DFReaderClock):
 class DFReaderClock_msec(DFReaderClock):
     '''DFReaderClock_msec - a format where many messages have TimeMS in
     their formats, and GPS messages have a "T" field giving msecs'''
+    carried = ('timestamp',)
+
     def find_time_base(self, gps, first_ms_stamp):
         '''work out time basis for the log - new style'''
         t = self._gpsTimeToTime(gps.Week, gps.TimeMS)
@@ -354,6 +618,8 @@ class DFReaderClock_msec(DFReaderClock):
 class DFReaderClock_px4(DFReaderClock):
     '''DFReaderClock_px4 - a format where a starting time is explicitly
     given in a message'''
+    carried = ('timestamp', 'px4_timebase')
+
     def __init__(self):
         DFReaderClock.__init__(self)
         self.px4_timebase = 0
@@ -514,7 +780,8 @@ class DFReader(object):
 
         have_good_clock = False
         while True:
-            m = self.recv_msg()
+            # not recv_msg: these shouldn't end up in all_messages
+            m = self._parse_next()
             if m is None:
                 break
 
@@ -595,20 +862,45 @@ class DFReader(object):
     def recv_msg(self):
         message = self._parse_next()
         if not message is None:
+            message.compact()
             self.all_messages.append(message)
         return message
 
+    def iter_messages(self, types=None):
+        '''iterate over the remaining messages in the log without keeping
+        them in all_messages.  types is an optional set of message names;
+        messages of any other type are skipped'''
+        while True:
+            message = self._parse_next()
+            if message is None:
+                return
+            if types is not None and not message.get_type() in types:
+                continue
+            yield message
+
+    def match_types(self, patterns):
+        '''return the set of message names in this log matching any of the
+        given names or regexes (which must match the whole name)'''
+        regexes = [re.compile(p) for p in patterns]
+        names = set([fmt.name for fmt in self.formats.values()])
+        return set([n for n in names
+                    if any(r.fullmatch(n) for r in regexes)])
+
     def _add_msg(self, m):
         '''add a new message'''
+        self._note_msg(m)
+        if self.clock:
+            self.clock.message_arrived(m)
+        self._set_time(m)
+
+    def _note_msg(self, m):
+        '''keep track of the latest messages, params and flight mode'''
         type = m.get_type()
         self.messages[type] = m
         if m.fmt.instance_field is not None:
             i = m.__getattr__(m.fmt.instance_field)
             self.messages["%s[%s]" % (type, str(i))] = m
 
-        if self.clock:
-            self.clock.message_arrived(m)
-
         if type == 'MSG' and hasattr(m,'Message'):
             if m.Message.find("Rover") != -1:
                 self.mav_type = mavutil.mavlink.MAV_TYPE_GROUND_ROVER
@@ -635,7 +927,6 @@ class DFReader(object):
             self.flightmode = mavutil.mode_string_px4(m.MainState)
         if type == 'PARM' and getattr(m, 'Name', None) is not None:
             self.params[m.Name] = m.Value
-        self._set_time(m)
 
     def recv_match(self, condition=None, type=None, blocking=False):
         '''recv the next message that matches the given condition
@@ -696,9 +987,41 @@ class DFReader(object):
         return self._flightmodes
 
 class DFReader_binary(DFReader):
-    '''parse a binary dataflash file'''
-    def __init__(self, filename, zero_time_base=False, progress_callback=None):
+    '''parse a binary dataflash file.  if use_sidecar is set, the index
+    built while opening the file is kept in a sidecar file next to it, and
+    loaded from there the next time (see tbindex.py).  if parse_workers is
+    more than 1, iter_messages spreads the decoding over that many
+    processes (see parse_chunked)'''
+    def __init__(self, filename, zero_time_base=False, progress_callback=None,
+                 use_sidecar=False, parse_workers=0):
         DFReader.__init__(self)
+        self.filename = filename
+        self.parse_workers = parse_workers
+        self._map_file(filename)
+        self.formats = {
+            0x80: DFFormat(0x80,
+                           'FMT',
+                           89,
+                           'BBnNZ',
+                           "Type,Length,Name,Format,Columns")
+        }
+        self._zero_time_base = zero_time_base
+        self.prev_type = None
+        index_options = {'zero_time_base': bool(zero_time_base)}
+        if use_sidecar:
+            self._rewind()
+            if tbindex.load_index(self, filename, index_options):
+                return
+        self._rewind()
+        self.init_arrays(progress_callback)
+        self.init_clock()
+        self.prev_type = None
+        self._rewind()
+        if use_sidecar:
+            tbindex.save_index(self, filename, index_options)
+
+    def _map_file(self, filename):
+        '''open the log and map it into memory'''
         # read the whole file into memory for simplicity
         self.filehandle = open(filename, 'r')
         self.filehandle.seek(0, 2)
@@ -715,19 +1038,6 @@ class DFReader_binary(DFReader):
         if sys.version_info.major < 3:
             self.HEAD1 = chr(self.HEAD1)
             self.HEAD2 = chr(self.HEAD2)
-        self.formats = {
-            0x80: DFFormat(0x80,
-                           'FMT',
-                           89,
-                           'BBnNZ',
-                           "Type,Length,Name,Format,Columns")
-        }
-        self._zero_time_base = zero_time_base
-        self.prev_type = None
-        self.init_clock()
-        self.prev_type = None
-        self._rewind()
-        self.init_arrays(progress_callback)
 
     def _rewind(self):
         '''rewind to start of log'''
@@ -742,15 +1052,36 @@ class DFReader_binary(DFReader):
         self._rewind()
 
     def init_arrays(self, progress_callback=None):
-        '''initialise arrays for fast recv_match()'''
+        '''initialise arrays for fast recv_match().  the offsets of each
+        message type are kept in an array('Q'), at 8 bytes a message'''
         self.offsets = []
         self.counts = []
         self._count = 0
         self.name_to_id = {}
         self.id_to_name = {}
         for i in range(256):
-            self.offsets.append([])
+            self.offsets.append(array.array('Q'))
             self.counts.append(0)
+
+        if np is None or not self._init_arrays_numpy():
+            self._init_arrays_python(progress_callback)
+        elif progress_callback is not None:
+            progress_callback(100)
+
+        for i in range(256):
+            self._count += self.counts[i]
+
+        # the vehicle type comes from the first MSG, which is the only
+        # message that needs decoding here
+        if 'MSG' in self.name_to_id:
+            msg_offsets = self.offsets[self.name_to_id['MSG']]
+            if len(msg_offsets) > 0:
+                self.offset = msg_offsets[0]
+                self._parse_next()
+        self.offset = 0
+
+    def _init_arrays_python(self, progress_callback=None):
+        '''build the index one message at a time'''
         fmt_type = 0x80
         fmtu_type = None
         ofs = 0
@@ -770,7 +1101,6 @@ class DFReader_binary(DFReader):
                 ofs += 1
                 continue
             mtype = u_ord(hdr[2])
-            self.offsets[mtype].append(ofs)
 
             if lengths[mtype] == -1:
                 if not mtype in self.formats:
@@ -778,47 +1108,17 @@ class DFReader_binary(DFReader):
                         print("unknown msg type 0x%02x (%u) at %d" % (mtype, mtype, ofs),
                               file=sys.stderr)
                     break
-                self.offset = ofs
-                self._parse_next()
                 fmt = self.formats[mtype]
                 lengths[mtype] = fmt.len
-            elif self.formats[mtype].instance_field is not None:
-                self._parse_next()
 
+            self.offsets[mtype].append(ofs)
             self.counts[mtype] += 1
             mlen = lengths[mtype]
 
-            if mtype == fmt_type:
-                body = self.data_map[ofs+3:ofs+mlen]
-                if len(body)+3 < mlen:
+            if mtype == fmt_type or (fmtu_type is not None and mtype == fmtu_type):
+                fmtu_type, ok = self._index_format_msg(ofs, mtype, mlen, fmtu_type)
+                if not ok:
                     break
-                fmt = self.formats[mtype]
-                elements = list(struct.unpack(fmt.msg_struct, body))
-                ftype = elements[0]
-                mfmt = DFFormat(
-                    ftype,
-                    null_term(elements[2]), elements[1],
-                    null_term(elements[3]), null_term(elements[4]),
-                    oldfmt=self.formats.get(ftype,None))
-                self.formats[ftype] = mfmt
-                self.name_to_id[mfmt.name] = mfmt.type
-                self.id_to_name[mfmt.type] = mfmt.name
-                if mfmt.name == 'FMTU':
-                    fmtu_type = mfmt.type
-
-            if fmtu_type is not None and mtype == fmtu_type:
-                fmt = self.formats[mtype]
-                body = self.data_map[ofs+3:ofs+mlen]
-                if len(body)+3 < mlen:
-                    break
-                elements = list(struct.unpack(fmt.msg_struct, body))
-                ftype = int(elements[1])
-                if ftype in self.formats:
-                    fmt2 = self.formats[ftype]
-                    if 'UnitIds' in fmt.colhash:
-                        fmt2.set_unit_ids(null_term(elements[fmt.colhash['UnitIds']]))
-                    if 'MultIds' in fmt.colhash:
-                        fmt2.set_mult_ids(null_term(elements[fmt.colhash['MultIds']]))
 
             ofs += mlen
             if progress_callback is not None:
@@ -827,9 +1127,265 @@ class DFReader_binary(DFReader):
                     progress_callback(new_pct)
                     pct = new_pct
 
-        for i in range(256):
-            self._count += self.counts[i]
-        self.offset = 0
+    def _index_format_msg(self, ofs, mtype, mlen, fmtu_type):
+        '''take in a FMT or FMTU message found while building the index.
+        returns the (possibly newly found) FMTU type, and False if the
+        message runs off the end of the log'''
+        body = self.data_map[ofs+3:ofs+mlen]
+        if len(body)+3 < mlen:
+            return fmtu_type, False
+        fmt = self.formats[mtype]
+        elements = list(struct.unpack(fmt.msg_struct, body))
+        if mtype == 0x80:
+            ftype = elements[0]
+            mfmt = DFFormat(
+                ftype,
+                null_term(elements[2]), elements[1],
+                null_term(elements[3]), null_term(elements[4]),
+                oldfmt=self.formats.get(ftype,None))
+            self.formats[ftype] = mfmt
+            self.name_to_id[mfmt.name] = mfmt.type
+            self.id_to_name[mfmt.type] = mfmt.name
+            if mfmt.name == 'FMTU':
+                fmtu_type = mfmt.type
+        else:
+            ftype = int(elements[1])
+            if ftype in self.formats:
+                fmt2 = self.formats[ftype]
+                if 'UnitIds' in fmt.colhash:
+                    fmt2.set_unit_ids(null_term(elements[fmt.colhash['UnitIds']]))
+                if 'MultIds' in fmt.colhash:
+                    fmt2.set_mult_ids(null_term(elements[fmt.colhash['MultIds']]))
+        return fmtu_type, True
+
+    def _init_arrays_numpy(self):
+        '''build the index with numpy: find every possible header in the
+        file at once, and follow the chain of message lengths through them,
+        only stepping through one message at a time where that chain breaks
+        (bad bytes, or a header turning up inside another message).  returns
+        False, having changed nothing, if the formats in the log are too odd
+        for this (a type being redefined with a new length, say); the python
+        version is used then'''
+        n = self.data_len
+        if n < 4:
+            return False
+        data = np.frombuffer(self.data_map, dtype=np.uint8)
+        # every possible message start, leaving the same 3 bytes at the end
+        # as the python version
+        cands = np.flatnonzero(data[:-3] == 0xA3)
+        cands = cands[data[cands + 1] == 0x95]
+        types = data[cands + 2]
+        fmt_len = self.formats[0x80].len
+
+        # guess each type's length from everything that looks like a FMT
+        # message, then check that against the FMT messages actually found
+        # in the chain.  headers inside other messages are rare enough that
+        # this settles straight away, bar a few false FMTs
+        fmt_cands = cands[(types == 0x80) & (cands + 4 < n)]
+        guess = np.full(256, -1, dtype=np.int64)
+        # on repeats, the first definition wins
+        guess[data[fmt_cands + 3][::-1]] = data[fmt_cands + 4][::-1]
+        guess[guess < 3] = -1
+        guess[0x80] = fmt_len
+
+        for attempt in range(4):
+            chain = self._follow_chain(data, cands, types, guess)
+            chain_ofs = cands[chain]
+            chain_types = types[chain]
+            fmt_ofs = chain_ofs[(chain_types == 0x80) &
+                                (chain_ofs + fmt_len <= n)]
+            def_types = data[fmt_ofs + 3]
+            def_lens = data[fmt_ofs + 4].astype(np.int64)
+            lengths = np.full(256, -1, dtype=np.int64)
+            lengths[def_types[::-1]] = def_lens[::-1]
+            if np.any(lengths[def_types] != def_lens) or \
+                    np.any(def_lens < 3):
+                # redefined with a different length, or nonsense
+                return False
+            lengths[0x80] = fmt_len
+            used, first_use = np.unique(chain_types, return_index=True)
+            if np.array_equal(lengths[used], guess[used]):
+                break
+            guess = np.where(lengths >= 0, lengths, guess)
+            guess[used] = lengths[used]
+        else:
+            return False
+
+        # every type has to be defined before it's used, as otherwise the
+        # python version gives up there
+        first_def = np.full(256, n, dtype=np.int64)
+        np.minimum.at(first_def, def_types, fmt_ofs)
+        first_def[0x80] = -1
+        if np.any(first_def[used] >= chain_ofs[first_use]):
+            return False
+
+        # formats (and their units) in the order they turn up
+        fmtu_types = set(t for t, o in zip(def_types.tolist(), fmt_ofs.tolist())
+                         if null_term(self.data_map[o+5:o+9]) == 'FMTU')
+        special = np.isin(chain_types, [0x80] + list(fmtu_types))
+        fmtu_type = None
+        for ofs, mtype in zip(chain_ofs[special].tolist(),
+                              chain_types[special].tolist()):
+            if mtype != 0x80 and mtype != fmtu_type:
+                continue
+            fmtu_type, ok = self._index_format_msg(ofs, mtype,
+                                                   int(lengths[mtype]),
+                                                   fmtu_type)
+            if not ok:
+                break
+
+        counts = np.bincount(chain_types, minlength=256)
+        by_type = chain_ofs[np.argsort(chain_types, kind='stable')]
+        by_type = by_type.astype(np.uint64)
+        start = 0
+        for i, count in enumerate(counts.tolist()):
+            self.offsets[i].frombytes(by_type[start:start+count].tobytes())
+            self.counts[i] = count
+            start += count
+        return True
+
+    def _follow_chain(self, data, cands, types, lengths):
+        '''return the indexes into cands of the messages found by starting
+        at the beginning of the file and stepping through the given message
+        lengths, skipping bad bytes as the python version does'''
+        n = self.data_len
+        ncands = len(cands)
+        cand_lens = lengths[types]
+        ends = cands + cand_lens
+        # where each message would be followed straight on by the next
+        # header, so whole runs of them can be taken in one go
+        linked = np.zeros(ncands, dtype=bool)
+        linked[:-1] = (cand_lens[:-1] >= 3) & (ends[:-1] == cands[1:])
+        breaks = np.flatnonzero(~linked)
+
+        runs = []
+        if ncands == 0 or cands[0] != 0:
+            self._bad_header_at(data, 0)
+        i = 0
+        while i < ncands:
+            j = int(breaks[np.searchsorted(breaks, i)])
+            if cand_lens[j] < 0:
+                runs.append((i, j))
+                ofs = int(cands[j])
+                mtype = int(types[j])
+                if n - ofs >= 528 or n < 528:
+                    print("unknown msg type 0x%02x (%u) at %d" % (mtype, mtype, ofs),
+                          file=sys.stderr)
+                break
+            runs.append((i, j + 1))
+            end = int(ends[j])
+            i = int(np.searchsorted(cands, end))
+            if i < ncands and cands[i] != end:
+                self._bad_header_at(data, end)
+            elif i == ncands and end + 3 < n:
+                self._bad_header_at(data, end)
+        if len(runs) == 0:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate([np.arange(a, b) for a, b in runs])
+
+    def _bad_header_at(self, data, ofs):
+        '''warn about the start of a run of bad bytes (just once, rather
+        than for every byte as the python version does)'''
+        if self.data_len - ofs >= 528 or self.data_len < 528:
+            print("bad header 0x%02x 0x%02x at %d" % (data[ofs], data[ofs+1], ofs),
+                  file=sys.stderr)
+
+    def init_clock(self):
+        '''work out time basis for the log.  Only the GPS and TIME messages
+        and the first timestamped message are decoded, found through the
+        index built by init_arrays'''
+        self._rewind()
+        self.clock = None
+
+        first_us = self._first_with_field('TimeUS')
+        first_ms = self._first_with_field('TimeMS', exclude=('GPS', 'GPS2'))
+        px4_msg_time = None
+        px4_msg_gps = None
+        gps_interp_msg_gps1 = None
+
+        have_good_clock = False
+        types = [self.name_to_id[t] for t in ('GPS', 'GPS2', 'TIME')
+                 if t in self.name_to_id]
+        for ofs in heapq.merge(*[self.offsets[i] for i in types]):
+            self.offset = ofs
+            m = self._parse_next()
+            if m is None:
+                continue
+            type = m.get_type()
+
+            if type == 'GPS' or type == 'GPS2':
+                if getattr(m, "TimeUS", 0) != 0 and \
+                   getattr(m, "GWk", 0) != 0:  # everything-usec-timestamped
+                    self.init_clock_usec()
+                    if not self._zero_time_base:
+                        self.clock.find_time_base(m, first_us[1])
+                    have_good_clock = True
+                    break
+                if getattr(m, "T", 0) != 0 and \
+                   getattr(m, "Week", 0) != 0:  # GPS is msec-timestamped
+                    first_ms_stamp = first_ms[1]
+                    if first_ms[0] is None or first_ms[0] > ofs:
+                        first_ms_stamp = m.T
+                    self.init_clock_msec()
+                    if not self._zero_time_base:
+                        self.clock.find_time_base(m, first_ms_stamp)
+                    have_good_clock = True
+                    break
+                if getattr(m, "GPSTime", 0) != 0:  # px4-style-only
+                    px4_msg_gps = m
+                if getattr(m, "Week", 0) != 0:
+                    if (gps_interp_msg_gps1 is not None and
+                        (gps_interp_msg_gps1.TimeMS != m.TimeMS or
+                         gps_interp_msg_gps1.Week != m.Week)):
+                        # the interpolated clock is built up from every
+                        # message before this point, so needs the full scan
+                        DFReader.init_clock(self)
+                        return
+                    gps_interp_msg_gps1 = m
+
+            elif type == 'TIME':
+                '''only px4-style logs use TIME'''
+                if getattr(m, "StartTime", None) is not None:
+                    px4_msg_time = m
+
+            if px4_msg_time is not None and px4_msg_gps is not None:
+                self.init_clock_px4(px4_msg_time, px4_msg_gps)
+                have_good_clock = True
+                break
+
+        if not have_good_clock:
+            # no GPS messages to set a time base from, and not a PX4-style
+            # log either
+            if first_us[0] is not None:
+                self.init_clock_usec()
+            elif first_ms[0] is not None:
+                self.init_clock_msec()
+            else:
+                # nothing to go on but whatever the GPS messages give the
+                # interpolated clock, which again needs the full scan
+                DFReader.init_clock(self)
+                return
+
+        self._rewind()
+
+    def _first_with_field(self, field, exclude=()):
+        '''find the first message in the log with the given field, returning
+        (offset, value) or (None, None) if there isn't one'''
+        first = None
+        for mtype, fmt in self.formats.items():
+            if field not in fmt.colhash or fmt.name in exclude:
+                continue
+            if len(self.offsets[mtype]) == 0:
+                continue
+            if first is None or self.offsets[mtype][0] < first:
+                first = self.offsets[mtype][0]
+        if first is None:
+            return (None, None)
+        self.offset = first
+        m = self._parse_next()
+        if m is None:
+            return (None, None)
+        return (first, getattr(m, field, None))
 
     def last_timestamp(self):
         '''get the last timestamp in the log'''
@@ -854,13 +1410,245 @@ class DFReader_binary(DFReader):
         return m._timestamp
 
 
+    def iter_messages(self, types=None):
+        '''iterate over the remaining messages in the log without keeping
+        them in all_messages.  if types is given, only messages of those
+        types are decoded, using the offset index'''
+        if self.parse_workers > 1:
+            messages = self.parse_chunked(types, self.parse_workers)
+        else:
+            messages = self._iter_messages(types)
+        for m in messages:
+            yield m
+
+    def _iter_messages(self, types=None):
+        '''iter_messages, parsing everything in this process'''
+        if types is None:
+            for m in DFReader.iter_messages(self):
+                yield m
+            return
+        start = self.offset
+        type_ids = [self.name_to_id[t] for t in types if t in self.name_to_id]
+        for ofs in heapq.merge(*[self.offsets[i] for i in type_ids]):
+            if ofs < start:
+                continue
+            self.offset = ofs
+            m = self._parse_next()
+            if m is None or not m.get_type() in types:
+                continue
+            yield m
+
+    def parse_chunked(self, types=None, workers=None):
+        '''iterate over the remaining messages in the log as iter_messages
+        does, with the decoding spread over worker processes.
+
+        the rest of the log is split into chunks of about CHUNK_BYTES, each
+        starting at a message found in the index.  the workers map the file
+        themselves and parse whole chunks against a copy of the format table
+        and clock, and the messages are handed back here in file order.
+        a worker can't know the clock's state at the start of its chunk, so
+        it starts its clock off at infinity: anything stamped from that state
+        (e.g. messages before the first with a TimeUS) comes back infinite
+        and is stamped again here, carrying on from the chunk before.
+
+        the worker processes are kept between logs (see close_chunk_pool).
+        this just parses everything in this process if there are too few
+        chunks to be worth it, if the clock's state depends on the whole log
+        so far (DFReaderClock_gps_interpolated), or if this is a daemonic
+        process (e.g. in a multiprocessing pool), which can't have children'''
+        if workers is None:
+            workers = os.cpu_count() or 1
+        bounds = self._chunk_bounds(self.offset)
+        if workers < 2 or len(bounds) < 3 or \
+                (self.clock is not None and self.clock.carried is None) or \
+                multiprocessing.current_process().daemon:
+            for m in self._iter_messages(types):
+                yield m
+            return
+
+        type_ids = None
+        if types is not None:
+            type_ids = [self.name_to_id[t] for t in types
+                        if t in self.name_to_id]
+        tasks = []
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            if type_ids is None:
+                tasks.append((start, end, None))
+                continue
+            # just the wanted messages, as iter_messages would read them
+            chunk_offsets = []
+            for i in type_ids:
+                type_offsets = self.offsets[i]
+                lo = bisect.bisect_left(type_offsets, start)
+                hi = bisect.bisect_left(type_offsets, end)
+                if hi > lo:
+                    chunk_offsets.append(type_offsets[lo:hi])
+            if chunk_offsets:
+                tasks.append((start, end, chunk_offsets))
+
+        pool = _chunk_pool(workers)
+        # what a worker needs to read this log, sent with every chunk as the
+        # pool is shared with other logs
+        job = (next(_chunk_jobs), self.filename, self.formats, self.clock,
+               types)
+        # keep a few chunks ahead of the one being handed out, but not the
+        # whole log
+        tasks = iter(tasks)
+        pending = collections.deque()
+        for task in tasks:
+            pending.append(pool.apply_async(_parse_chunk, (job,) + task))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            chunk = pending.popleft().get()
+            for task in tasks:
+                pending.append(pool.apply_async(_parse_chunk, (job,) + task))
+                break
+            for m in self._merge_chunk(chunk):
+                yield m
+        self.offset = self.data_len
+        self.remaining = 0
+
+    def _chunk_bounds(self, start):
+        '''split the log from start on into chunks for parse_chunked.
+        returns the offset each chunk starts at, then the end of the log'''
+        bounds = [start]
+        pos = start + CHUNK_BYTES
+        while pos < self.data_len:
+            # the first message at or after pos
+            ofs = None
+            for type_offsets in self.offsets:
+                i = bisect.bisect_left(type_offsets, pos)
+                if i < len(type_offsets) and \
+                        (ofs is None or type_offsets[i] < ofs):
+                    ofs = type_offsets[i]
+            if ofs is None:
+                break
+            bounds.append(ofs)
+            pos = ofs + CHUNK_BYTES
+        bounds.append(self.data_len)
+        return bounds
+
+    def _merge_chunk(self, chunk):
+        '''turn what a worker sent back for one chunk into messages, as if
+        they'd been parsed here'''
+        offsets, type_ids, elements, stamps, clock_state = chunk
+        clock = self.clock
+        messages = self.messages
+        unknown = float('inf')
+        # per message type: its format and message class, and for types that
+        # only need keeping as the latest of their kind, how to read their
+        # instance (if they have one)
+        types = {}
+        for i in range(len(offsets)):
+            type_id = type_ids[i]
+            try:
+                fmt, cls, simple, instance = types[type_id]
+            except KeyError:
+                fmt = self.formats[type_id]
+                cls = _message_class(fmt)
+                simple = fmt.name not in _STATE_TYPES
+                instance = None
+                if fmt.instance_field is not None:
+                    idx = fmt.colhash[fmt.instance_field]
+                    if idx < len(cls._getters):
+                        instance = cls._getters[idx]
+                    else:
+                        simple = False
+                types[type_id] = (fmt, cls, simple, instance)
+            m = cls(fmt, elements[i], True, self)
+            _set_slot(m, '_offset', offsets[i])
+            if simple:
+                # the same as _note_msg, for most messages
+                messages[fmt.name] = m
+                if instance is not None:
+                    messages["%s[%s]" % (fmt.name, str(instance(m)))] = m
+            else:
+                try:
+                    self._note_msg(m)
+                except Exception:
+                    # the worker has already said so
+                    pass
+            stamp = stamps[i]
+            if stamp == unknown:
+                # stamped from the state the clock was in when the chunk
+                # started, which is known now
+                clock.message_arrived(m)
+                self._set_time(m)
+            else:
+                _set_slot(m, '_timestamp', stamp)
+            yield m
+        for attr, value in clock_state.items():
+            if value != unknown:
+                setattr(clock, attr, value)
+
+    def get_columns(self, type, as_dict=False, start=0, stop=None):
+        '''return every message of one type as a numpy structured array
+        (or a dict of column arrays if as_dict is set), decoded straight
+        from the file with multipliers applied.  Fields with a multiplier
+        come back as float64; strings come back as bytes.  start and stop
+        select a slice of the messages of that type, to read a big log a
+        batch at a time'''
+        if np is None:
+            raise ImportError("numpy is required for get_columns")
+        if not type in self.name_to_id:
+            raise ValueError("Unknown message type %s" % type)
+        fmt = self.formats[self.name_to_id[type]]
+        body_len = fmt.len - 3
+
+        raw_dtype = []
+        out_dtype = []
+        for i in range(len(fmt.msg_fmts)):
+            col = fmt.columns[i]
+            raw = FORMAT_TO_NUMPY[fmt.msg_fmts[i]]
+            raw_dtype.append((col, raw))
+            if fmt.msg_mults[i] is not None:
+                out_dtype.append((col, "<f8"))
+            else:
+                out_dtype.append((col, raw))
+        raw_dtype = np.dtype(raw_dtype)
+        if raw_dtype.itemsize != body_len:
+            raise ValueError("Format length mismatch for %s" % type)
+
+        # gather the bodies of every message of this type in one go: index a
+        # sliding window over the mmap by the offsets, dropping any message
+        # cut short by the end of the file
+        offsets = np.frombuffer(self.offsets[self.name_to_id[type]],
+                                dtype=np.uint64)[start:stop].astype(np.int64)
+        offsets = offsets[offsets + fmt.len <= self.data_len] + 3
+        buf = np.frombuffer(self.data_map, dtype=np.uint8)
+        if len(offsets) > 0:
+            windows = np.lib.stride_tricks.sliding_window_view(buf, body_len)
+            rows = np.ascontiguousarray(windows[offsets])
+        else:
+            rows = np.zeros((0, body_len), dtype=np.uint8)
+        raw = rows.view(raw_dtype).reshape(-1)
+
+        if as_dict:
+            ret = {}
+            for i in range(len(fmt.msg_fmts)):
+                col = fmt.columns[i]
+                if fmt.msg_mults[i] is not None:
+                    ret[col] = raw[col] * fmt.msg_mults[i]
+                else:
+                    ret[col] = raw[col].copy()
+            return ret
+        ret = np.empty(len(raw), dtype=out_dtype)
+        for i in range(len(fmt.msg_fmts)):
+            col = fmt.columns[i]
+            if fmt.msg_mults[i] is not None:
+                ret[col] = raw[col] * fmt.msg_mults[i]
+            else:
+                ret[col] = raw[col]
+        return ret
+
     def skip_to_type(self, type):
         '''skip fwd to next msg matching given type set'''
 
         if self.type_nums is None:
             # always add some key msg types so we can track flightmode, params etc
             type = type.copy()
-            type.update(set(['MODE','MSG','PARM','STAT']))
+            type.update(_STATE_TYPES)
             self.indexes = []
             self.type_nums = []
             for t in type:
@@ -882,6 +1670,11 @@ class DFReader_binary(DFReader):
             self.indexes[smallest_index] += 1
             self.offset = smallest_offset
 
+    def _unpack_at(self, ofs, fmt):
+        '''unpack the raw elements of an already parsed message again'''
+        body = self.data_map[ofs+3:ofs+fmt.len]
+        return struct.unpack(fmt.msg_struct, body)
+
     def _parse_next(self):
         '''read one message, returning it as an object'''
 
@@ -922,6 +1715,7 @@ class DFReader_binary(DFReader):
             self.offset += 1
             self.remaining -= 1
 
+        msg_offset = self.offset
         self.offset += 3
         self.remaining = self.data_len - self.offset
 
@@ -936,7 +1730,7 @@ class DFReader_binary(DFReader):
         try:
             if not msg_type in self.unpackers:
                 self.unpackers[msg_type] = struct.Struct(fmt.msg_struct).unpack
-            elements = list(self.unpackers[msg_type](body))
+            elements = self.unpackers[msg_type](body)
         except Exception as ex:
             print(ex)
             if self.remaining < 528:
@@ -951,13 +1745,8 @@ class DFReader_binary(DFReader):
         if elements is None:
             return self._parse_next()
         name = fmt.name
-        # transform elements which can't be done at unpack time:
-        for a_index in fmt.a_indexes:
-            try:
-                elements[a_index] = array.array('h', elements[a_index])
-            except Exception as e:
-                print("Failed to transform array: %s" % str(e),
-                      file=sys.stderr)
+        # 'a' fields are left as bytes here; they're turned into arrays when
+        # they're decoded
 
         if name == 'FMT':
             # add to formats
@@ -976,6 +1765,7 @@ class DFReader_binary(DFReader):
         self.offset += fmt.len - 3
         self.remaining = self.data_len - self.offset
         m = DFMessage(fmt, elements, True, self)
+        _set_slot(m, '_offset', msg_offset)
 
         if m.fmt.name == 'FMTU':
             # add to units information
@@ -997,6 +1787,130 @@ class DFReader_binary(DFReader):
         return m
 
 
+# the worker processes DFReader_binary.parse_chunked hands chunks out to,
+# started on first use and kept for later logs, and how many there are
+_chunk_workers = None
+_chunk_nworkers = 0
+_chunk_workers_lock = threading.Lock()
+# numbers the logs parse_chunked is run on, so workers know when to switch
+_chunk_jobs = itertools.count()
+
+def _chunk_pool(workers):
+    '''get parse_chunked's pool of worker processes, starting it (or
+    starting it again, if it has a different number of workers) if need be'''
+    global _chunk_workers, _chunk_nworkers
+    with _chunk_workers_lock:
+        if _chunk_workers is not None and _chunk_nworkers != workers:
+            _chunk_workers.terminate()
+            _chunk_workers = None
+        if _chunk_workers is None:
+            ctx = multiprocessing.get_context('spawn')
+            _chunk_workers = ctx.Pool(workers)
+            _chunk_nworkers = workers
+        return _chunk_workers
+
+def close_chunk_pool():
+    '''stop the worker processes parse_chunked started, if it has.  the next
+    parse_chunked starts them again'''
+    global _chunk_workers
+    with _chunk_workers_lock:
+        if _chunk_workers is not None:
+            _chunk_workers.terminate()
+            _chunk_workers.join()
+            _chunk_workers = None
+
+atexit.register(close_chunk_pool)
+
+# the reader each worker process of DFReader_binary.parse_chunked works
+# through its chunks with, the clock it starts each one with, and which log
+# they're for
+_chunk_log = None
+_chunk_clock = None
+_chunk_job = None
+
+def _init_chunk_reader(filename, formats, clock, types):
+    '''set up a parse_chunked worker process to read a log'''
+    global _chunk_log, _chunk_clock
+    if _chunk_log is not None:
+        _chunk_log.data_map.close()
+        _chunk_log.filehandle.close()
+    log = DFReader_binary.__new__(DFReader_binary)
+    DFReader.__init__(log)
+    log._map_file(filename)
+    log.formats = formats
+    log.prev_type = None
+    log.chunk_types = types
+    if clock is not None:
+        for attr in clock.carried:
+            setattr(clock, attr, float('inf'))
+    _chunk_log = log
+    _chunk_clock = clock
+
+def _parse_chunk(job, start, end, offsets):
+    '''parse one chunk of a log in a parse_chunked worker process: every
+    message from start up to end, or just those at the given offsets.  job
+    is the log's number, then the arguments for _init_chunk_reader.
+    returns their offsets, types, raw elements and timestamps, and the
+    clock's state at the end of the chunk'''
+    global _chunk_job
+    if job[0] != _chunk_job:
+        _init_chunk_reader(*job[1:])
+        _chunk_job = job[0]
+    log = _chunk_log
+    log._rewind()
+    log.clock = copy.copy(_chunk_clock)
+    types = log.chunk_types
+    ret_offsets = array.array('Q')
+    ret_types = array.array('B')
+    elements = []
+    stamps = array.array('d')
+
+    def add(m):
+        ret_offsets.append(m._offset)
+        ret_types.append(m.fmt.type)
+        elements.append(m._raw)
+        # a message that _add_msg choked on never got a timestamp
+        stamps.append(getattr(m, '_timestamp', float('nan')))
+
+    if offsets is None:
+        log.offset = start
+        log.remaining = log.data_len - start
+        while True:
+            m = log._parse_next()
+            if m is None or m._offset >= end:
+                break
+            add(m)
+    else:
+        for ofs in heapq.merge(*offsets):
+            log.offset = ofs
+            m = log._parse_next()
+            if m is None or not m.get_type() in types:
+                continue
+            add(m)
+
+    clock_state = {}
+    if log.clock is not None:
+        for attr in log.clock.carried:
+            clock_state[attr] = getattr(log.clock, attr)
+    return (ret_offsets, ret_types, elements, stamps, clock_state)
+
+def _text_columns(fmt, rows):
+    '''convert the numeric fields of lines of a text log in the same format
+    (split up, with the message name first) a column at a time, returning
+    the elements of each.  other fields are left as strings, to be converted
+    when they're read, as are all of them if the lines don't line up or any
+    number doesn't parse'''
+    n = len(fmt.msg_fmts)
+    if len(set(map(len, rows))) != 1 or len(rows[0]) != n + 1:
+        return [row[1:] for row in rows]
+    columns = list(zip(*rows))[1:]
+    try:
+        columns = [list(map(conv, col)) if conv in (int, float, long) else col
+                   for conv, col in zip(fmt.converters(False), columns)]
+    except ValueError:
+        return [row[1:] for row in rows]
+    return list(zip(*columns))
+
 def DFReader_is_text_log(filename):
     '''return True if a file appears to be a valid text log'''
     with open(filename, 'r') as f:
@@ -1052,44 +1966,47 @@ class DFReader_text(DFReader):
 
     def init_arrays(self, progress_callback=None):
         '''initialise arrays for fast recv_match()'''
-        self.offsets = {}
-        self.counts = {}
-        self._count = 0
+        # offsets of the lines of each message type, by name, found a block
+        # of lines at a time.  every FMT and FMTU line is parsed on the way,
+        # so that all the formats are known
+        offsets = {}
+        delimeter = self.delimeter.encode('utf-8')
         ofs = self.offset
         pct = 0
 
-        while ofs+16 < self.data_len:
-            mtype = self.data_map[ofs:ofs+4]
-            if mtype[3] == b',':
-                mtype = mtype[0:3]
-            if not mtype in self.offsets:
-                self.counts[mtype] = 0
-                self.offsets[mtype] = []
-                self.offset = ofs
-                self._parse_next()
-            self.offsets[mtype].append(ofs)
-
-            self.counts[mtype] += 1
-
-            if mtype == "FMT":
-                self.offset = ofs
-                self._parse_next()
-
-            if mtype == "FMTU":
-                self.offset = ofs
-                self._parse_next()
-                
-            ofs = self.data_map.find(b"\n", ofs)
-            if ofs == -1:
+        while True:
+            end = -1
+            if ofs + TEXT_BLOCK_BYTES < self.data_len:
+                end = self.data_map.rfind(b'\n', ofs, ofs + TEXT_BLOCK_BYTES)
+            if end == -1:
+                end = self.data_map.find(b'\n', ofs)
+            if end == -1:
+                # as in _parse_next, a last line without a newline is ignored
                 break
-            ofs += 1
+            for line in self.data_map[ofs:end].split(b'\n'):
+                # the same test _parse_next has for a line with a message
+                mtype, sep, rest = line.rstrip().partition(delimeter)
+                if sep:
+                    try:
+                        offsets[mtype].append(ofs)
+                    except KeyError:
+                        offsets[mtype] = array.array('Q', [ofs])
+                    if mtype == b'FMT' or mtype == b'FMTU':
+                        s = line.rstrip().decode('utf-8')
+                        self._line_message(s.split(self.delimeter))
+                ofs += len(line) + 1
             new_pct = (100 * ofs) // self.data_len
             if progress_callback is not None and new_pct != pct:
                 progress_callback(new_pct)
                 pct = new_pct
 
-        for mtype in self.counts.keys():
-            self._count += self.counts[mtype]
+        self.offsets = {}
+        self.counts = {}
+        for mtype, type_offsets in offsets.items():
+            name = mtype.decode('utf-8', 'replace')
+            self.offsets[name] = type_offsets
+            self.counts[name] = len(type_offsets)
+        self._count = sum(self.counts.values())
         self.offset = 0
 
     def skip_to_type(self, type):
@@ -1098,7 +2015,7 @@ class DFReader_text(DFReader):
         if self.type_list is None:
             # always add some key msg types so we can track flightmode, params etc
             self.type_list = type.copy()
-            self.type_list.update(set(['MODE','MSG','PARM','STAT']))
+            self.type_list.update(_STATE_TYPES)
             self.type_list = list(self.type_list)
             self.indexes = []
             self.type_nums = []
@@ -1124,40 +2041,146 @@ class DFReader_text(DFReader):
         '''read one message, returning it as an object'''
 
         while True:
-            endline = self.data_map.find(b'\n',self.offset)
-            if endline == -1:
-                endline = self.data_len
-                if endline < self.offset:
+            while True:
+                endline = self.data_map.find(b'\n',self.offset)
+                if endline == -1:
+                    endline = self.data_len
+                    if endline < self.offset:
+                        break
+                s = self.data_map[self.offset:endline].rstrip()
+                if sys.version_info.major >= 3:
+                    s = s.decode('utf-8')
+                elements = s.split(self.delimeter)
+                self.offset = endline+1
+                if len(elements) >= 2:
+                    # this_line is good
                     break
-            s = self.data_map[self.offset:endline].rstrip()
-            if sys.version_info.major >= 3:
-                s = s.decode('utf-8')
-            elements = s.split(self.delimeter)
-            self.offset = endline+1
-            if len(elements) >= 2:
-                # this_line is good
-                break
 
-        if self.offset > self.data_len:
-            return None
+            if self.offset > self.data_len:
+                return None
 
+            self.percent = 100.0 * (self.offset / float(self.data_len))
+            m = self._parse_line(elements)
+            if m is not None:
+                return m
+
+    def iter_messages(self, types=None):
+        '''iterate over the remaining messages in the log without keeping
+        them in all_messages.  if types is given, only messages of those
+        types are read, using the offset index.
+
+        otherwise the log is read a block at a time rather than a line at a
+        time, and the numeric fields of each message type in a block are
+        converted together (see _parse_block), so the messages don't hold
+        strings'''
+        if types is not None:
+            start = self.offset
+            indexed = []
+            for t in types:
+                if t in self.offsets:
+                    type_offsets = self.offsets[t]
+                    first = bisect.bisect_left(type_offsets, start)
+                    indexed.append(type_offsets[first:])
+            for ofs in heapq.merge(*indexed):
+                self.offset = ofs
+                m = self._parse_next()
+                if m is None or not m.get_type() in types:
+                    continue
+                yield m
+            return
+        while self.offset <= self.data_len:
+            for m in self._parse_block():
+                yield m
+
+    def _parse_block(self):
+        '''parse up to TEXT_BLOCK_BYTES of whole lines from the current
+        offset, yielding their messages'''
+        start = self.offset
+        end = -1
+        if start + TEXT_BLOCK_BYTES < self.data_len:
+            end = self.data_map.rfind(b'\n', start, start + TEXT_BLOCK_BYTES)
+        if end == -1:
+            end = self.data_map.find(b'\n', start)
+        if end == -1:
+            # a line without a newline at the end of the file is left off,
+            # as _parse_next does
+            self.offset = self.data_len + 1
+            return
+        block = self.data_map[start:end].decode('utf-8')
+        self.offset = end + 1
+        self.percent = 100.0 * (self.offset / float(self.data_len))
+
+        # lines are gathered into runs that can be converted together;
+        # anything that changes the formats ends a run, and is parsed on its
+        # own
+        formats = self.formats
+        delimeter = self.delimeter
+        run = []
+        for line in block.split('\n'):
+            elements = line.rstrip(_TEXT_WHITESPACE).split(delimeter)
+            if len(elements) < 2:
+                continue
+            name = elements[0]
+            if name == 'FMT' or name == 'FMTU' or \
+                    (len(elements) == 5 and elements[-1] == ','):
+                for m in self._parse_run(run):
+                    yield m
+                run = []
+                m = self._parse_line(elements)
+                if m is not None:
+                    yield m
+                continue
+            fmt = formats.get(name)
+            if fmt is None or len(elements) < len(fmt.format)+1:
+                continue
+            run.append((fmt, elements))
+        for m in self._parse_run(run):
+            yield m
+
+    def _parse_run(self, run):
+        '''turn (format, elements) for a run of lines into messages, in
+        order, converting each format's numeric columns in one go'''
+        by_format = {}
+        for i in range(len(run)):
+            by_format.setdefault(run[i][0], []).append(i)
+        converted = [None] * len(run)
+        classes = {}
+        for fmt, idx in by_format.items():
+            rows = _text_columns(fmt, [run[i][1] for i in idx])
+            for i, row in zip(idx, rows):
+                converted[i] = row
+            classes[fmt] = _message_class(fmt)
+        for (fmt, elements), row in zip(run, converted):
+            m = classes[fmt](fmt, row, False, self)
+            self._add_msg(m)
+            yield m
+
+    def _parse_line(self, elements):
+        '''turn the split up fields of one line into a message, or None if
+        it isn't one'''
+        m = self._line_message(elements)
+        if m is not None:
+            self._add_msg(m)
+        return m
+
+    def _line_message(self, elements):
+        '''_parse_line without adding the message to the log's state (bar
+        any formats or units it defines)'''
         # cope with empty structures
         if len(elements) == 5 and elements[-1] == ',':
             elements[-1] = ''
             elements.append('')
 
-        self.percent = 100.0 * (self.offset / float(self.data_len))
-
         msg_type = elements[0]
 
         if msg_type not in self.formats:
-            return self._parse_next()
+            return None
 
         fmt = self.formats[msg_type]
 
         if len(elements) < len(fmt.format)+1:
             # not enough columns
-            return self._parse_next()
+            return None
 
         elements = elements[1:]
 
@@ -1185,7 +2208,7 @@ class DFReader_text(DFReader):
         try:
             m = DFMessage(fmt, elements, False, self)
         except ValueError:
-            return self._parse_next()
+            return None
 
         if m.get_type() == 'FMTU':
             fmtid = getattr(m, 'FmtType', None)
@@ -1194,8 +2217,6 @@ class DFReader_text(DFReader):
                 fmtu.set_unit_ids(getattr(m, 'UnitIds', None))
                 fmtu.set_mult_ids(getattr(m, 'MultIds', None))
 
-        self._add_msg(m)
-
         return m
 
     def last_timestamp(self):
@@ -1211,11 +2232,14 @@ class DFReader_text(DFReader):
         m = self.recv_msg()
         return m._timestamp
 
-def DFReader_auto(filename):
+def DFReader_auto(filename, use_sidecar=False, parse_workers=0,
+                  progress_callback=None):
     if filename.lower().endswith('.bin'):
-        return DFReader_binary(filename)
+        return DFReader_binary(filename, progress_callback=progress_callback,
+                               use_sidecar=use_sidecar,
+                               parse_workers=parse_workers)
     elif filename.lower().endswith('.log'):
-        return DFReader_text(filename)
+        return DFReader_text(filename, progress_callback=progress_callback)
     else:
         raise ValueError("Don't know how to read {}".format(filename))
 
@@ -9,6 +9,7 @@ Heavily based on DFReader.py - thanks to all who contributed to it!
 """
 
 import array
+import csv
 import math
 import sys
 import struct
@@ -18,37 +19,81 @@ from . import mavutil
 from . import DFReader
 
 
+# how much output is gathered up before it's written out, by default
+DEFAULT_BUFSIZE = 1 << 20
+
+# how many messages are written between checks of the cancel token
+CANCEL_CHECK_EVERY = 1024
+
+# largest buffer for each of DFWriter_csv's files.  a log can easily have a
+# hundred message types, and so a hundred files open at once
+CSV_TYPE_BUFSIZE = 64 << 10
+
+
 class DFWriter(object):
     """
     Write a generic log file
+
+    messages can be any iterable of messages (a list, or a generator to write
+    as they're read), and is written out straight away.  Alternatively, pass
+    None and feed messages in one at a time with write_message, then call
+    close_file when done.
+
+    cancel, if given, is checked every so often while writing all the
+    messages (see processor.cancel.CancelToken).  If that, or anything else,
+    stops the write part way, the partial file is deleted.
     """
-    def __init__(self, messages, filename):
+    def __init__(self, messages, filename, bufsize=DEFAULT_BUFSIZE,
+            cancel=None):
         self.all_messages = messages
-        self._msg_idx = 0
         self.filehandle = None
         self.filename = filename
-        self.is_done = False
+        self.bufsize = bufsize
+        self.cancel = cancel
+        self._chunk = []
+        self._chunk_len = 0
 
         self.open_file()
-        self.write_all_log()
-        self.close_file()
+        if messages is not None:
+            try:
+                self.write_all_log()
+            except BaseException:
+                self.discard()
+                raise
+            self.close_file()
 
     def write_all_log(self):
-        while not self.is_done:
-            self.write_next_message()
-            self.check_done()
+        countdown = CANCEL_CHECK_EVERY
+        for msg in self.all_messages:
+            if msg is None:
+                break
+            countdown -= 1
+            if not countdown:
+                countdown = CANCEL_CHECK_EVERY
+                self.check_cancelled()
+            self.write_message(msg)
 
-    def check_done(self):
-        self.is_done = (self._msg_idx >= len(self.all_messages)) or \
-                (self.is_done) or \
-                (self.all_messages[self._msg_idx] is None)
-        return self.is_done
+    def check_cancelled(self):
+        if self.cancel is not None:
+            self.cancel.check()
 
-    def write_next_message(self):
-        self.filehandle.write(self._gen_contents(self._msg_idx))
-        self._msg_idx += 1
+    def write_message(self, msg):
+        contents = self._gen_contents(msg)
+        self._chunk.append(contents)
+        self._chunk_len += len(contents)
+        if self._chunk_len >= self.bufsize:
+            self.flush()
 
-    def _gen_contents(self, message_idx):
+    def flush(self):
+        if self._chunk:
+            self.filehandle.write(self._join(self._chunk))
+            self._chunk = []
+            self._chunk_len = 0
+
+    def _join(self, chunk):
+        return ''.join(chunk)
+
+    def _gen_contents(self, msg):
         raise NotImplemented("Can't use generic DFWriter to actually write")
 
     def open_file(self):
@@ -61,24 +106,270 @@ class DFWriter(object):
 
     def close_file(self):
         assert self.filehandle != None, "Never opened file!"
+        self.flush()
         self.filehandle.close()
 
+    def discard(self):
+        """
+        Close and delete whatever has been written so far, rather than leave
+        an incomplete log behind.
+        """
+        self._chunk = []
+        self._chunk_len = 0
+        if self.filehandle is not None:
+            self.filehandle.close()
+            self.filehandle = None
+            _remove_quietly(self.filename)
+
+def _remove_quietly(filename):
+    try:
+        os.remove(filename)
+    except OSError:
+        pass
+
 class DFWriter_text(DFWriter):
     """
     Write a text
     """
-    def _gen_contents(self, message_idx):
-        msg = self.all_messages[message_idx]
-        parts = [msg.get_type()]
-        d = msg.to_dict()
-        for col in msg.fmt.columns:
-            parts.append(str(d[col]))
-        s = ','.join(parts) + '\n'
-        return s
+    def __init__(self, messages, filename, bufsize=DEFAULT_BUFSIZE,
+            cancel=None):
+        # one formatter per message format, made the first time it's seen
+        self._formatters = {}
+        super().__init__(messages, filename, bufsize, cancel)
+
+    def _gen_contents(self, msg):
+        fmt = msg.fmt
+        try:
+            formatter = self._formatters[fmt]
+        except KeyError:
+            formatter = make_text_formatter(fmt)
+            self._formatters[fmt] = formatter
+        return formatter(msg._decode_all())
 
     def _open_file(self):
         self.filehandle = open(self.filename, 'w')
 
+def make_text_formatter(fmt):
+    """
+    Make a function that turns the decoded field values of a message in the
+    given format (see DFMessage._decode_all) into a line of a text log.  The
+    result is the same as joining up str() of each field read from the
+    message.
+    """
+    if len(fmt.columns) == 0:
+        line = fmt.name + '\n'
+        return lambda values: line
+
+    prefix = fmt.name + ','
+    idx = _column_indexes(fmt)
+    if idx == list(range(len(fmt.msg_fmts))):
+        def formatter(values):
+            return prefix + ','.join(map(str, values)) + '\n'
+    else:
+        def formatter(values):
+            return prefix + ','.join([str(values[i]) for i in idx]) + '\n'
+    return formatter
+
+def _column_indexes(fmt):
+    """
+    Get the index of the field behind each column of a format, in order.
+    """
+    return [fmt.colhash[col] for col in fmt.columns]
+
+class DFWriter_csv(DFWriter):
+    """
+    Write CSV files, one per message type.
+
+    filename is the base name: messages of type GPS go to <filename>_GPS.csv,
+    and so on.  Each file's header is the type's columns, optionally with a
+    timestamp column (in seconds, from the log's clock) in front.  Fields are
+    written as they'd be read from the message, with multipliers applied.
+
+    types, if given, is a set of message names; anything else is skipped.
+
+    Each file gets its own buffer of bufsize, up to CSV_TYPE_BUFSIZE.
+    """
+    def __init__(self, messages, filename, bufsize=DEFAULT_BUFSIZE,
+            types=None, timestamps=False, cancel=None):
+        self.types = types
+        self.timestamps = timestamps
+        # per message name: [file, csv writer, column indexes, fmt], or None
+        # for types that aren't wanted
+        self._outputs = {}
+        self.filenames = []
+        super().__init__(messages, filename, bufsize, cancel)
+
+    def type_filename(self, name):
+        return "{}_{}.csv".format(self.filename, name)
+
+    def open_file(self):
+        # files are opened as their message types turn up
+        pass
+
+    def write_message(self, msg):
+        name = msg.fmt.name
+        try:
+            out = self._outputs[name]
+        except KeyError:
+            if self.types is not None and name not in self.types:
+                out = None
+            else:
+                out = self._open_type(msg)
+            self._outputs[name] = out
+        if out is None:
+            return
+        if out[3] is not msg.fmt:
+            # the format changed part way through the log
+            out[2] = _column_indexes(msg.fmt)
+            out[3] = msg.fmt
+        values = msg._decode_all()
+        row = [str(values[i]) for i in out[2]]
+        if self.timestamps:
+            row.insert(0, msg._timestamp)
+        out[1].writerow(row)
+
+    def _open_type(self, msg):
+        filename = self.type_filename(msg.fmt.name)
+        if os.path.exists(filename):
+            raise FileExistsError("File exists")
+        fh = open(filename, 'w', newline='',
+                buffering=min(self.bufsize, CSV_TYPE_BUFSIZE))
+        writer = csv.writer(fh)
+        header = list(msg.fmt.columns)
+        if self.timestamps:
+            header.insert(0, 'timestamp')
+        writer.writerow(header)
+        out = [fh, writer, _column_indexes(msg.fmt), msg.fmt]
+        self.filenames.append(filename)
+        return out
+
+    def flush(self):
+        for out in self._outputs.values():
+            if out is not None:
+                out[0].flush()
+
+    def close_file(self):
+        for out in self._outputs.values():
+            if out is not None:
+                out[0].close()
+        self._outputs = {}
+
+    def discard(self):
+        self.close_file()
+        for filename in self.filenames:
+            _remove_quietly(filename)
+        self.filenames = []
+
+class DFWriter_binary(DFWriter):
+    """
+    Write a binary (.bin) log.
+
+    All the format definitions go first, so that a reader knows every message
+    type before it sees one.  Messages read from a binary log and left alone
+    are copied straight out of the source file, runs of neighbouring messages
+    at a time; only those with changed fields are encoded again.
+
+    The formats have to be known before anything else is written, so this
+    needs every message up front rather than writing them one at a time.
+    """
+    FMT_STRUCT = struct.Struct("<BBBBB4s16s64s")
+
+    def write_all_log(self):
+        if not isinstance(self.all_messages, list):
+            self.all_messages = list(self.all_messages)
+        self.write_formats()
+        run_src = None
+        run_start = run_end = 0
+        dropped = 0
+        countdown = CANCEL_CHECK_EVERY
+
+        for msg in self.all_messages:
+            if msg is None:
+                break
+            countdown -= 1
+            if not countdown:
+                countdown = CANCEL_CHECK_EVERY
+                self.check_cancelled()
+            has_source = self._has_source(msg)
+            name = msg.fmt.name
+            if name == 'FMT' or (has_source and name == 'FMTU'):
+                # already written out with the rest of the formats
+                continue
+            if has_source and not msg._dirty:
+                src = msg._parent.data_map
+                if src is run_src and msg._offset == run_end:
+                    run_end += msg.fmt.len
+                    continue
+                self._flush_run(run_src, run_start, run_end)
+                run_src = src
+                run_start = msg._offset
+                run_end = run_start + msg.fmt.len
+                continue
+
+            self._flush_run(run_src, run_start, run_end)
+            run_src = None
+            buf = self._encode(msg)
+            if buf is None:
+                # better to lose a message than to write out one that was
+                # meant to be changed, so drop it rather than copying it
+                dropped += 1
+                continue
+            self.filehandle.write(buf)
+        self._flush_run(run_src, run_start, run_end)
+
+        if dropped:
+            print("DFWriter_binary: dropped {} messages that couldn't be "
+                    "encoded".format(dropped), file=sys.stderr)
+
+    def write_formats(self):
+        """
+        Write the FMT and FMTU messages for every log the messages came from.
+        """
+        parents = []
+        for msg in self.all_messages:
+            if msg is None:
+                break
+            if not any(msg._parent is p for p in parents):
+                parents.append(msg._parent)
+
+        for parent in parents:
+            if isinstance(parent, DFReader.DFReader_binary):
+                for name in ('FMT', 'FMTU'):
+                    if name not in parent.name_to_id:
+                        continue
+                    flen = parent.formats[parent.name_to_id[name]].len
+                    for ofs in parent.offsets[parent.name_to_id[name]]:
+                        self.filehandle.write(parent.data_map[ofs:ofs+flen])
+            else:
+                fmts = sorted(parent.formats.values(), key=lambda f: f.type)
+                for fmt in fmts:
+                    self.filehandle.write(self._encode_format(fmt))
+
+    def _has_source(self, msg):
+        return msg._offset is not None and \
+                isinstance(msg._parent, DFReader.DFReader_binary)
+
+    def _flush_run(self, src, start, end):
+        if src is not None and end > start:
+            self.filehandle.write(src[start:end])
+
+    def _encode(self, msg):
+        try:
+            return msg.get_msgbuf()
+        except (ValueError, TypeError, OverflowError):
+            # e.g. NaN put into an integer field
+            return None
+
+    def _encode_format(self, fmt):
+        return self.FMT_STRUCT.pack(0xA3, 0x95, 0x80,
+                fmt.type, fmt.len,
+                fmt.name.encode('ascii'),
+                fmt.format.encode('ascii'),
+                ','.join(fmt.columns).encode('ascii'))
+
+    def _open_file(self):
+        self.filehandle = open(self.filename, 'wb')
+
 if __name__ == '__main__':
     import src.DFReader as dfr
     infile = sys.argv[1]
@@ -10,7 +10,6 @@ import re
 import sys
 import argparse
 
-from . import message_remover
 
 MULTIVAL_FIRST = 0x01
 MULTIVAL_LAST = 0x02
@@ -99,44 +98,66 @@ def grab_params_complex(log, multivalhandle=None, paramfilter=None):
     recorded; non-matching parameter names are ommitted from the output.
     Default behavior matches everything.
     """
+    # only the PARM messages contain parameters, so don't bother decoding
+    # anything else
+    parm = log.iter_messages(set(['PARM']))
+    return grab_params_from_messages(parm, multivalhandle, paramfilter)
 
-    if paramfilter is None:
-        paramfilter = ['.*']
-    paramfilter = [re.compile(f) for f in paramfilter]
-
-    # check for illegal parameters
-    sets = [MULTIVAL_FIRST & multivalhandle,
-            MULTIVAL_LAST & multivalhandle,
-            MULTIVAL_FAIL & multivalhandle]
-    n = 0
-    for i in range(len(sets)):
-        if sets[i]:
-            n += 1
-    if n > 1:
-        raise AttributeError("Invalid arguments supplied!")
-    if n == 0:
-        multivalhandle = MULTIVAL_LAST
-
-    # process!  we're actually going to use the message filter here to grab
-    # all the PARM messages, since those contain the parameters.  The rest
-    # will be discarded
-    parm, _ = message_remover.filter_packet_type(log, ['PARM'])
-    del _
-
-    params = {}
+def grab_params_from_messages(parm, multivalhandle=None, paramfilter=None):
+    """
+    As grab_params_complex, but working from an iterable of PARM messages
+    rather than a whole log.
+    """
+    collector = ParamCollector(multivalhandle, paramfilter)
     for msg in parm:
+        collector.add(msg)
+    return collector.params
+
+
+class ParamCollector(object):
+    """
+    Builds up the parameters one PARM message at a time, for when messages
+    are handed over as they're read.  multivalhandle and paramfilter are as
+    for grab_params_complex; the parameters so far are in params.
+    """
+
+    def __init__(self, multivalhandle=None, paramfilter=None):
+        if paramfilter is None:
+            paramfilter = ['.*']
+        self.paramfilter = [re.compile(f) for f in paramfilter]
+
+        if multivalhandle is None:
+            multivalhandle = 0
+        # check for illegal parameters
+        sets = [MULTIVAL_FIRST & multivalhandle,
+                MULTIVAL_LAST & multivalhandle,
+                MULTIVAL_FAIL & multivalhandle]
+        n = 0
+        for i in range(len(sets)):
+            if sets[i]:
+                n += 1
+        if n > 1:
+            raise AttributeError("Invalid arguments supplied!")
+        if n == 0:
+            multivalhandle = MULTIVAL_LAST
+        self.multivalhandle = multivalhandle
+        self.params = {}
+
+    def add(self, msg):
         key, val = msg.Name, msg.Value
+        params = self.params
+        multivalhandle = self.multivalhandle
         # first, does it match the filter?
         matching = False
-        for reo in paramfilter:
+        for reo in self.paramfilter:
             if reo.match(key):
                 matching = True
                 break
         if not matching:
-            continue
+            return
 
         # now, check for duplicates
-        if key in params.keys():
+        if key in params:
             # uh-oh!  duplicate!
             if multivalhandle & MULTIVAL_WARN:
                 # let the user know
@@ -148,7 +169,7 @@ def grab_params_complex(log, multivalhandle=None, paramfilter=None):
             if multivalhandle & MULTIVAL_FIRST:
                 # if only want the first parameter, skip. messages are sorted
                 # by arrival time, so anything after the first one comes later
-                continue
+                return
             elif multivalhandle & MULTIVAL_LAST:
                 # if only want the last value, overwrite it with this occurance
                 params[key] = val
@@ -160,9 +181,8 @@ def grab_params_complex(log, multivalhandle=None, paramfilter=None):
                 pass
         else:
             # no duplication, good to continue processing normally
-            params.update({key: val})
-    return params
-    
+            params[key] = val
+
 
 def write_out_file(text, filename, force=False):
     """
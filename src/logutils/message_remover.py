@@ -5,33 +5,45 @@
 Removes selected messages from a DFReader log.
 """
 
+import heapq
+import os
 import re
 
+# size of the chunks that redact_packet_types writes out in
+COPY_CHUNK = 1 << 20
+
+# message types that are always kept, otherwise the log can't be read back
+ESSENTIAL_TYPES = ('FMT', 'FMTU')
+
 def filter_packet_type(log, msgtypes=[]):
     """
     Given a DFReader (or DFReader derivative) object, filter out all the
     messages of given MAV packet types.
 
-    :param log: DFReader object containing log information
+    :param log: DFReader object containing log information, or a list of
+    messages
     :param msgtypes: list.  contains case-insensitive strings corresponding to
     message types to remove.  example: ['att', 'gps', 'gpa', 'gps2'].  regex
     matching is applied.
     :return: 2-tuple: (messages-matching, messages-not-matching).  both lists.
     """
+    if isinstance(log, list):
+        messages = log
+    else:
+        messages = log.all_messages
 
     if len(msgtypes) == 0:
         # nothing selected; no work to do
-        return ([], log.all_messages)
+        return ([], messages)
 
     matching = []
     not_matching = []
     re_objects = [re.compile(s) for s in msgtypes]
-    messages = log.all_messages
 
     for msg in messages:
         if msg is None:
             continue
-        mtype = msg.to_dict()['mavpackettype']
+        mtype = msg.get_type()
         for reo in re_objects:
             if reo.match(mtype):
                 matching.append(msg)
@@ -44,6 +56,96 @@ def filter_packet_type(log, msgtypes=[]):
 
     return (matching, not_matching)
 
+def select_packet_types(log, msgtypes=[], keep_matching=False):
+    """
+    Work out which message types of a log to keep, without looking at any of
+    the messages themselves.
+
+    :param log: DFReader object containing log information
+    :param msgtypes: list of regexes, as for filter_packet_type
+    :param keep_matching: if True, keep the types that match (whitelist);
+    otherwise keep the ones that don't (blacklist)
+    :return: set of message names to keep.  FMT and FMTU are always included.
+    """
+    re_objects = [re.compile(s) for s in msgtypes]
+    keep = set(ESSENTIAL_TYPES)
+    for fmt in log.formats.values():
+        matched = any(reo.match(fmt.name) for reo in re_objects)
+        if matched == keep_matching:
+            keep.add(fmt.name)
+    return keep
+
+def kept_ranges(log, keep):
+    """
+    Given a DFReader_binary and a set of message names to keep, generate the
+    (start, end) byte ranges of the file that hold those messages.  Messages
+    that sit next to each other are merged into one range.
+    """
+    lengths = {}
+    for name in keep:
+        if name in log.name_to_id:
+            mtype = log.name_to_id[name]
+            lengths[mtype] = log.formats[mtype].len
+    streams = [_type_offsets(log, mtype, flen)
+            for mtype, flen in lengths.items()]
+
+    start = end = None
+    for ofs, flen in heapq.merge(*streams):
+        if ofs + flen > log.data_len:
+            # cut off at the end of the file
+            continue
+        if ofs == end:
+            end += flen
+            continue
+        if start is not None:
+            yield (start, end)
+        start, end = ofs, ofs + flen
+    if start is not None:
+        yield (start, end)
+
+def _type_offsets(log, mtype, flen):
+    for ofs in log.offsets[mtype]:
+        yield (ofs, flen)
+
+def redact_packet_types(log, filename, keep, cancel=None):
+    """
+    Write a copy of a binary log containing only the given message types.
+
+    This works purely off the log's offset index, so messages being dropped
+    are never decoded, and everything being kept is copied byte-for-byte.
+
+    :param log: DFReader_binary to copy from
+    :param filename: path to write the new log to.  must not already exist
+    :param keep: set of message names to keep, e.g. from select_packet_types
+    :param cancel: checked after every chunk written (see
+        processor.cancel.CancelToken).  if the copy is stopped part way, the
+        partial file is deleted
+    :return: the number of bytes written
+    """
+    src = log.data_map
+    written = 0
+    with open(filename, 'xb') as out:
+        try:
+            pending = []
+            pending_len = 0
+            for start, end in kept_ranges(log, keep):
+                pending.append(src[start:end])
+                pending_len += end - start
+                if pending_len >= COPY_CHUNK:
+                    out.write(b''.join(pending))
+                    written += pending_len
+                    pending = []
+                    pending_len = 0
+                    if cancel is not None:
+                        cancel.check()
+            out.write(b''.join(pending))
+            written += pending_len
+        except BaseException:
+            out.close()
+            os.remove(filename)
+            raise
+    return written
+
 def filter_data_type(messages, msgfilter='.*', replace=0, reverse=True):
     """
     Given a list of messages (i.e. DFReader_auto.all_messages), and a
@@ -65,12 +167,12 @@ def filter_data_type(messages, msgfilter='.*', replace=0, reverse=True):
             break  # at the end
         d = msg.to_dict()
         prefix = d.pop('mavpackettype')
-        for key in list(d.keys()):
+        for key in d.keys():
             checkstr = '.'.join([prefix, key])
-            if reobj.match(checkstr) and (not reverse):
-                d[key] = replace
-            elif (not reobj.match(checkstr)) and (reverse):
-                d[key] = replace
-            msg.__setattr__(key, d[key])
+            # only touch the fields being replaced, so that everything else
+            # is left exactly as it was read (and can be copied straight out
+            # by DFWriter_binary)
+            if bool(reobj.match(checkstr)) != reverse:
+                msg.__setattr__(key, replace)
     return messages
 
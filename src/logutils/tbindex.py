@@ -0,0 +1,190 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Sidecar index files for binary logs.
+
+Opening a DFReader_binary means scanning the whole log to find every message
+and work out its clock.  The results of that scan can be saved next to the log
+(flight.bin -> flight.bin.tbidx) so that opening it again only has to load
+them back.
+
+A sidecar is a zip file holding a JSON description of the log (formats, clock,
+counts) and the offsets of every message as raw uint64 arrays.  It's tied to
+the log by its size, modification time and a hash of its whole contents; if
+any of those don't match, the sidecar is ignored and rebuilt.  Hashing the log
+is still far quicker than scanning it, and it means a log edited in place
+(even with its modification time put back) is never read with a stale index.
+"""
+
+import array
+import hashlib
+import json
+import os
+import sys
+import zipfile
+
+SIDECAR_EXT = '.tbidx'
+
+# bump this whenever the layout of a sidecar changes, so old ones get rebuilt
+INDEX_VERSION = 2
+
+# how much of the log is hashed at a time, when it isn't already mapped
+HASH_BLOCK = 1 << 20
+
+_META_NAME = 'meta.json'
+_OFFSETS_NAME = 'offsets.bin'
+
+
+def sidecar_path(filename):
+    return filename + SIDECAR_EXT
+
+
+def file_key(filename, data_map=None):
+    """
+    Identify the current contents of a log: its size, modification time and a
+    hash of all of it.  data_map, if given, is the log already mapped into
+    memory.
+    """
+    st = os.stat(filename)
+    h = hashlib.blake2b(digest_size=16)
+    if data_map is not None:
+        h.update(data_map)
+    else:
+        with open(filename, 'rb') as f:
+            block = f.read(HASH_BLOCK)
+            while block:
+                h.update(block)
+                block = f.read(HASH_BLOCK)
+    return {
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'hash': h.hexdigest(),
+        }
+
+
+def save_index(log, filename, options):
+    """
+    Write out the sidecar for a freshly opened DFReader_binary.  options is
+    anything else that changes the result of the scan (e.g. zero_time_base);
+    a sidecar saved with different options won't be loaded.
+
+    Failing to write it (read-only directory, etc.) isn't an error: the log
+    will just be scanned again next time.
+    """
+    offsets = array.array('Q')
+    offset_lengths = []
+    for type_offsets in log.offsets:
+        offsets.extend(type_offsets)
+        offset_lengths.append(len(type_offsets))
+    if sys.byteorder != 'little':
+        offsets.byteswap()
+
+    meta = {
+            'version': INDEX_VERSION,
+            'key': file_key(filename, log.data_map),
+            'options': options,
+            'formats': [_format_to_json(fmt) for fmt in log.formats.values()],
+            'name_to_id': log.name_to_id,
+            'counts': log.counts,
+            'offset_lengths': offset_lengths,
+            'clock': _clock_to_json(log.clock),
+            'mav_type': log.mav_type,
+        }
+
+    path = sidecar_path(filename)
+    tmp = path + '.tmp'
+    try:
+        with zipfile.ZipFile(tmp, 'w', zipfile.ZIP_STORED) as zf:
+            zf.writestr(_META_NAME, json.dumps(meta))
+            zf.writestr(_OFFSETS_NAME, offsets.tobytes())
+        os.replace(tmp, path)
+    except OSError as e:
+        print("Couldn't write index {}: {}".format(path, e), file=sys.stderr)
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+def load_index(log, filename, options):
+    """
+    Fill in a DFReader_binary's index and clock from its sidecar.  Returns
+    False, leaving the log untouched, if there's no usable sidecar.
+    """
+    path = sidecar_path(filename)
+    if not os.path.exists(path):
+        return False
+    try:
+        with zipfile.ZipFile(path, 'r') as zf:
+            meta = json.loads(zf.read(_META_NAME))
+            if meta['version'] != INDEX_VERSION or \
+                    meta['options'] != options or \
+                    meta['key'] != file_key(filename, log.data_map):
+                return False
+            offsets = array.array('Q')
+            offsets.frombytes(zf.read(_OFFSETS_NAME))
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        # unreadable or from something else entirely; rebuild it
+        return False
+    if sys.byteorder != 'little':
+        offsets.byteswap()
+
+    # imported here as DFReader imports this module
+    from . import DFReader as dfr
+    try:
+        clock = _clock_from_json(dfr, meta['clock'])
+    except (AttributeError, TypeError, ValueError):
+        return False
+
+    formats = {}
+    for fmt in meta['formats']:
+        formats[fmt[0]] = _format_from_json(dfr, fmt)
+    log.formats = formats
+    log.name_to_id = meta['name_to_id']
+    log.id_to_name = dict([(v, k) for k, v in log.name_to_id.items()])
+    log.counts = meta['counts']
+    log._count = sum(log.counts)
+
+    log.offsets = []
+    pos = 0
+    for n in meta['offset_lengths']:
+        log.offsets.append(offsets[pos:pos+n])
+        pos += n
+
+    log.clock = clock
+    log.mav_type = meta['mav_type']
+    return True
+
+
+def _format_to_json(fmt):
+    return [fmt.type, fmt.name, fmt.len, fmt.format, ','.join(fmt.columns),
+            fmt.unit_ids, fmt.mult_ids]
+
+
+def _format_from_json(dfr, fmt):
+    ftype, name, flen, format, columns, unit_ids, mult_ids = fmt
+    mfmt = dfr.DFFormat(ftype, name, flen, format, columns)
+    mfmt.set_unit_ids(unit_ids)
+    mfmt.set_mult_ids(mult_ids)
+    return mfmt
+
+
+def _clock_to_json(clock):
+    if clock is None:
+        return None
+    return {
+            'class': type(clock).__name__,
+            'state': clock.__dict__,
+        }
+
+
+def _clock_from_json(dfr, clock):
+    if clock is None:
+        return None
+    cls = getattr(dfr, clock['class'])
+    if not issubclass(cls, dfr.DFReaderClock):
+        raise ValueError("Not a clock: {}".format(clock['class']))
+    ret = cls()
+    ret.__dict__.update(clock['state'])
+    return ret
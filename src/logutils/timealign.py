@@ -0,0 +1,112 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Line up two time series sampled at different times.
+
+Both functions take the timestamps and values of line A and line B, and return
+a pair of sequences (valuesA, valuesB) with one entry per sample of either line,
+in time order.  For a sample of A, the B value is worked out at that time, and
+vice versa.  Timestamps within a line must be sorted (as they are in a log).
+
+NumPy is used if it's available; otherwise a pure Python version does the same
+job with a binary search per sample.
+"""
+
+import bisect
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def align_nearest(tA, vA, tB, vB):
+    """
+    Compare each sample against the sample of the other line nearest to it in
+    time.  Exactly halfway between two samples picks the earlier one.
+    """
+    if len(tA) == 0 or len(tB) == 0:
+        return [], []
+    if np is not None:
+        atB = _np_nearest(tB, vB, tA)
+        atA = _np_nearest(tA, vA, tB)
+    else:
+        atB = [_py_nearest(tB, vB, t) for t in tA]
+        atA = [_py_nearest(tA, vA, t) for t in tB]
+    return _merge(tA, vA, atB, tB, atA, vB)
+
+
+def align_lininterp(tA, vA, tB, vB):
+    """
+    Compare each sample against the other line linearly interpolated to the
+    same time.  Before the first and after the last sample of the other line,
+    its first or last value is held.
+    """
+    if len(tA) == 0 or len(tB) == 0:
+        return [], []
+    if np is not None:
+        atB = np.interp(np.asarray(tA, dtype=np.float64),
+                np.asarray(tB, dtype=np.float64),
+                np.asarray(vB, dtype=np.float64))
+        atA = np.interp(np.asarray(tB, dtype=np.float64),
+                np.asarray(tA, dtype=np.float64),
+                np.asarray(vA, dtype=np.float64))
+    else:
+        atB = [_py_interp(tB, vB, t) for t in tA]
+        atA = [_py_interp(tA, vA, t) for t in tB]
+    return _merge(tA, vA, atB, tB, atA, vB)
+
+
+def _merge(tA, vA, atB, tB, atA, vB):
+    """
+    Interleave the A-sampled and B-sampled pairs in time order (A first on a
+    tie, to match the order they'd come out of the log).
+    """
+    if np is not None:
+        times = np.concatenate((np.asarray(tA), np.asarray(tB)))
+        order = np.argsort(times, kind='stable')
+        outA = np.concatenate((np.asarray(vA, dtype=np.float64),
+            np.asarray(atA, dtype=np.float64)))[order]
+        outB = np.concatenate((np.asarray(atB, dtype=np.float64),
+            np.asarray(vB, dtype=np.float64)))[order]
+        return outA, outB
+    pairs = sorted(
+            [(t, 0, a, b) for t, a, b in zip(tA, vA, atB)] +
+            [(t, 1, a, b) for t, a, b in zip(tB, atA, vB)],
+            key=lambda p: (p[0], p[1]))
+    return [p[2] for p in pairs], [p[3] for p in pairs]
+
+
+def _np_nearest(times, values, at):
+    times = np.asarray(times, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    at = np.asarray(at, dtype=np.float64)
+    right = np.searchsorted(times, at, side='left')
+    right = np.clip(right, 0, len(times) - 1)
+    left = np.clip(right - 1, 0, len(times) - 1)
+    use_left = (at - times[left]) <= (times[right] - at)
+    return np.where(use_left, values[left], values[right])
+
+
+def _py_nearest(times, values, t):
+    right = bisect.bisect_left(times, t)
+    if right >= len(times):
+        return values[-1]
+    if right == 0:
+        return values[0]
+    left = right - 1
+    if t - times[left] <= times[right] - t:
+        return values[left]
+    return values[right]
+
+
+def _py_interp(times, values, t):
+    right = bisect.bisect_left(times, t)
+    if right >= len(times):
+        return values[-1]
+    if right == 0 or times[right] == t:
+        return values[right]
+    left = right - 1
+    m = (values[right] - values[left]) / (times[right] - times[left])
+    return m * (t - times[left]) + values[left]
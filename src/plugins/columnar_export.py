@@ -0,0 +1,285 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+GUI plugin to export a log as columnar tables (Parquet or Arrow IPC).
+
+Every message type becomes its own table, read a batch at a time straight out
+of the binary log with DFReader_binary.get_columns.  Needs NumPy and PyArrow.
+"""
+
+import os
+import tkinter as tk
+import src.plugins.pluginbase as pluginbase
+import src.logutils.DFReader as dfreader
+
+try:
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    # the plugin can't do anything without these, but that shouldn't stop
+    # the rest of TrashBin from loading
+    np = None
+    pa = None
+
+CFMT_PARQUET = 0
+CFMT_ARROW = 1
+
+CFMT_EXTENSIONS = {
+        CFMT_PARQUET: 'parquet',
+        CFMT_ARROW: 'arrow',
+    }
+
+# how many messages of one type are read and written at a time.  each batch
+# becomes one row group (Parquet) or record batch (Arrow)
+DEFAULT_BATCH_ROWS = 65536
+
+
+class ColumnarExportFactory(pluginbase.TBPluginFactory):
+
+    author_name = 'Misha Turnbull'
+    author_email = 'misha@turnbull.link'
+    plugin_name = "Columnar export"
+    plugin_desc = "This plugin exports every message type in a binary log " \
+            "as a Parquet or Arrow table.  Requires NumPy and PyArrow."
+
+    def __init__(self, handler):
+        super().__init__(handler)
+        self.output = tk.IntVar()
+        self.output.set(CFMT_PARQUET)
+        self.timestamps = tk.BooleanVar()
+        self.timestamps.set(True)
+        self.types = tk.StringVar()
+        self.types.set('')
+        self.batch_rows = tk.IntVar()
+        self.batch_rows.set(DEFAULT_BATCH_ROWS)
+
+    @property
+    def work_per_file(self):
+        return 1
+
+    def start_ui(self, frame):
+        self.modeframe = tk.LabelFrame(frame, text='Output type',
+                relief=tk.RIDGE)
+        self.modeframe.grid(row=0, column=0, sticky='new')
+        rb_parquet = tk.Radiobutton(self.modeframe,
+                text='Parquet',
+                variable=self.output,
+                value=CFMT_PARQUET,
+            )
+        rb_arrow = tk.Radiobutton(self.modeframe,
+                text='Arrow IPC',
+                variable=self.output,
+                value=CFMT_ARROW,
+            )
+        rb_parquet.grid(row=0, column=0, sticky='nw')
+        rb_arrow.grid(row=1, column=0, sticky='nw')
+
+        self.optsframe = tk.LabelFrame(frame, text='Options',
+                relief=tk.RIDGE)
+        self.optsframe.grid(row=1, column=0, sticky='new')
+        tsbox = tk.Checkbutton(self.optsframe, text='Timestamp column',
+                variable=self.timestamps, onvalue=True, offvalue=False)
+        tsbox.grid(row=0, column=0, columnspan=2, sticky='nw')
+        tk.Label(self.optsframe, text='Message types (regex, blank for all)'
+                ).grid(row=1, column=0, columnspan=2, sticky='nw')
+        typesbox = tk.Entry(self.optsframe, textvariable=self.types)
+        typesbox.grid(row=2, column=0, columnspan=2, sticky='new')
+        tk.Label(self.optsframe, text='Rows per batch:').grid(
+                row=3, column=0, sticky='nw')
+        batchbox = tk.Entry(self.optsframe, textvariable=self.batch_rows)
+        batchbox.grid(row=3, column=1, sticky='new')
+        self.optsframe.grid_columnconfigure(1, weight=1)
+
+        if np is None or pa is None:
+            tk.Label(self.optsframe, fg='red',
+                    text='NumPy and PyArrow need to be installed!').grid(
+                    row=4, column=0, columnspan=2, sticky='nw')
+
+    def stop_ui(self, frame):
+        self.modeframe.destroy()
+        self.optsframe.destroy()
+
+    def export_savestate(self):
+        return {
+                'mode': self.output.get(),
+                'timestamps': self.timestamps.get(),
+                'types': self.types.get(),
+                'batch_rows': self.batch_rows.get(),
+            }
+
+    def load_savestate(self, state):
+        self.output.set(state['mode'])
+        self.timestamps.set(state['timestamps'])
+        self.types.set(state['types'])
+        self.batch_rows.set(state['batch_rows'])
+
+    def cleanup_and_exit(self):
+        pass
+
+    def give_plugin(self, processor=None):
+        plug = ColumnarExportPlugin(self,
+                processor,
+                self.output.get(),
+                self.timestamps.get(),
+                self.types.get(),
+                self.batch_rows.get(),
+            )
+        return plug
+
+
+class ColumnarExportPlugin(pluginbase.TrashBinPlugin):
+    """
+    Does the exporting.  Works straight off the log's type index, so doesn't
+    need any messages parsed.
+    """
+
+    message_types = set()
+
+    def __init__(self, handler, processor, mode, timestamps, types,
+            batch_rows):
+        super().__init__(handler, processor)
+        self.mode = mode
+        self.timestamps = timestamps
+        self.types = types
+        self.batch_rows = max(int(batch_rows), 1)
+        self.infilename = None
+        self.outbase = None
+        self.dflog = None
+
+    def run_filename(self, filename):
+        self.infilename = filename
+        self.outbase = os.path.splitext(filename)[0]
+
+    def run_parsedlog(self, dflog):
+        if np is None or pa is None:
+            print("ColumnarExport: NumPy and PyArrow are needed, skipping "
+                    "{}".format(self.infilename))
+        elif not isinstance(dflog, dfreader.DFReader_binary):
+            print("ColumnarExport: {} isn't a binary log, skipping".format(
+                self.infilename))
+        else:
+            self.dflog = dflog
+
+    def run_stream_end(self):
+        if self.dflog is not None:
+            if self.types:
+                names = self.dflog.match_types([self.types])
+            else:
+                names = self.dflog.name_to_id.keys()
+            for name in sorted(names):
+                self.export_type(name)
+            self.dflog = None
+        self.handler.notify_work_done(1)
+
+    def run_cancelled(self):
+        # the tables already finished are only part of the export, so they
+        # go too
+        for filename in self.outputs:
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+        self.outputs = []
+        self.dflog = None
+
+    def type_filename(self, name):
+        return "{}_{}.{}".format(self.outbase, name,
+                CFMT_EXTENSIONS[self.mode])
+
+    def export_type(self, name):
+        """
+        Write every message of one type out to its own file, a batch at a
+        time.
+        """
+        mtype = self.dflog.name_to_id[name]
+        fmt = self.dflog.formats[mtype]
+        count = len(self.dflog.offsets[mtype])
+        if count == 0:
+            return
+
+        filename = self.type_filename(name)
+        if os.path.exists(filename):
+            raise FileExistsError("File exists")
+        writer = None
+        try:
+            for start in range(0, count, self.batch_rows):
+                self.check_cancelled()
+                try:
+                    cols = self.dflog.get_columns(name, as_dict=True,
+                            start=start, stop=start + self.batch_rows)
+                except ValueError as e:
+                    print("ColumnarExport: can't export {}: {}".format(
+                        name, e))
+                    return
+                table = self._make_table(fmt, cols)
+                if writer is None:
+                    writer = self._open_writer(filename, table.schema)
+                    self.outputs.append(filename)
+                writer.write_table(table)
+        except BaseException:
+            # stopped or failed part way; don't leave half a table behind
+            if writer is not None:
+                writer.close()
+                writer = None
+                os.remove(filename)
+                self.outputs.remove(filename)
+            raise
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def _open_writer(self, filename, schema):
+        if self.mode == CFMT_ARROW:
+            return pa.ipc.new_file(filename, schema)
+        return pa.parquet.ParquetWriter(filename, schema)
+
+    def _make_table(self, fmt, cols):
+        names = []
+        arrays = []
+        if self.timestamps:
+            stamps = _timestamps(self.dflog.clock, fmt, cols)
+            if stamps is not None:
+                names.append('timestamp')
+                arrays.append(pa.array(stamps))
+        for i, col in enumerate(fmt.columns[:len(fmt.msg_fmts)]):
+            names.append(col)
+            arrays.append(_to_arrow(fmt, i, cols[col]))
+        return pa.Table.from_arrays(arrays, names=names)
+
+
+def _to_arrow(fmt, i, values):
+    """
+    Turn one column from get_columns into an Arrow array of the type given by
+    the format.
+    """
+    if fmt.msg_fmts[i] == 'a':
+        # fixed-length arrays of int16
+        flat = pa.array(values.reshape(-1))
+        return pa.FixedSizeListArray.from_arrays(flat, values.shape[1])
+    if fmt.msg_types[i] == str:
+        # cut off at the first null, as null_term does
+        return pa.array([v.split(b'\0', 1)[0].decode('utf-8', 'replace')
+                for v in values.tolist()], type=pa.string())
+    return pa.array(values)
+
+
+def _timestamps(clock, fmt, cols):
+    """
+    Work out the timestamp of every message in a batch from the log's clock,
+    for the clocks where that depends only on the message itself.  Returns
+    None otherwise.
+    """
+    if len(fmt.columns) == 0:
+        return None
+    first = fmt.columns[0]
+    if isinstance(clock, dfreader.DFReaderClock_usec) and first == 'TimeUS':
+        return clock.timebase + cols['TimeUS'] * 0.000001
+    if isinstance(clock, dfreader.DFReaderClock_msec):
+        if first == 'TimeMS':
+            return clock.timebase + cols['TimeMS'] * 0.001
+        if fmt.name in ['GPS', 'GPS2']:
+            return clock.timebase + cols['T'] * 0.001
+    return None
@@ -29,6 +29,10 @@ class LogFormatConverter(pluginbase.TBPluginFactory):
         self.output.set(LFMT_TEXT)
         self.force = tk.BooleanVar()
         self.force.set(False)
+        self.timestamps = tk.BooleanVar()
+        self.timestamps.set(False)
+        self.types = tk.StringVar()
+        self.types.set('')
 
     @property
     def work_per_file(self):
@@ -53,10 +57,7 @@ class LogFormatConverter(pluginbase.TBPluginFactory):
                 variable=self.output,
                 value=LFMT_CSV,
             )
-        # to remain commented out until facilities exist for exporting files
-        # in binary format.  doesn't make much sense to advertise a feature
-        # that doesn't work
-        #rb_binary.grid(row=0, column=0, sticky='nw')
+        rb_binary.grid(row=0, column=0, sticky='nw')
         rb_text.grid(row=1, column=0, sticky='nw')
         rb_csv.grid(row=2, column=0, sticky='nw')
 
@@ -66,19 +67,36 @@ class LogFormatConverter(pluginbase.TBPluginFactory):
                 variable=self.force, onvalue=True, offvalue=False)
         forcebox.grid(row=0, column=0, sticky='nw')
 
+        self.csvframe = tk.LabelFrame(frame, text='CSV options',
+                relief=tk.RIDGE)
+        self.csvframe.grid(row=2, column=0, sticky='new')
+        tsbox = tk.Checkbutton(self.csvframe, text='Timestamp column',
+                variable=self.timestamps, onvalue=True, offvalue=False)
+        tsbox.grid(row=0, column=0, columnspan=2, sticky='nw')
+        tk.Label(self.csvframe, text='Message types (regex, blank for all)'
+                ).grid(row=1, column=0, columnspan=2, sticky='nw')
+        typesbox = tk.Entry(self.csvframe, textvariable=self.types)
+        typesbox.grid(row=2, column=0, columnspan=2, sticky='new')
+        self.csvframe.grid_columnconfigure(0, weight=1)
+
     def stop_ui(self, frame):
         self.modeframe.destroy()
         self.optsframe.destroy()
+        self.csvframe.destroy()
 
     def export_savestate(self):
         return {
                 'mode': self.output.get(),
                 'force': self.force.get(),
+                'timestamps': self.timestamps.get(),
+                'types': self.types.get(),
             }
 
     def load_savestate(self, state):
         self.output.set(state['mode'])
         self.force.set(state['force'])
+        self.timestamps.set(state.get('timestamps', False))
+        self.types.set(state.get('types', ''))
 
     def cleanup_and_exit(self):
         pass
@@ -88,18 +106,33 @@ class LogFormatConverter(pluginbase.TBPluginFactory):
                 processor,
                 self.output.get(),
                 self.force.get(),
+                timestamps=self.timestamps.get(),
+                types=self.types.get(),
             )
         return plug
 
 
 class LogConvPlugin(pluginbase.TrashBinPlugin):
 
-    def __init__(self, handler, processor, mode, force):
+    random_access = True
+
+    def __init__(self, handler, processor, mode, force, timestamps=False,
+            types=''):
         super().__init__(handler, processor)
         self.mode = mode
         self.force = force
+        self.timestamps = timestamps
         self.infilename = None
         self.outfilename = None
+        self.writer = None
+        if self.mode == LFMT_TEXT:
+            # text is written out as the messages are read
+            self.random_access = False
+        elif self.mode == LFMT_CSV:
+            # as is CSV, and only the wanted types need to be read at all
+            self.random_access = False
+            if types:
+                self.message_types = set([types])
 
     def run_filename(self, filename):
         self.infilename = filename
@@ -110,27 +143,55 @@ class LogConvPlugin(pluginbase.TrashBinPlugin):
         elif self.mode == LFMT_TEXT:
             newext = 'log'
         elif self.mode == LFMT_CSV:
-            newext = 'csv'
+            # one file per message type, named from this
+            self.outfilename = infn_noext
+            return
         self.outfilename = '.'.join([infn_noext, newext])
 
+    def run_parsedlog(self, dflog):
+        if self.mode == LFMT_TEXT:
+            self.writer = dfwriter.DFWriter_text(None, self.outfilename,
+                    cancel=self.cancel)
+            self.outputs.append(self.outfilename)
+        elif self.mode == LFMT_CSV:
+            self.writer = dfwriter.DFWriter_csv(None, self.outfilename,
+                    timestamps=self.timestamps, cancel=self.cancel)
+
+    def run_message(self, message):
+        # binary output is written from run_messages instead
+        if self.writer is not None:
+            self.writer.write_message(message)
+
+    def run_stream_end(self):
+        if self.writer is not None:
+            self.writer.close_file()
+            if self.mode == LFMT_CSV:
+                self.outputs.extend(self.writer.filenames)
+            self.writer = None
+            self.handler.notify_work_done(1)
+
+    def run_cancelled(self):
+        # don't leave a half-converted log lying around
+        if self.writer is not None:
+            self.writer.discard()
+            self.writer = None
+
     def run_messages(self, messages):
         self.messages = messages
         if self.mode == LFMT_TEXT:
             self._conv_to_text(self.messages)
         elif self.mode == LFMT_BINARY:
             self._conv_to_binary(self.messages)
-        elif self.mode == LFMT_CSV:
-            self._conv_to_csv(self.messages)
 
     def _conv_to_text(self, messages):
-        dfw_t = dfwriter.DFWriter_text(messages, self.outfilename)
+        dfw_t = dfwriter.DFWriter_text(messages, self.outfilename,
+                cancel=self.cancel)
+        self.outputs.append(self.outfilename)
         self.handler.notify_work_done(1)
 
     def _conv_to_binary(self, messages):
-        raise NotImplemented
-
-    def _conv_to_csv(self, messages):
-        # turns out csv files are the same as regular text, but with a
-        # different extension!
-        self._conv_to_text(messages)
+        dfw_b = dfwriter.DFWriter_binary(messages, self.outfilename,
+                cancel=self.cancel)
+        self.outputs.append(self.outfilename)
+        self.handler.notify_work_done(1)
 
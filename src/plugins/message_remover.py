@@ -11,6 +11,10 @@ import tkinter.ttk as ttk
 import src.plugins.pluginbase as pluginbase
 import src.logutils.message_remover as message_remover
 import src.logutils.DFWriter as dfwriter
+import src.logutils.DFReader as dfreader
+
+OUT_TEXT = 0
+OUT_BINARY = 1
 
 
 class MessageRemoverFactory(pluginbase.TBPluginFactory):
@@ -34,6 +38,8 @@ class MessageRemoverFactory(pluginbase.TBPluginFactory):
         self.nukemode.set(True)
         self.replace = tk.StringVar()
         self.replace.set('Zero')
+        self.outformat = tk.IntVar()
+        self.outformat.set(OUT_TEXT)
 
     @property
     def replace_val(self):
@@ -108,6 +114,22 @@ class MessageRemoverFactory(pluginbase.TBPluginFactory):
         filterframe.grid_rowconfigure(2, weight=1)
         filterframe.grid_columnconfigure(0, weight=1)
         filterframe.grid(row=2, column=0, sticky='nesw')
+
+        self.outframe = tk.LabelFrame(frame, text='Output format',
+                relief=tk.RIDGE)
+        self.outframe.grid(row=3, column=0, sticky='nw')
+        rb_text = tk.Radiobutton(self.outframe,
+                text='Text (.tb.log)',
+                variable=self.outformat,
+                value=OUT_TEXT,
+            )
+        rb_binary = tk.Radiobutton(self.outframe,
+                text='Binary (.tb.bin)',
+                variable=self.outformat,
+                value=OUT_BINARY,
+            )
+        rb_text.grid(row=0, column=0, sticky='nw')
+        rb_binary.grid(row=1, column=0, sticky='nw')
         frame.grid_rowconfigure(2, weight=1)
         frame.grid_columnconfigure(0, weight=1)
 
@@ -126,6 +148,7 @@ class MessageRemoverFactory(pluginbase.TBPluginFactory):
                 'nukemode': self.nukemode.get(),
                 'replace': self.replace.get(),
                 'filter': self.filter.get(),
+                'outformat': self.outformat.get(),
             }
 
     def load_savestate(self, state):
@@ -133,6 +156,7 @@ class MessageRemoverFactory(pluginbase.TBPluginFactory):
         self.nukemode.set(state['nukemode'])
         self.replace.set(state['replace'])
         self.filter.set(state['filter'])
+        self.outformat.set(state.get('outformat', OUT_TEXT))
 
     def cleanup_and_exit(self):
         pass
@@ -146,6 +170,7 @@ class MessageRemoverFactory(pluginbase.TBPluginFactory):
                 replace=self.replace_val,
                 msgfilter=self.filter.get(),
                 forceoutput=False,
+                outformat=self.outformat.get(),
             )
         return plug
 
@@ -155,24 +180,86 @@ class MessageRemoverPlugin(pluginbase.TrashBinPlugin):
     """
 
     total_work = 10
+    random_access = True
 
     def __init__(self, handler, proc, whitelist, nukemode, replace, msgfilter, 
-            forceoutput):
+            forceoutput, outformat=OUT_TEXT):
         super().__init__(handler, proc)
         self.whitelist = whitelist
         self.nukemode = nukemode
         self.replace = replace
         self.msgfilter = msgfilter
         self.forceoutput = forceoutput
+        self.outformat = outformat
         self.infilename = None
         self.outfilename = None
+        self.dflog = None
+        self.keep = None
+        self.writer = None
 
     def run_filename(self, filename):
         self.infilename = filename
         if self.outfilename is None:
-            self.outfilename = os.path.splitext(filename)[0] + '.tb.log'
+            if self.outformat == OUT_BINARY:
+                ext = '.tb.bin'
+            else:
+                ext = '.tb.log'
+            self.outfilename = os.path.splitext(filename)[0] + ext
         self.handler.notify_work_done(1)
 
+    def run_parsedlog(self, dflog):
+        # in nuke mode, which types to keep is worked out from the log's
+        # formats, so the messages being dropped are never decoded
+        if not self.nukemode:
+            return
+        keep = message_remover.select_packet_types(
+                dflog,
+                msgtypes=[self.msgfilter],
+                keep_matching=self.whitelist,
+            )
+        self.keep = keep
+        binary = isinstance(dflog, dfreader.DFReader_binary)
+        if self.outformat == OUT_BINARY and not binary:
+            # DFWriter_binary needs every message up front, so this one still
+            # goes through run_messages
+            return
+        self.dflog = dflog
+        self.random_access = False
+        if self.outformat == OUT_BINARY:
+            # straight copy of the kept byte ranges, no messages needed
+            self.message_types = set()
+        else:
+            # only the kept types are read, and written out as they are
+            self.writer = dfwriter.DFWriter_text(None, self.outfilename,
+                    cancel=self.cancel)
+            self.outputs.append(self.outfilename)
+            self.message_types = keep
+
+    def run_message(self, message):
+        # only streaming in nuke mode with text output; otherwise it's all
+        # done in run_messages or run_stream_end
+        if self.writer is not None:
+            self.writer.write_message(message)
+
+    def run_stream_end(self):
+        if self.dflog is None:
+            return
+        self.handler.notify_work_done(1)
+        if self.writer is None:
+            message_remover.redact_packet_types(self.dflog, self.outfilename,
+                    self.keep, cancel=self.cancel)
+            self.outputs.append(self.outfilename)
+        else:
+            self.writer.close_file()
+            self.writer = None
+        self.handler.notify_work_done(8)
+
+    def run_cancelled(self):
+        # don't leave a half-written log behind
+        if self.writer is not None:
+            self.writer.discard()
+            self.writer = None
+
     def run_messages(self, messages):
         # parsing the messages is a decent task in itself
         self.handler.notify_work_done(1)
@@ -186,15 +273,8 @@ class MessageRemoverPlugin(pluginbase.TrashBinPlugin):
         self.handler.notify_work_done(1)
 
     def _nukemode(self, messages):
-        matching, nonmatching = message_remover.filter_packet_type(
-                messages,
-                msgtypes=[self.msgfilter]
-            )
-        if self.whitelist:
-            res = matching
-        else:
-            res = nonmatching
-        return res
+        keep = self.keep
+        return [msg for msg in messages if msg.get_type() in keep]
 
     def _razor(self, messages):
         new_msgs = message_remover.filter_data_type(
@@ -206,6 +286,12 @@ class MessageRemoverPlugin(pluginbase.TrashBinPlugin):
         return new_msgs
 
     def output(self, new):
-        dfw = dfwriter.DFWriter_text(new, self.outfilename)
+        if self.outformat == OUT_BINARY:
+            dfw = dfwriter.DFWriter_binary(new, self.outfilename,
+                    cancel=self.cancel)
+        else:
+            dfw = dfwriter.DFWriter_text(new, self.outfilename,
+                    cancel=self.cancel)
+        self.outputs.append(self.outfilename)
 
 
@@ -114,12 +114,12 @@ class ParamExtractFactory(pluginbase.TBPluginFactory):
     
     def give_plugin(self, processor=None):
         plug = ParamExtractPlugin(self,
+                processor,
                 self.multivalhandle.get(),
                 [self.paramfilter.get()],
                 self.force_output.get(),
                 self.coop_info.get(),
             )
-        print('pef giving plugin {}'.format(plug))
         return plug
 
 class ParamExtractPlugin(pluginbase.TrashBinPlugin):
@@ -127,40 +127,43 @@ class ParamExtractPlugin(pluginbase.TrashBinPlugin):
     Does the work of extracting the parameters from a log.
     """
     total_work = 3
+    # parameters only ever live in PARM messages
+    message_types = set(['PARM'])
 
-    def __init__(self, handler, multivalhandle, paramfilter, forceoutput, coop):
-        self.handler = handler
+    def __init__(self, handler, processor, multivalhandle, paramfilter,
+            forceoutput, coop):
+        super().__init__(handler, processor)
         self.multivalhandle = multivalhandle
         self.paramfilter = paramfilter
         self.forceoutput = forceoutput
         self.outfilename = None
         self.coop = coop
+        self.params = None
+        self.collector = extract_params.ParamCollector(multivalhandle,
+                paramfilter)
     
     def run_filename(self, filename):
-        print("entering pep.run_filename")
         self.infilename = filename
         if self.outfilename is None:
             self.outfilename = os.path.splitext(filename)[0] + '.param'
         self.handler.notify_work_done()
-        print('exited')
-
-    def run_parsedlog(self, dflog):
-        print("entering pep.run_parsedlog")
-        self.params = extract_params.grab_params_complex(
-                dflog,
-                multivalhandle=self.multivalhandle,
-                paramfilter=self.paramfilter,
-            )
+
+    def run_message(self, message):
+        self.collector.add(message)
+
+    def run_stream_end(self):
+        self.params = self.collector.params
         self.handler.notify_work_done()
-        extract_params.write_out_file(
+        written = extract_params.write_out_file(
                 extract_params.params_to_filecontents(self.params),
                 self.outfilename,
                 force=self.forceoutput,
             )
+        if written is not False:
+            self.outputs.append(self.outfilename)
         self.handler.notify_work_done()
         if self.coop:
-            self.coopdata['params'] = params
-        print('exited')
+            self.coopdata['params'] = self.params
 
     def cleanup_and_exit(self):
         # self.params can have over a thousand doubles, this could free up some
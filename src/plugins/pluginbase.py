@@ -85,6 +85,14 @@ class TrashBinPlugin(object):
     Base class for a TrashBin plugin.
     """
     total_work = 0
+    # set to True if run_messages is needed.  the full list of messages is
+    # only built when at least one plugin asks for it; everything else should
+    # use run_message, which sees each message as it is parsed
+    random_access = False
+    # set of message type names (or regexes matching whole names) this plugin
+    # wants to see.  None means every message; messages nobody subscribes to
+    # are never decoded
+    message_types = None
 
     def __init__(self, handler, processor=None):
         """
@@ -97,6 +105,9 @@ class TrashBinPlugin(object):
         self.handler = handler
         self.processor = processor
         self.debug = self.handler.debug
+        # every file written for the log being processed, so that watching a
+        # folder doesn't take them for new logs
+        self.outputs = []
 
     @property
     def uuid(self):
@@ -106,6 +117,22 @@ class TrashBinPlugin(object):
     def coopdata(self):
         return self.processor.data
 
+    @property
+    def cancel(self):
+        """
+        The processor's CancelToken, or None if there isn't one.  Pass this on
+        to anything that loops for a while (e.g. DFWriter).
+        """
+        return getattr(self.processor, 'cancel', None)
+
+    def check_cancelled(self):
+        """
+        Raise processor.cancel.Cancelled if the batch has been stopped.  Long
+        loops should call this every so often.
+        """
+        if self.cancel is not None:
+            self.cancel.check()
+
     def cleanup_and_exit(self):
         raise NotImplemented("Method cleanup_and_exit must be overriden!")
 
@@ -118,6 +145,18 @@ class TrashBinPlugin(object):
     def run_parsedlog(self, dflog):
         pass
 
+    def run_message(self, message):
+        pass
+
+    def run_stream_end(self):
+        pass
+
     def run_messages(self, messages):
         pass
 
+    def run_cancelled(self):
+        """
+        Called instead of the rest of the stages if the batch is stopped part
+        way through this file.  Anything half-written should be deleted.
+        """
+        pass
@@ -66,6 +66,7 @@ class TestPlugin(pluginbase.TrashBinPlugin):
     def __init__(self, handler, processor, work_per_file):
         super().__init__(handler, processor)
         self.work_per_file = work_per_file
+        self.n_messages = 0
     
     def run_filename(self, filename):
         print("Plugin test: in run_filename: {}".format(filename))
@@ -82,8 +83,12 @@ class TestPlugin(pluginbase.TrashBinPlugin):
         self.handler.notify_work_done(self.work_per_file / 4)
         time.sleep(0.5)
 
-    def run_messages(self, messages):
-        print("Plugin test: in run_messages with len {}".format(len(messages)))
+    def run_message(self, message):
+        self.n_messages += 1
+
+    def run_stream_end(self):
+        print("Plugin test: in run_stream_end after {} messages".format(
+            self.n_messages))
         self.handler.notify_work_done(self.work_per_file / 4)
         time.sleep(0.5)
 
@@ -8,9 +8,34 @@ Same file data comparison plugin.
 import tkinter as tk
 import tkinter.ttk as ttk
 import functools
+import hashlib
+import json
 import math
 import src.plugins.pluginbase as pluginbase
 import src.logutils.DFWriter as dfwriter
+import src.logutils.timealign as timealign
+
+try:
+    import numpy as np
+except ImportError:
+    # stats fall back to being worked out one point at a time
+    np = None
+
+
+def _r_squared(n, sumA, sumB, sumAA, sumBB, sumAB):
+    """
+    Coefficient of determination between two lines (the square of Pearson's
+    correlation coefficient), from their running sums.
+    """
+    if n < 2:
+        return 0
+    covAB = n * sumAB - sumA * sumB
+    varA = n * sumAA - sumA * sumA
+    varB = n * sumBB - sumB * sumB
+    if varA <= 0 or varB <= 0:
+        # one of the lines is flat, so there's no correlation to speak of
+        return 0
+    return (covAB * covAB) / (varA * varB)
 
 
 class SFDataCompFactory(pluginbase.TBPluginFactory):
@@ -107,8 +132,7 @@ class SFDataCompFactory(pluginbase.TBPluginFactory):
         ck_rmsdiff.grid(row=4, column=0, sticky='nw')
         ck_r2 = tk.Checkbutton(statsframe, text='R^2',
                 variable=self.flags['r2'], onvalue=True, offvalue=False)
-        # will leave this commented out until it's implemented
-        #ck_r2.grid(row=5, column=0, sticky='nw')
+        ck_r2.grid(row=5, column=0, sticky='nw')
         ck_avgavg = tk.Checkbutton(statsframe, text="AvgA - AvgB",
                 variable=self.flags['avg-avg'], onvalue=True, offvalue=False)
         ck_avgavg.grid(row=6, column=0, sticky='nw')
@@ -201,7 +225,8 @@ class SFDataCompPlugin(pluginbase.TrashBinPlugin):
     """
     Does the data comparison work.
     """
-    
+    random_access = True
+
     def __init__(self, handler, processor, popup, coop, A, B, mode, unfloat, 
             flags):
         super().__init__(handler, processor)
@@ -216,10 +241,30 @@ class SFDataCompPlugin(pluginbase.TrashBinPlugin):
         self.flags = flags
         self.data = {}
         self.same_packet = self.lineA[0] == self.lineB[0]
+        # only the two packet types being compared are needed
+        self.message_types = set([self.lineA[0], self.lineB[0]])
         self._n_points = 0
         self.percent_scale = 100
         self._total_done = 0
         self._rnd_total_done = 0
+        # in batch mode, points are only collected as they're found and all
+        # the stats are worked out in one go at the end
+        self.batch = np is not None
+        self._seriesA = []
+        self._seriesB = []
+        self.dflog = None
+        # same-packet and most-recent only ever look back at the last value
+        # of each line, so they're worked out as the messages go by.  the
+        # other modes need both lines whole before lining them up
+        self._stream = None
+        if self.same_packet:
+            self._stream = self._stream_same
+        elif self.mode == 0:
+            self._stream = self._stream_mostrecent
+        if self._stream is not None:
+            self.random_access = False
+        self._last_A = None
+        self._last_B = None
 
         self.data = {
                 'rawdiff': [],
@@ -239,32 +284,92 @@ class SFDataCompPlugin(pluginbase.TrashBinPlugin):
         if self.flags['avg-avg']:
             self._rolling_avgA = 0
             self._rolling_avgB = 0
+        if self.flags['r2']:
+            self._sums = [0, 0, 0, 0, 0]
 
     def run_filename(self, filename):
         self.infilename = filename
 
+    def run_parsedlog(self, dflog):
+        # in a binary log, the lines can be read straight out as columns, in
+        # which case no messages are needed at all.  most-recent needs the
+        # interleaving of the two packets, so that one still goes by message
+        columnar = self.same_packet or self.mode in (1, 2)
+        if self.batch and columnar and hasattr(dflog, 'get_columns'):
+            self.dflog = dflog
+            self.random_access = False
+            self.message_types = set()
+            self._stream = None
+
+    def run_message(self, message):
+        if self._stream is not None:
+            self._stream(message)
+
+    def run_stream_end(self):
+        if self._stream is not None:
+            self.notify_work_done(100)
+            self._finish_stats()
+            self.percent_scale = 100 / max(self._n_points, 1)
+            self._report()
+            return
+        if self.dflog is None:
+            return
+        if self.same_packet:
+            A, B = self._columns_same()
+        else:
+            A, B = self._columns_aligned()
+        self.percent_scale = 100 / max(len(A), 1)
+        self.notify_work_done(100)
+        self._batch_stats(B, A)
+        self._report()
+
+    def _get_column(self, packet, keys):
+        try:
+            cols = self.dflog.get_columns(packet, as_dict=True)
+            return [cols[key].astype(np.float64) for key in keys]
+        except ValueError:
+            # packet isn't in this log
+            return [np.zeros(0) for key in keys]
+
+    def _columns_same(self):
+        return self._get_column(self.lineA[0], [self.lineA[1], self.lineB[1]])
+
+    def _columns_aligned(self):
+        tA, vA = self._get_column(self.lineA[0], ['TimeUS', self.lineA[1]])
+        tB, vB = self._get_column(self.lineB[0], ['TimeUS', self.lineB[1]])
+        if self.mode == 1:
+            align = timealign.align_lininterp
+        else:
+            align = timealign.align_nearest
+        A, B = align(tA, vA, tB, vB)
+        return np.asarray(A, dtype=np.float64), np.asarray(B, dtype=np.float64)
+
     def notify_work_done(self, n=0):
         self._total_done += n
-        if self._total_done >= (self._rnd_total_done + 1):
-            self._rnd_total_done += 1
-            self.handler.notify_work_done(1)
+        whole = int(self._total_done) - self._rnd_total_done
+        if whole > 0:
+            self._rnd_total_done += whole
+            self.handler.notify_work_done(whole)
+            # this gets called for every message, so a whole unit of work
+            # done is a handy point to see if we should stop
+            self.check_cancelled()
 
     def run_messages(self, messages):
         # work out the scale factor for percentage first
+        n_msgs = max(len(messages), 1)
         if self.unfloat:
-            self.percent_scale = 200 / len(messages)
+            self.percent_scale = 200 / n_msgs
         else:
-            self.percent_scale = 100 / len(messages)
+            self.percent_scale = 100 / n_msgs
 
-        if self.same_packet:
-            self._msgs_same(messages)
-        elif self.mode == 0:
-            self._msgs_mostrecent(messages)
-        elif self.mode == 1:
+        if self.mode == 1:
             self._msgs_lininterp(messages)
         elif self.mode == 2:
             self._msgs_nearest(messages)
+        self._finish_stats()
+        self._report()
 
+    def _report(self):
         if self.unfloat:
             self._unfloat_results()
 
@@ -273,6 +378,53 @@ class SFDataCompPlugin(pluginbase.TrashBinPlugin):
         if self.popup:
             self._disp_results()
 
+    def _add_point(self, fieldB, fieldA):
+        if self.batch:
+            self._seriesA.append(fieldA)
+            self._seriesB.append(fieldB)
+        else:
+            self._rolling_stats(fieldB, fieldA)
+
+    def _finish_stats(self):
+        if self.batch:
+            A = np.array(self._seriesA, dtype=np.float64)
+            B = np.array(self._seriesB, dtype=np.float64)
+            self._seriesA = []
+            self._seriesB = []
+            self._batch_stats(B, A)
+
+    def _batch_stats(self, B, A):
+        """
+        Vectorised equivalent of _rolling_stats, for arrays of every point.
+        """
+        n = len(A)
+        self._n_points += n
+        if n == 0:
+            return
+        diff = B - A
+
+        if self.flags['rawdiff']:
+            self.data['rawdiff'] = diff.tolist()
+        if self.flags['mindiff']:
+            self.data['mindiff'] = float(diff.min())
+        if self.flags['maxdiff']:
+            self.data['maxdiff'] = float(diff.max())
+        if self.flags['avgdiff']:
+            self.data['avgdiff'] = float(diff.mean())
+        if self.flags['stddev'] and n >= 2:
+            self.data['stddev'] = float(diff.std(ddof=1))
+        if self.flags['rmsdiff']:
+            self.data['rmsdiff'] = math.sqrt(
+                    self.data['avgdiff']**2 + self.data['stddev']**2
+                )
+        if self.flags['r2']:
+            self.data['r2'] = _r_squared(n,
+                    float(A.sum()), float(B.sum()),
+                    float(np.dot(A, A)), float(np.dot(B, B)),
+                    float(np.dot(A, B)))
+        if self.flags['avg-avg']:
+            self.data['avg-avg'] = float(B.mean() - A.mean())
+
     def _rolling_stats(self, fieldB, fieldA):
         self._n_points += 1
         newpoint = fieldB - fieldA
@@ -296,9 +448,8 @@ class SFDataCompPlugin(pluginbase.TrashBinPlugin):
 
         # update a rolling average
         if self.flags['avgdiff']:
-            new_avg = (self._n_points * self.data['avgdiff'] + newpoint) / \
-                    (self._n_points + 1)
-            self.data['avgdiff'] = new_avg
+            self.data['avgdiff'] += (newpoint - self.data['avgdiff']) / \
+                    self._n_points
 
         # update a rolling standard deviation
         if self.flags['stddev']:
@@ -330,231 +481,77 @@ class SFDataCompPlugin(pluginbase.TrashBinPlugin):
         # this is avg(A) - avg(B)
         # this one is also a list
         if self.flags['avg-avg']:
-            newA = (self._n_points * self._rolling_avgA + fieldA) / \
-                    (self._n_points + 1)
-            newB = (self._n_points * self._rolling_avgB + fieldB) / \
-                    (self._n_points + 1)
-            self._rolling_avgA = newA
-            self._rolling_avgB = newB
-            self.data['avg-avg'] = newB - newA
-
-    def _msgs_same(self, messages):
-        for message in messages:
-            self.notify_work_done(self.percent_scale)
-            message = message.to_dict()
-            if message['mavpackettype'] != self.lineA[0]:
-                continue
-
-            fieldA = message[self.lineA[1]]
-            fieldB = message[self.lineB[1]]
-            self._rolling_stats(fieldB, fieldA)
+            self._rolling_avgA += (fieldA - self._rolling_avgA) / \
+                    self._n_points
+            self._rolling_avgB += (fieldB - self._rolling_avgB) / \
+                    self._n_points
+            self.data['avg-avg'] = self._rolling_avgB - self._rolling_avgA
+
+        # update the running sums for the coefficient of determination
+        if self.flags['r2']:
+            sums = self._sums
+            sums[0] += fieldA
+            sums[1] += fieldB
+            sums[2] += fieldA * fieldA
+            sums[3] += fieldB * fieldB
+            sums[4] += fieldA * fieldB
+            self.data['r2'] = _r_squared(self._n_points, *sums)
+
+    def _stream_same(self, message):
+        self._add_point(getattr(message, self.lineB[1]),
+                getattr(message, self.lineA[1]))
+
+    def _stream_mostrecent(self, message):
+        # a point for every new value of either line, against the most recent
+        # value of the other, once both have been seen
+        if message.fmt.name == self.lineA[0]:
+            self._last_A = getattr(message, self.lineA[1])
+            if self._last_B is None:
+                return
+        else:
+            self._last_B = getattr(message, self.lineB[1])
+            if self._last_A is None:
+                return
+        self._add_point(self._last_B, self._last_A)
 
+    def _msgs_lininterp(self, messages):
+        self._msgs_aligned(messages, timealign.align_lininterp)
 
-    def _msgs_mostrecent(self, messages):
-        # set up some initial values
-        time_since_last_other = 0
-        last_val_A = None
-        last_val_B = None
-        last_time_A = None
-        last_time_B = None
-        # presetting these saves a few cycles on accesses during the loop
-        key_A = self.lineA[1]
-        key_B = self.lineB[1]
-        packet_A = self.lineA[0]
-        packet_B = self.lineB[0]
-        # this should always be false, but sanity-check just in case
-        assert packet_A != packet_B, "Should be using _msgs_same!"
+    def _msgs_nearest(self, messages):
+        self._msgs_aligned(messages, timealign.align_nearest)
 
-        for message in messages:
-            self.notify_work_done(self.percent_scale)
-            message = message.to_dict()
-
-            # first, figure out which message we have
-            have_lineA = message['mavpackettype'] == packet_A
-            have_lineB = message['mavpackettype'] == packet_B
-            # and if we have neither, skip this message
-            if not (have_lineA or have_lineB):
-                continue
-
-            # update the most-recent values and make skip first packet to make
-            # sure we don't deal with values that don't make sense
-            if have_lineA:
-                last_val_A = message[key_A]
-                last_time_A = message['TimeUS']
-                if last_val_B is None:
-                    continue
-            if have_lineB:
-                last_val_B = message[key_B]
-                last_time_B = message['TimeUS']
-                if last_val_A is None:
-                    continue
-            
-            # invoke the stats counter!
-            self._rolling_stats(last_val_B, last_val_A)
-
-    def _find_next_packet(self, messages, targettype, start=0, after=0):
+    def _msgs_aligned(self, messages, align):
         """
-        Look ahead in the message list to find the next packet of a given
-        type.
+        Pull both lines out of the messages as (time, value) series, then let
+        the alignment function pair up every point of each with the other.
         """
-        for message in messages[start:]:
-            if message.fmt.name == targettype:
-                if message.TimeUS > after:
-                    return message
-        return None
-
-    def _msgs_lininterp(self, messages):
-        # set up some storage for iterations and cycle reduction
-        intrpA = [[0, 0], [1, 0]]
-        intrpB = [[0, 0], [1, 0]]
         keyA = self.lineA[1]
         keyB = self.lineB[1]
         packetA = self.lineA[0]
         packetB = self.lineB[0]
-        idx = 0
+        tA, vA, tB, vB = [], [], [], []
 
-        # lets'a gooo!
         for message in messages:
             self.notify_work_done(self.percent_scale)
-            message = message.to_dict()
-
-            # do we have one of our messages
-            have_lineA = message['mavpackettype'] == packetA
-            have_lineB = message['mavpackettype'] == packetB
-            if not (have_lineA or have_lineB):
-                # not interested in other messages
-                idx += 1
-                continue
-
-            # to reduce duplicate code, we'll do some variable reassignment
-            # then only one occurance of interpolation will exist
-            # less coding good :)
-            if have_lineA:
-                key, key_other = keyA, keyB
-                intrp = intrpB
-                intrptarget = packetB
-            if have_lineB:
-                key, key_other = keyB, keyA
-                intrp = intrpA
-                intrptarget = packetA
-            singlepoint = [message['TimeUS'], message[key]]
-
-            # interpolation time... step 1: work out the line segment to use
-            # first, do we actually need to update it?
-            # determine if the next packet is newer than the last used
-            # right-side interpolation packet
-            if not (intrp[0][0] < singlepoint[0] < intrp[1][0]):
-                nxt = self._find_next_packet(messages, intrptarget,
-                        start=idx-1, after=intrp[1][0])
-                if nxt is None:
-                    return
-                nxt = nxt.to_dict()
-                # make sure the points aren't going to be the same
-                # this happens in early processing, and causes divide-by-zero
-                # later on in calculating m
-                if nxt['TimeUS'] != intrp[1][0]:
-                    intrp[0] = intrp[1]
-                    intrp[1] = [nxt['TimeUS'], nxt[key_other]]
-
-                # make sure that we don't get any weirdness with lines
-                # stretching back to the origin.  logs generally don't begin at
-                # t=0, so we'll backfill the first line segment at the same
-                # y value
-                if intrp[0][0] <= 1:
-                    intrp[0] = [2, intrp[1][1]]
-
-            # we've now sorted out the endpoints of the line segment, now need
-            # to do the interpolation itself.  standard point-slope form.
-            m = (intrp[1][1] - intrp[0][1]) / (intrp[1][0] - intrp[0][0])
-            y = m * (singlepoint[0] - intrp[0][0]) + intrp[0][1]
-
-            # we have the second point to compare!  now hand off to the stats
-            # method.  need to be careful about point order here -- otherwise,
-            # every other point will negate the one before and everything
-            # collapses
-            if have_lineA:
-                self._rolling_stats(y, singlepoint[1])
-            else:
-                self._rolling_stats(singlepoint[1], y)
-
-            idx += 1
-
-    def _msgs_nearest(self, messages):
-        # set up some reused vars
-        lrA = [[0, 0], [1, 0]]
-        lrB = [[0, 0], [1, 0]]
-        singlepoint = [0, 0]
-        compare = [0, 0]
-        keyA = self.lineA[1]
-        keyB = self.lineB[1]
-        packetA = self.lineA[0]
-        packetB = self.lineB[0]
-        idx = 0
-
-        # lets'a gooo!
-        for message in messages:
-            self.notify_work_done(self.percent_scale)
-            message = message.to_dict()
-
-            # do we have one of our messages
-            have_lineA = message['mavpackettype'] == packetA
-            have_lineB = message['mavpackettype'] == packetB
-            if not (have_lineA or have_lineB):
-                # not interested in other messages
-                idx += 1
-                continue
-
-            # we'll follow the same pattern as lininterp, switching out variable
-            # names to reduce duplicate code
-            if have_lineA:
-                leftright = lrB
-                key = keyA
-                packet_other = packetB
-                key_other = keyB
-            else:
-                leftright = lrA
-                key = keyB
-                packet_other = packetA
-                key_other = keyB
-            singlepoint = [message['TimeUS'], message[key]]
-
-            # figure out if we need to switch endpoints, and if so, do it
-            if not (leftright[0][0] <= singlepoint[0] <= leftright[1][0]):
-                nxt = self._find_next_packet(messages, packet_other,
-                        start=idx-1, after=leftright[1][0])
-                if nxt is None:
-                    return
-                nxt = nxt.to_dict()
-                # make sure the points aren't going to be the same
-                # this happens in early processing, and causes divide-by-zero
-                # later on in calculating m
-                if nxt['TimeUS'] != leftright[1][0]:
-                    leftright[0] = leftright[1]
-                    leftright[1] = [nxt['TimeUS'], nxt[key_other]]
-
-            # calculate the midpoint
-            span = leftright[1][0] - leftright[0][0]
-            middle = (span / 2) + leftright[0][0]
-
-            # see which side we're on, and lock onto that point as the
-            # one to compare with
-            if singlepoint[0] <= middle:
-                compare = leftright[0]
-            else:
-                compare = leftright[1]
-
-            # do the comparison!  as with lininterp, have to smoothly handle
-            # comparison order or all the math collapses
-            if have_lineA:
-                self._rolling_stats(compare[1], singlepoint[1])
-            else:
-                self._rolling_stats(singlepoint[1], compare[1])
-            idx += 1
+            name = message.fmt.name
+            if name == packetA:
+                tA.append(message.TimeUS)
+                vA.append(getattr(message, keyA))
+            elif name == packetB:
+                tB.append(message.TimeUS)
+                vB.append(getattr(message, keyB))
+
+        pointsA, pointsB = align(tA, vA, tB, vB)
+        if self.batch:
+            self._batch_stats(np.asarray(pointsB, dtype=np.float64),
+                    np.asarray(pointsA, dtype=np.float64))
+        else:
+            for fieldA, fieldB in zip(pointsA, pointsB):
+                self._rolling_stats(fieldB, fieldA)
 
     def _unfloat_results(self):
-        for i in range(self._n_points):
-            self.notify_work_done(self.percent_scale)
-            self.data['rawdiff'][i] = round(self.data['rawdiff'][i], 8)
+        self.data['rawdiff'] = [round(x, 8) for x in self.data['rawdiff']]
+        self.notify_work_done(self._n_points * self.percent_scale)
 
     def _publish_results(self):
         dct = {
@@ -565,7 +562,19 @@ class SFDataCompPlugin(pluginbase.TrashBinPlugin):
                 'filename': self.infilename,
                 'num_points': self._n_points,
                 }
-        self.coopdata['sfdc-{}'.format(self.uuid)] = dct
+        self.coopdata[self.coop_key()] = dct
+
+    def coop_key(self):
+        """
+        Key the results are published under.  It's the same for the same
+        comparison of the same log, so results restored from the result
+        cache land where a fresh run would put them.
+        """
+        h = hashlib.blake2b(digest_size=8)
+        h.update(json.dumps([self.infilename, self.lineA, self.lineB,
+            self.mode, self.unfloat, self.flags], sort_keys=True).encode(
+                'utf-8'))
+        return 'sfdc-{}'.format(h.hexdigest())
 
     def _disp_results(self):
         window = tk.Toplevel(self.handler.handler.root)
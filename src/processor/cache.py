@@ -0,0 +1,243 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Cache of the results of running each plugin factory over each log.
+
+Every entry is keyed on a hash of the log's contents plus the factory's
+savestate, so it stands for "a factory set up exactly like this has already
+been run over exactly this log".  The savestate's uuid is left out of it, as
+a factory gets a new one whenever it's made from scratch.  When a batch is run
+again, any factory with an entry for a log is skipped for it, and the coop
+data its plugin published last time is put back instead.  Only the factories
+whose settings changed (or logs that changed) cost anything.
+
+Output files aren't stored, only their names.  An entry only counts while
+everything the plugin wrote is still there, so deleting an output is enough
+to have it made again.
+
+Entries live in a directory of small files, one per entry, so any number of
+worker processes can use it at once.  Hashing a whole log isn't free, so the
+hash is itself cached against the log's path, size, modification time and
+inode.  Old entries are pruned by age and then by the total size of the cache
+at the end of every batch.
+"""
+
+import collections.abc
+import hashlib
+import json
+import os
+import pickle
+import time
+
+DEFAULT_CACHE_DIR = "~/.trashbin-cache"
+DEFAULT_MAX_MB = 256
+DEFAULT_MAX_DAYS = 30
+
+# how much of a log is hashed at a time
+HASH_BLOCK = 1 << 20
+
+_RESULT_EXT = '.result'
+_DIGEST_EXT = '.digest'
+
+
+class ResultCache(object):
+    """
+    A directory of cached results.  Made in the main process, and pickled
+    along to worker processes as is.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR,
+            max_bytes=DEFAULT_MAX_MB << 20,
+            max_age=DEFAULT_MAX_DAYS * 86400):
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        # per factory uuid: its savestate as JSON, and its work per file
+        self._states = {}
+        self._work = {}
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+        except OSError as e:
+            # nothing will be found or stored, but that's all
+            print("Couldn't make result cache {}: {}".format(
+                self.directory, e))
+
+    def add_factories(self, factories):
+        """
+        Note down the current settings of each factory.  Has to be called
+        from the thread that owns the factories' tkinter variables.
+        """
+        for factory in factories:
+            state = factory._export_savestate()
+            state.pop('uuid', None)
+            self._states[factory.uuid] = json.dumps(state, sort_keys=True)
+            self._work[factory.uuid] = factory.work_per_file
+
+    def work_per_file(self, factory):
+        return self._work[factory.uuid]
+
+    def key(self, digest, factory):
+        """
+        Key for the results of factory, as it was set up when add_factories
+        was called, on the log with the given content digest.
+        """
+        h = hashlib.blake2b(digest_size=16)
+        h.update(digest.encode('ascii'))
+        h.update(b'\0')
+        h.update(self._states[factory.uuid].encode('utf-8'))
+        return h.hexdigest()
+
+    def file_digest(self, filename):
+        """
+        Hash of a log's contents, worked out again only if the log has
+        changed since last time.
+        """
+        st = os.stat(filename)
+        h = hashlib.blake2b(digest_size=16)
+        h.update(json.dumps([os.path.realpath(filename), st.st_size,
+            st.st_mtime_ns, st.st_ino]).encode('utf-8'))
+        memo = self._path(h.hexdigest(), _DIGEST_EXT)
+        try:
+            with open(memo, 'r') as fh:
+                return fh.read()
+        except OSError:
+            pass
+
+        h = hashlib.blake2b(digest_size=16)
+        with open(filename, 'rb') as fh:
+            block = fh.read(HASH_BLOCK)
+            while block:
+                h.update(block)
+                block = fh.read(HASH_BLOCK)
+        digest = h.hexdigest()
+        self._write(memo, digest.encode('ascii'))
+        return digest
+
+    def get(self, key):
+        """
+        The coop data stored under key, or None if there's no entry or any of
+        the files written along with it have gone.
+        """
+        path = self._path(key, _RESULT_EXT)
+        try:
+            with open(path, 'rb') as fh:
+                coop, outputs = pickle.load(fh)
+        except (OSError, EOFError, pickle.UnpicklingError, TypeError,
+                ValueError):
+            return None
+        for output in outputs:
+            if not os.path.exists(output):
+                return None
+        # keep it from being pruned as old while it's still in use
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return coop
+
+    def put(self, key, coop, outputs=()):
+        """
+        Store coop data under key, along with the files written while it was
+        made.  Data that can't be pickled just isn't cached.
+        """
+        outputs = [os.path.abspath(output) for output in outputs]
+        try:
+            data = pickle.dumps((coop, outputs))
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return
+        self._write(self._path(key, _RESULT_EXT), data)
+
+    def prune(self):
+        """
+        Delete entries that haven't been used for max_age seconds, then the
+        least recently used ones until the cache fits in max_bytes.
+        """
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith((_RESULT_EXT, _DIGEST_EXT)):
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        entries.append((st.st_mtime, st.st_size, entry.path))
+        except OSError as e:
+            print("Couldn't prune result cache {}: {}".format(
+                self.directory, e))
+            return
+        entries.sort()
+        cutoff = time.time() - self.max_age
+        total = sum([size for mtime, size, path in entries])
+        for mtime, size, path in entries:
+            if mtime >= cutoff and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def _path(self, name, ext):
+        return os.path.join(self.directory, name + ext)
+
+    def _write(self, path, data):
+        # written whole and then moved into place, so another process never
+        # sees half an entry
+        tmp = "{}.{}.tmp".format(path, os.getpid())
+        try:
+            with open(tmp, 'wb') as fh:
+                fh.write(data)
+            os.replace(tmp, path)
+        except OSError as e:
+            print("Couldn't write to result cache: {}".format(e))
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+
+class RecordingData(collections.abc.MutableMapping):
+    """
+    Stands in for a processor's coop data, passing everything through but
+    also keeping whatever's published, so it can be cached.
+    """
+
+    def __init__(self, data, published):
+        self._data = data
+        self._published = published
+
+    def __setitem__(self, key, val):
+        self._data[key] = val
+        self._published[key] = val
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __delitem__(self, key):
+        del self._data[key]
+        self._published.pop(key, None)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __iter__(self):
+        # the processor's data may be a Configuration, which only has items
+        return iter([key for key, val in self._data.items()])
+
+    def __len__(self):
+        return len(self._data.items())
+
+
+class RecordingProcessor(object):
+    """
+    What a plugin is given as its processor while its results are being
+    recorded for the cache.  Plugins only ever use the coop data and the
+    cancel token of their processor.
+    """
+
+    def __init__(self, processor):
+        self.published = {}
+        self.data = RecordingData(processor.data, self.published)
+        self.cancel = processor.cancel
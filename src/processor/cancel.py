@@ -0,0 +1,51 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Cooperative cancellation of a running batch.
+
+A thread can't be killed from outside, and killing a process mid-write leaves
+half a file behind, so stopping is left to the work itself: everything that
+loops for a while (parsing, writing, plugin stages) checks a CancelToken every
+so often and raises Cancelled once it has been set.  Whatever catches that is
+responsible for cleaning up the partial output it was making.
+"""
+
+import threading
+
+# how many messages go by between checks.  checking is cheap, but not free in
+# a loop that's otherwise only a couple of attribute lookups long
+CHECK_EVERY = 1024
+
+
+class Cancelled(Exception):
+    """
+    Raised by CancelToken.check when the batch has been stopped.
+    """
+    pass
+
+
+class CancelToken(object):
+    """
+    Shared flag saying whether to stop.  event is anything with set, clear and
+    is_set; a multiprocessing Event lets the token work across processes.
+    """
+
+    def __init__(self, event=None):
+        if event is None:
+            event = threading.Event()
+        self._event = event
+
+    def cancel(self):
+        self._event.set()
+
+    def reset(self):
+        self._event.clear()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        if self._event.is_set():
+            raise Cancelled()
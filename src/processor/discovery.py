@@ -0,0 +1,138 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Finding the logs to process from the input files and directories.
+
+Directories are walked recursively, several at once on a pool of threads
+(listing a directory is mostly waiting on the disk or the network share), and
+logs are handed out as soon as they're found.  Processing can start on the
+first log of a big archive without waiting for the rest of it to be listed.
+"""
+
+import concurrent.futures
+import fnmatch
+import os
+
+# globs a file in an input directory has to match to be processed, unless the
+# config says otherwise.  matched against the file's name, ignoring case
+DEFAULT_INCLUDE = ['*.bin', '*.log']
+
+# globs for files TrashBin writes itself next to the logs it reads (the
+# message remover's output), which are never picked up from a directory
+# whatever the config says, so that running again doesn't process its own
+# output.  they're still processed if listed as input files
+DEFAULT_EXCLUDE = ['*.tb.bin', '*.tb.log']
+
+# how many directories are listed at once
+SCAN_WORKERS = 8
+
+
+def iter_inputs(filenames, directories, include=None, exclude=None,
+        workers=SCAN_WORKERS):
+    """
+    Generate the path of every log to process: each of filenames, then every
+    file under directories whose name matches one of the include globs and
+    none of the exclude globs (or DEFAULT_EXCLUDE).  Directories whose names
+    match an exclude glob aren't walked at all.
+
+    Each file is only given once, however many ways there are of getting to
+    it (listed twice, symlinked, hard linked, or in a directory that's inside
+    another input directory).
+    """
+    seen = set()
+
+    for filename in filenames:
+        try:
+            key = _file_key(os.stat(filename))
+        except OSError:
+            # let whatever opens it complain about it
+            yield filename
+            continue
+        if key not in seen:
+            seen.add(key)
+            yield filename
+
+    for filename, st in walk(directories, include, exclude, workers):
+        key = _file_key(st)
+        if key not in seen:
+            seen.add(key)
+            yield filename
+
+
+def walk(directories, include=None, exclude=None, workers=SCAN_WORKERS):
+    """
+    Generate (path, os.stat result) for every wanted file under directories
+    (see iter_inputs), listing up to workers directories at a time.  Files
+    come out in the order their directories finish being listed.  A file
+    reachable more than one way is generated for each of them.
+    """
+    if include is None:
+        include = DEFAULT_INCLUDE
+    include = [glob.lower() for glob in include]
+    exclude = [glob.lower() for glob in DEFAULT_EXCLUDE + list(exclude or [])]
+    seen_dirs = set()
+    pool = concurrent.futures.ThreadPoolExecutor(workers)
+    pending = set()
+    try:
+        for directory in directories:
+            _submit_dir(pool, pending, seen_dirs, directory, include,
+                    exclude)
+        while pending:
+            done, pending = concurrent.futures.wait(pending,
+                    return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                files, subdirs = future.result()
+                for subdir in subdirs:
+                    _submit_dir(pool, pending, seen_dirs, subdir, include,
+                            exclude)
+                for found in files:
+                    yield found
+    finally:
+        # if whoever's generating stops early, don't carry on listing
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit_dir(pool, pending, seen_dirs, directory, include, exclude):
+    # symlinked directories can make loops, so each is only listed once
+    try:
+        key = _file_key(os.stat(directory))
+    except OSError as e:
+        print("Can't read directory {}: {}".format(directory, e))
+        return
+    if key not in seen_dirs:
+        seen_dirs.add(key)
+        pending.add(pool.submit(_scan_dir, directory, include, exclude))
+
+
+def _scan_dir(directory, include, exclude):
+    """
+    List one directory.  Returns a list of (path, stat) for the wanted files
+    in it, in name order, and a list of the directories in it.
+    """
+    files = []
+    subdirs = []
+    try:
+        entries = sorted(os.scandir(directory), key=lambda e: e.name)
+    except OSError as e:
+        print("Can't read directory {}: {}".format(directory, e))
+        return files, subdirs
+    for entry in entries:
+        name = entry.name.lower()
+        if any(fnmatch.fnmatchcase(name, glob) for glob in exclude):
+            continue
+        try:
+            if entry.is_dir():
+                subdirs.append(entry.path)
+            elif entry.is_file() and \
+                    any(fnmatch.fnmatchcase(name, glob) for glob in include):
+                # not entry.stat(), which has no inode number on Windows
+                files.append((entry.path, os.stat(entry.path)))
+        except OSError:
+            # e.g. a broken symlink
+            continue
+    return files, subdirs
+
+
+def _file_key(st):
+    return (st.st_dev, st.st_ino)
@@ -0,0 +1,88 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Progress and status events passed from the processors to the GUI.
+
+Workers run on their own thread (or in other processes altogether), and
+tkinter mustn't be touched from anything but the thread running its mainloop.
+So instead of calling into the GUI, the processor posts events onto an
+EventBus, and the GUI drains it on a timer a frame at a time.
+"""
+
+import collections
+import time
+
+# how many times a second the GUI drains the bus, and so the fastest rate that
+# progress needs passing along at
+FRAME_RATE = 30
+FRAME_INTERVAL = 1.0 / FRAME_RATE
+
+EVENT_PROGRESS = 'progress'
+EVENT_WORK_FOUND = 'work_found'
+EVENT_DONE = 'done'
+
+
+class EventBus(object):
+    """
+    Queue of (kind, value) events from any number of posting threads to one
+    draining thread.  Appending to one end of a deque and popping from the
+    other are both atomic, so neither side ever takes a lock.
+    """
+
+    def __init__(self):
+        self._events = collections.deque()
+
+    def post(self, kind, value=None):
+        self._events.append((kind, value))
+
+    def post_progress(self, amt):
+        self._events.append((EVENT_PROGRESS, amt))
+
+    def drain(self):
+        """
+        Take everything posted so far.  Returns the total progress, and a list
+        of every other event as (kind, value) in the order they were posted.
+        """
+        progress = 0
+        others = []
+        popleft = self._events.popleft
+        try:
+            while True:
+                kind, value = popleft()
+                if kind == EVENT_PROGRESS:
+                    progress += value
+                else:
+                    others.append((kind, value))
+        except IndexError:
+            pass
+        return progress, others
+
+    def clear(self):
+        self._events.clear()
+
+
+class Throttle(object):
+    """
+    Adds up progress and hands the total to sink at most once per interval,
+    for when passing each bit along on its own is expensive (e.g. across a
+    process boundary).  flush() hands over whatever is left.
+    """
+
+    def __init__(self, sink, interval=FRAME_INTERVAL):
+        self.sink = sink
+        self.interval = interval
+        self.pending = 0
+        self._next = time.monotonic() + interval
+
+    def add(self, amt):
+        self.pending += amt
+        now = time.monotonic()
+        if now >= self._next:
+            self._next = now + self.interval
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            amt, self.pending = self.pending, 0
+            self.sink(amt)
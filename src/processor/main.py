@@ -10,6 +10,7 @@ provides a backend for the GUI if necessary.
 
 import sys
 import os
+import signal
 import time
 import uuid
 import tkinter as tk
@@ -17,16 +18,26 @@ import src.config.config as config
 import src.plugins.persist as persist
 import src.plugins._plugin_autodetect as _pad
 import src.gui.mainwindow as mainwindow
+import src.processor.events as events
 
 # the processor selection isn't as user-importable as plugins, we just import
 # them all and then pick
 import src.processor.singlethread as singlethread
+import src.processor.multiprocess as multiprocess
+import src.processor.watch as watch
+
+PROCESSORS = {
+        'singlethread': singlethread.SingleThreadProcessor,
+        'multiprocess': multiprocess.MultiProcessProcessor,
+    }
+DEFAULT_PROCESSOR = 'singlethread'
 
 class MainExecutor(object):
 
     def __init__(self, mastercfgfile,
             opermode='gui',
             extraconfigs=[],
+            watchdirs=[],
             ):
         self.mastercfg = config.ConfigManager(mastercfgfile)
         for extra in extraconfigs:
@@ -48,12 +59,25 @@ class MainExecutor(object):
             self.mastercfg.slots.append(inp)
 
         self.progress = 0
-
-        # we've hard-selected a single thread processor for now, because that's
-        # the only one implemented.  for future when there's more
-        # processor backends, this should be set to None and specified via
-        # master config file (probably)
-        self.processor = singlethread.SingleThreadProcessor(self)
+        # the processor runs off on its own thread, so it reports to the GUI
+        # through this rather than calling into it
+        self.events = events.EventBus()
+
+        # processor backend is picked by name from the master config; fall
+        # back to the single thread one if it's not given
+        procname = self.config['processor'] or DEFAULT_PROCESSOR
+        if procname not in PROCESSORS:
+            print("MainExecutor - unknown processor {}, using {}".format(
+                procname, DEFAULT_PROCESSOR))
+            procname = DEFAULT_PROCESSOR
+        if self.opermode == 'headless-watch':
+            # watching always uses a process pool, kept warm between logs.
+            # without directories on the command line, the input ones are
+            # watched instead
+            self.processor = watch.WatchProcessor(self,
+                    list(watchdirs) or list(self.input['directories']))
+        else:
+            self.processor = PROCESSORS[procname](self)
 
         self._start_main_operations()
 
@@ -62,6 +86,8 @@ class MainExecutor(object):
             self._start_gui()
         elif self.opermode == 'headless':
             self._start_headless()
+        elif self.opermode == 'headless-watch':
+            self._start_watch()
         else:
             print("MainExecutor - invalid operation mode {}".format(
                 self.opermode))
@@ -76,15 +102,36 @@ class MainExecutor(object):
         # let's just get into it!
         self.go()
 
+    def _start_watch(self):
+        # as headless, but it never finishes by itself: new logs are
+        # processed as they turn up until ctrl-c.  SIGTERM (from a service
+        # manager, say) stops it the same way, so the worker pool is shut
+        # down rather than left behind
+        previous = signal.signal(signal.SIGTERM, _interrupt)
+        self.go()
+        try:
+            while self.processor.process.is_alive():
+                self.processor.process.join(0.5)
+        except KeyboardInterrupt:
+            print("Stopping watch")
+            self.stop()
+        finally:
+            signal.signal(signal.SIGTERM, previous)
+
     def notify_work_done(self, amt=1):
         self.progress += amt
         if self.gui:
-            self._gui.notify_work_done(amt)
+            self.events.post_progress(amt)
+
+    def notify_work_found(self, amt):
+        # more logs turned up in the input directories
+        if self.gui:
+            self.events.post(events.EVENT_WORK_FOUND, amt)
 
     def notify_done(self):
         self.processor.active = False
         if self.gui:
-            self._gui.notify_done()
+            self.events.post(events.EVENT_DONE)
 
     def set_files(self, newfiles):
         self.mastercfg.inputs['filenames'] = list(newfiles)
@@ -179,3 +226,6 @@ class MainExecutor(object):
             persist.write_text_file(filename, list(self.factmap.values()))
         
 
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt()
@@ -0,0 +1,253 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Multi-process implementation of log processing.
+
+Each input file is handed to a worker process in a pool, so that a batch of
+logs is parsed on as many cores as are available rather than on one thread
+fighting the GIL.
+"""
+
+import os
+import queue
+import signal
+import threading
+import multiprocessing
+import src.processor.processorbase as pb
+import src.processor.singlethread as singlethread
+import src.processor.events as events
+import src.processor.cancel as cancel
+import src.plugins.persist as persist
+
+# how long the dispatcher waits on the progress queue before checking whether
+# the batch is complete
+_POLL_INTERVAL = 0.1
+
+# how long stop gives the workers to notice they've been cancelled before the
+# pool is torn down regardless
+_STOP_TIMEOUT = 5.0
+
+# per-process state for pool workers.  set up once by _init_child, then reused
+# for every file that process is given
+_child = None
+
+
+class _ChildHandler(object):
+    """
+    Stands in for the MainExecutor inside a worker process.  Factories are
+    rebuilt against this, so their progress reports go back over the queue.
+    They're added up and sent at most once a frame, as every put on the queue
+    costs a pickle and a pipe write.
+    """
+
+    def __init__(self, debug, progress):
+        self.config = {'debug': debug}
+        self.progress = events.Throttle(progress.put)
+
+    def notify_work_done(self, amt=1):
+        self.progress.add(amt)
+
+
+class _ChildProcessor(object):
+    """
+    Stands in for the processor inside a worker process.  Provides the
+    attributes that Worker and the plugins' coopdata expect.
+    """
+
+    def __init__(self, handler, factories, reader_options, cancel,
+            result_cache):
+        self.handler = handler
+        self.factories = factories
+        self.reader_options = reader_options
+        self.cancel = cancel
+        self.result_cache = result_cache
+        self.input_files = []
+        self.data = {}
+
+    def notify_done(self):
+        pass
+
+
+def _init_child(savestates, debug, progress, reader_options, cancel,
+        result_cache):
+    """
+    Pool initializer.  Rebuilds the plugin factories from their savestates.
+    """
+    global _child
+    # ctrl-c goes to the whole process group, but stopping is up to the main
+    # process, which tells the workers through the cancel token.  the same
+    # goes for a SIGTERM sent to the group: a worker killed by it while
+    # waiting for work takes the pool's queue lock with it, and then the pool
+    # can't be shut down.  so the workers get a group of their own
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if hasattr(os, 'setsid'):
+        os.setsid()
+    # there's no GUI in a worker process, and real tkinter variables can't be
+    # created without a root window.  this has to happen before any plugin
+    # modules get imported
+    from src.tkstubs import tb_override_tkinter
+    tb_override_tkinter('headless')
+
+    handler = _ChildHandler(debug, progress)
+    factories = persist.load_all_savestates(savestates, handler)
+    _child = _ChildProcessor(handler, factories, reader_options, cancel,
+            result_cache)
+
+
+def _run_child(filename):
+    """
+    Process one log in a worker process.
+
+    Returns a tuple of (filename, coopdata, error, outputs).  Coop data is
+    whatever the plugins published while processing this file; error is None
+    on success.  outputs are the files the plugins wrote.
+    """
+    if _child.cancel.cancelled:
+        # the rest of the queue gets run through once the batch is stopped
+        return (filename, {}, "Cancelled", [])
+    _child.data = {}
+    worker = singlethread.Worker(_child)
+    worker.factories = _child.factories
+    try:
+        outputs = worker.process_one_log(filename)
+    except cancel.Cancelled:
+        return (filename, {}, "Cancelled", [])
+    except Exception as e:
+        return (filename, {}, "{}: {}".format(type(e).__name__, e), [])
+    finally:
+        _child.handler.progress.flush()
+    return (filename, _child.data, None, outputs)
+
+
+class MultiProcessProcessor(pb.ProcessorBase):
+    """
+    Process-pool implementation of log processing.
+
+    Basically:
+    for file in files (one per worker process):
+        for plugin in plugins:
+            plugin(file)
+
+    Factories are shipped to the workers via their savestates, so each process
+    has its own copy.  A factory that hands out the same plugin instance for
+    every file will therefore only see the files given to its own process.
+    """
+
+    def __init__(self, handler, workers=None):
+        super().__init__(handler)
+        if workers is None:
+            workers = self.handler.config['processor_workers']
+        self.workers = workers or os.cpu_count()
+        self.pool = None
+        # shared with the worker processes, so they can see it being set
+        self.cancel = cancel.CancelToken(
+                multiprocessing.get_context('spawn').Event())
+        self.reinit()
+
+    def reinit(self):
+        self.cancel.reset()
+        self.process = threading.Thread(
+                target=self._dispatch,
+                args=(),
+            )
+
+    def run(self):
+        # savestates are exported here rather than in the dispatch thread, as
+        # the factories' tkinter variables belong to the calling thread
+        self.savestates = persist.get_all_savestates(self.factories)
+        self.process.start()
+
+    def _start_pool(self):
+        """
+        Start up the worker processes.  Returns the queue they report their
+        progress on.
+        """
+        ctx = multiprocessing.get_context('spawn')
+        progress = ctx.Queue()
+        self.pool = ctx.Pool(
+                self.workers,
+                initializer=_init_child,
+                initargs=(
+                    self.savestates,
+                    self.handler.config['debug'],
+                    progress,
+                    self.reader_options,
+                    self.cancel,
+                    self.result_cache,
+                ),
+            )
+        return progress
+
+    def _dispatch(self):
+        progress = self._start_pool()
+        # the pool pulls files off iter_inputs as it has room for them, so
+        # the first ones are being processed while directories are still
+        # being listed
+        results = self.pool.imap_unordered(_run_child, self.iter_inputs())
+        self.pool.close()
+
+        more = True
+        while more and not self.cancel.cancelled:
+            self._drain_progress(progress)
+            more = self._collect_ready(results)
+        self.pool.join()
+        # catch anything posted between the last drain and the pool exiting
+        self._drain_progress(progress, block=False)
+        self.pool = None
+        if not self.cancel.cancelled:
+            self.notify_done()
+
+    def _drain_progress(self, progress, block=True):
+        try:
+            amt = progress.get(block, _POLL_INTERVAL)
+            while True:
+                self.handler.notify_work_done(amt)
+                amt = progress.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _collect_ready(self, results):
+        """
+        Collect every result that's come back so far.  Returns False once
+        there are no more to come.
+        """
+        while True:
+            try:
+                result = results.next(timeout=0)
+            except multiprocessing.TimeoutError:
+                return True
+            except StopIteration:
+                return False
+            except Exception as e:
+                # the pool itself failed on this item (e.g. unpicklable
+                # result)
+                print("MultiProcessProcessor: lost a result: {}".format(e))
+                continue
+            self._collect(result)
+
+    def _collect(self, result):
+        filename, coop, error, outputs = result
+        if error is not None and not self.cancel.cancelled:
+            print("MultiProcessProcessor: {} failed: {}".format(
+                filename, error))
+        for key, val in coop.items():
+            self.data[key] = val
+
+    def stop(self):
+        # the workers clean up after themselves when they see this, but one
+        # stuck somewhere that doesn't check gets killed off after a while
+        self.cancel.cancel()
+        if self.process.is_alive():
+            self.process.join(_STOP_TIMEOUT)
+        pool = self.pool
+        if pool is not None:
+            pool.terminate()
+        if self.process.is_alive():
+            self.process.join()
+
+    def force_stop(self):
+        self.cancel.cancel()
+        pool = self.pool
+        if pool is not None:
+            pool.terminate()
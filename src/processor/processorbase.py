@@ -6,6 +6,9 @@ Base class for processor objects.
 """
 
 import src.config.config as config
+import src.processor.cancel as cancel
+import src.processor.discovery as discovery
+import src.processor.cache as cache
 
 class ProcessorBase(object):
     """
@@ -22,6 +25,8 @@ class ProcessorBase(object):
         self.plugins = []
         self.data = config.Configuration(None)
         self.data['base'] = self
+        # set to stop the batch part way (see stop)
+        self.cancel = cancel.CancelToken()
         self.update()
 
     def update(self):
@@ -29,13 +34,53 @@ class ProcessorBase(object):
         self.input_dirs = self.handler.input['directories']
         self.input_rawtext = self.handler.input['rawtext']
         self.factories = self.handler.factories
+        # globs picking which files in input_dirs are processed (None means
+        # the defaults in discovery)
+        self.input_include = self.handler.config['input_include']
+        self.input_exclude = self.handler.config['input_exclude']
+        # worked out here, as factories may read it from tkinter variables
+        # that only the calling thread can touch
+        self.work_per_file = sum([f.work_per_file for f in self.factories])
+        # extra arguments for opening each log
+        self.reader_options = {
+                'use_sidecar': bool(self.handler.config['index_sidecar']),
+                'parse_workers': self.handler.config['parse_workers'] or 0,
+            }
+        # results of earlier runs, if they're to be reused (see cache)
+        self.result_cache = None
+        settings = self.handler.config
+        if settings['result_cache']:
+            self.result_cache = cache.ResultCache(
+                    settings['result_cache_dir'] or cache.DEFAULT_CACHE_DIR,
+                    max_bytes=(settings['result_cache_max_mb'] or
+                        cache.DEFAULT_MAX_MB) << 20,
+                    max_age=(settings['result_cache_max_days'] or
+                        cache.DEFAULT_MAX_DAYS) * 86400,
+                )
+            self.result_cache.add_factories(self.factories)
 
     @property
     def max_work(self):
+        # files in input_dirs aren't counted until they're found; they're
+        # added on as they are (see iter_inputs)
         per_file = sum([f.work_per_file for f in self.factories])
         total = per_file * len(self.input_files)
         return total
 
+    def iter_inputs(self):
+        """
+        Generate the filename of every log to process, finding the ones in
+        input_dirs as it goes.  Stops early if the batch is cancelled.
+        """
+        listed = set(self.input_files)
+        for filename in discovery.iter_inputs(self.input_files,
+                self.input_dirs, self.input_include, self.input_exclude):
+            if self.cancel.cancelled:
+                return
+            if filename not in listed:
+                self.handler.notify_work_found(self.work_per_file)
+            yield filename
+
     def run(self):
         raise NotImplemented("Method run must be overriden!")
 
@@ -46,5 +91,7 @@ class ProcessorBase(object):
         raise NotImplemented("Method force_stop must be overriden!")
 
     def notify_done(self):
+        if self.result_cache is not None:
+            self.result_cache.prune()
         self.handler.notify_done()
 
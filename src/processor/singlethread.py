@@ -4,6 +4,16 @@
 import threading
 import src.logutils.DFReader as dfr
 import src.processor.processorbase as pb
+import src.processor.cancel as cancel
+import src.processor.cache as cache
+import src.plugins.pluginbase as pluginbase
+
+
+def _union(types, more):
+    # typesets, where None is every type
+    if types is None or more is None:
+        return None
+    return types | more
 
 
 class Worker(object):
@@ -20,50 +30,183 @@ class Worker(object):
     def data(self):
         return self.handler.data
 
+    @property
+    def cancel(self):
+        return self.handler.cancel
+
     def stage_filename(self, filename, plugins):
         for plugin in plugins:
+            self.cancel.check()
             plugin.run_filename(filename)
 
     def stage_filehandle(self, handle, plugins):
         for plugin in plugins:
+            self.cancel.check()
             plugin.run_filehandle(handle)
 
     def stage_parsedlog(self, dfl, plugins):
         for plugin in plugins:
+            self.cancel.check()
             plugin.run_parsedlog(dfl)
 
+    def subscriptions(self, dfl, plugins):
+        """
+        Work out which message types each plugin wants from this log.
+
+        Returns a list of (plugin, typeset), the union of all of them, and
+        the union of the random-access plugins' alone, which are the types
+        kept for run_messages.  A typeset of None means every type.
+        """
+        subs = []
+        union = set()
+        listed = set()
+        for plugin in plugins:
+            if plugin.message_types is None:
+                types = None
+            else:
+                types = dfl.match_types(plugin.message_types)
+            union = _union(union, types)
+            if plugin.random_access:
+                listed = _union(listed, types)
+            subs.append((plugin, types))
+        return subs, union, listed
+
+    def stage_stream(self, dfl, plugins):
+        subs, union, listed = self.subscriptions(dfl, plugins)
+        # only bother calling run_message on plugins that actually use it
+        streaming = [(p, t) for p, t in subs if type(p).run_message is not
+                pluginbase.TrashBinPlugin.run_message]
+        listing = [p for p in plugins if p.random_access]
+        if not (streaming or listing) or union == set():
+            # nobody wants messages -- don't parse them at all
+            for plugin in plugins:
+                plugin.run_stream_end()
+            return []
+
+        # which plugins get each message type, and whether it's kept for
+        # run_messages, is worked out the first time that type turns up
+        routes = {}
+        msgs = []
+        countdown = cancel.CHECK_EVERY
+        for msg in dfl.iter_messages(union):
+            countdown -= 1
+            if not countdown:
+                countdown = cancel.CHECK_EVERY
+                self.cancel.check()
+            name = msg.fmt.name
+            try:
+                targets, keep = routes[name]
+            except KeyError:
+                targets = [p for p, t in streaming if t is None or name in t]
+                keep = listed is None or name in listed
+                routes[name] = (targets, keep)
+            for plugin in targets:
+                plugin.run_message(msg)
+            if keep:
+                # kept messages are read back from the log as they're needed
+                msg.compact()
+                msgs.append(msg)
+
+        for plugin in plugins:
+            self.cancel.check()
+            plugin.run_stream_end()
+        return msgs
+
     def stage_messages(self, msgs, plugins):
         for plugin in plugins:
-            plugin.run_messages(msgs)
+            if plugin.random_access:
+                self.cancel.check()
+                plugin.run_messages(msgs)
+
+    def reader_progress(self, pct):
+        # opening a big log takes a while, so keep an eye out for being
+        # stopped while it's indexed
+        self.cancel.check()
+
+    def uncached_factories(self, filename):
+        """
+        Work out which factories still need running on this log.  Those with
+        results in the result cache have their coop data put back and their
+        work counted as done instead.  Returns the rest as a list of
+        (factory, key to cache its results under, or None for no cache).
+        """
+        results = self.handler.result_cache
+        if results is None:
+            return [(factory, None) for factory in self.factories]
+        digest = results.file_digest(filename)
+        todo = []
+        for factory in self.factories:
+            key = results.key(digest, factory)
+            coop = results.get(key)
+            if coop is None:
+                todo.append((factory, key))
+                continue
+            for coopkey, val in coop.items():
+                self.data[coopkey] = val
+            factory.notify_work_done(results.work_per_file(factory))
+        return todo
 
     def process_one_log(self, filename):
-        # first, spawn new plugins for it all
+        """
+        Run every plugin over one log.  Returns the files they wrote.
+        """
+        todo = self.uncached_factories(filename)
+        if not todo:
+            # nothing's changed since last time
+            return []
+
+        # first, spawn new plugins for it all.  those whose results are to
+        # be cached get a processor that notes down what they publish
         plugs = []
-        for factory in self.factories:
-            plugs.append(factory.give_plugin(self))
+        recorders = []
+        for factory, key in todo:
+            if key is None:
+                plugs.append(factory.give_plugin(self))
+            else:
+                recorder = cache.RecordingProcessor(self)
+                plugin = factory.give_plugin(recorder)
+                recorders.append((key, recorder, plugin))
+                plugs.append(plugin)
         self.plugins = plugs
 
         # now, run through the processing pipeline
-        self.stage_filename(filename, plugs)
-
-        with open(filename, 'r') as filehandle:
-            self.stage_filehandle(filehandle, plugs)
-
-        dfl = dfr.DFReader_auto(filename)
-        self.stage_parsedlog(dfl, plugs)
-
-        # have to process all the messages now
-        while True:
-            m = dfl.recv_msg()
-            if m is None:
-                break
-        self.stage_messages(dfl.all_messages, plugs)
+        try:
+            self.stage_filename(filename, plugs)
+
+            with open(filename, 'r') as filehandle:
+                self.stage_filehandle(filehandle, plugs)
+
+            dfl = dfr.DFReader_auto(filename,
+                    progress_callback=self.reader_progress,
+                    **self.handler.reader_options)
+            self.stage_parsedlog(dfl, plugs)
+
+            # now feed every message through as it's parsed.  the full list
+            # is only kept if a plugin needs random access to it
+            msgs = self.stage_stream(dfl, plugs)
+            self.stage_messages(msgs, plugs)
+        except cancel.Cancelled:
+            for plugin in plugs:
+                plugin.run_cancelled()
+            raise
+
+        for key, recorder, plugin in recorders:
+            self.handler.result_cache.put(key, recorder.published,
+                    plugin.outputs)
+        return [output for plugin in plugs for output in plugin.outputs]
 
     def run(self):
-        self.filenames = self.handler.input_files
         self.factories = self.handler.factories
-        for filename in self.filenames:
-            self.process_one_log(filename)
+        try:
+            for filename in self.handler.iter_inputs():
+                self.process_one_log(filename)
+        except cancel.Cancelled:
+            # whoever stopped us already knows we're not done
+            return
+        finally:
+            # the logs share parse_chunked's processes; they're not needed
+            # once the batch is over
+            dfr.close_chunk_pool()
         self.handler.notify_done()
 
 class SingleThreadProcessor(pb.ProcessorBase):
@@ -85,6 +228,7 @@ class SingleThreadProcessor(pb.ProcessorBase):
             )
 
     def reinit(self):
+        self.cancel.reset()
         self.process = threading.Thread(
                 target=self.worker.run,
                 args=()
@@ -94,11 +238,13 @@ class SingleThreadProcessor(pb.ProcessorBase):
         self.process.start()
 
     def stop(self):
-        self.worker.do_abort = True
-        self.process.join()
+        # the worker checks every few messages, so this doesn't wait long
+        self.cancel.cancel()
+        if self.process.is_alive():
+            self.process.join()
 
     def force_stop(self):
-        self.worker.do_abort = True
-        self.process.terminate()
+        # a thread can't be killed, so just tell it to stop and don't wait
+        self.cancel.cancel()
 
 
@@ -0,0 +1,225 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Watch-folder mode: process logs as they turn up in a set of directories.
+
+The directories are listed every so often (see discovery.walk), and a log is
+processed once its size and modification time have stopped changing for a
+while, so that one still being copied in isn't picked up half-written.  Logs
+are processed on a pool of worker processes that's started once and kept for
+as long as the watch runs, with the plugin factories already loaded.
+
+Which logs have been processed is kept in a manifest file, so that nothing is
+done twice across restarts.  A log that's changed since it was processed is
+done again, as is one that failed.  The files the plugins write are put in
+the manifest too, so that outputs landing in a watched directory (e.g. the
+log converter's) aren't taken for new logs.
+"""
+
+import json
+import os
+import time
+import src.processor.multiprocess as multiprocess
+import src.processor.discovery as discovery
+
+DEFAULT_MANIFEST = "~/.trashbin-watch.json"
+
+# seconds between listings of the watched directories
+DEFAULT_INTERVAL = 2.0
+
+# seconds a log's size and modification time have to stay the same before
+# it's taken to be complete
+DEFAULT_SETTLE = 5.0
+
+
+class Manifest(object):
+    """
+    Record of the logs that have been processed, kept in a JSON file.  Each
+    is stored against its real path along with the size and modification time
+    it had when it was processed.  Files written by the plugins are stored the
+    same way, with the log they were written from as their source.
+    """
+
+    def __init__(self, filename):
+        self.filename = os.path.abspath(os.path.expanduser(filename))
+        self.entries = {}
+        self.dirty = False
+        try:
+            with open(self.filename, 'r') as fh:
+                self.entries = json.load(fh)['logs']
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            print("Couldn't read manifest {}, starting a new one: {}".format(
+                self.filename, e))
+
+    def is_done(self, path, sig):
+        """
+        Whether the log has been processed as it is now, without failing.
+        """
+        entry = self.entries.get(os.path.realpath(path))
+        return entry is not None and entry.get('error') is None and \
+                (entry['size'], entry['mtime_ns']) == sig
+
+    def add(self, path, sig, error=None, source=None):
+        self.entries[os.path.realpath(path)] = {
+                'size': sig[0],
+                'mtime_ns': sig[1],
+                'processed': time.time(),
+                'error': error,
+                'source': source,
+            }
+        self.dirty = True
+
+    def add_output(self, path, source):
+        """
+        Record a file written while processing source, as it is now.
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            # written and then removed again, or never written at all
+            return
+        self.add(path, (st.st_size, st.st_mtime_ns), source=source)
+
+    def save(self):
+        """
+        Write the manifest out, if anything has been added since it was last
+        written.
+        """
+        if not self.dirty:
+            return
+        tmp = self.filename + '.tmp'
+        try:
+            with open(tmp, 'w') as fh:
+                json.dump({'logs': self.entries}, fh)
+            os.replace(tmp, self.filename)
+        except OSError as e:
+            print("Couldn't write manifest {}: {}".format(self.filename, e))
+            return
+        self.dirty = False
+
+
+class FolderWatcher(object):
+    """
+    Keeps track of the logs in a set of directories, and which of them are
+    complete and still need processing.
+    """
+
+    def __init__(self, directories, manifest, include=None, exclude=None,
+            settle=DEFAULT_SETTLE):
+        self.directories = directories
+        self.manifest = manifest
+        self.include = include
+        self.exclude = exclude
+        self.settle = settle
+        # path -> (signature, when it was first seen with that signature) for
+        # every log that's not yet been handed out
+        self._pending = {}
+        # path -> signature of every log handed out by poll
+        self._handed = {}
+
+    def poll(self):
+        """
+        List the directories again.  Returns (path, signature) for each log
+        that has become complete since the last poll, and hasn't been handed
+        out before or processed in an earlier run.
+        """
+        now = time.monotonic()
+        ready = []
+        pending = {}
+        seen = set()
+        for path, st in discovery.walk(self.directories, self.include,
+                self.exclude):
+            key = (st.st_dev, st.st_ino)
+            if key in seen:
+                continue
+            seen.add(key)
+            sig = (st.st_size, st.st_mtime_ns)
+            if self._handed.get(path) == sig or \
+                    self.manifest.is_done(path, sig):
+                continue
+            prev = self._pending.get(path)
+            if prev is None or prev[0] != sig:
+                # new, or still being written
+                pending[path] = (sig, now)
+            elif now - prev[1] >= self.settle:
+                self._handed[path] = sig
+                ready.append((path, sig))
+            else:
+                pending[path] = prev
+        self._pending = pending
+        return ready
+
+
+class WatchProcessor(multiprocess.MultiProcessProcessor):
+    """
+    Processes logs as they turn up in the watched directories, until stopped.
+
+    Basically:
+    forever:
+        for new, complete file in directories (one per worker process):
+            for plugin in plugins:
+                plugin(file)
+    """
+
+    def __init__(self, handler, directories, workers=None):
+        self.directories = directories
+        super().__init__(handler, workers)
+
+    def _dispatch(self):
+        config = self.handler.config
+        manifest = Manifest(config['watch_manifest'] or DEFAULT_MANIFEST)
+        watcher = FolderWatcher(self.directories, manifest,
+                self.input_include, self.input_exclude,
+                config['watch_settle'] or DEFAULT_SETTLE)
+        interval = config['watch_interval'] or DEFAULT_INTERVAL
+
+        progress = self._start_pool()
+        # path -> (async result, signature) for every log being processed
+        running = {}
+        try:
+            while not self.cancel.cancelled:
+                for path, sig in watcher.poll():
+                    running[path] = (self._submit(path), sig)
+                # collect results while waiting for the next listing
+                deadline = time.monotonic() + interval
+                while not self.cancel.cancelled:
+                    self._drain_progress(progress)
+                    self._collect_finished(running, manifest)
+                    if time.monotonic() >= deadline:
+                        break
+                manifest.save()
+        finally:
+            # anything still running sees the cancel and stops
+            self.pool.close()
+            self.pool.join()
+            self._drain_progress(progress, block=False)
+            self.pool = None
+            manifest.save()
+            if self.result_cache is not None:
+                self.result_cache.prune()
+
+    def _submit(self, filename):
+        return self.pool.apply_async(multiprocess._run_child, (filename,))
+
+    def _collect_finished(self, running, manifest):
+        for path in [p for p, (r, s) in running.items() if r.ready()]:
+            if self.cancel.cancelled:
+                # it may have been cut short, so leave it for next time
+                return
+            result, sig = running.pop(path)
+            try:
+                result = result.get()
+            except Exception as e:
+                print("WatchProcessor: lost the result for {}: {}".format(
+                    path, e))
+                continue
+            self._collect(result)
+            filename, coop, error, outputs = result
+            manifest.add(path, sig, error)
+            for output in outputs:
+                manifest.add_output(output, path)
+            if error is None:
+                print("WatchProcessor: processed {}".format(path))
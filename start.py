@@ -19,7 +19,7 @@ parser.add_argument(
         help="Running environment -- headless CLI-arg-only, or spawn GUI",
         default="gui",
         dest='opermode',
-        choices=['gui', 'headless'],
+        choices=['gui', 'headless', 'headless-watch'],
         required=False
     )
 parser.add_argument(
@@ -39,6 +39,16 @@ parser.add_argument(
         dest='extraconfigs',
         default=[]
     )
+parser.add_argument(
+        '-w', '--watch',
+        type=str,
+        help="Directory to watch for new logs in headless-watch mode (may be "
+                "given more than once; defaults to the input directories)",
+        action='append',
+        metavar='watchdirs',
+        dest='watchdirs',
+        default=[]
+    )
 
 if __name__ == '__main__':
     args = parser.parse_args()
@@ -50,8 +60,12 @@ if __name__ == '__main__':
     mainexec = mainproc.MainExecutor(args.mastercfg,
             opermode=args.opermode,
             extraconfigs=args.extraconfigs,
+            watchdirs=args.watchdirs,
         )
 
-    import code
-    code.interact(local=locals())
+    # watching only returns once it's been stopped, so there's nothing left
+    # to poke at
+    if args.opermode != 'headless-watch':
+        import code
+        code.interact(local=locals())
 
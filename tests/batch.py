@@ -0,0 +1,135 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Running whole batches headless, as start.py -e headless would.
+
+Config files are written out to a directory of the test's own, so nothing
+from the user's real setup is read or changed.
+"""
+
+import copy
+import json
+import os
+import uuid
+
+import src.config.config as config
+
+# savestates for the stock plugins, as they'd be saved from the GUI
+LOGCONV_TEXT = {'plugin_cls': 'LogFormatConverter', 'mode': 1,
+        'force': False}
+LOGCONV_BINARY = {'plugin_cls': 'LogFormatConverter', 'mode': 0,
+        'force': False}
+LOGCONV_CSV = {'plugin_cls': 'LogFormatConverter', 'mode': 2,
+        'force': False, 'timestamps': False, 'types': ''}
+PARAM = {'plugin_cls': 'ParamExtractFactory', 'multivalhandle': 1,
+        'paramfilter': '.*', 'forceout': True, 'coop': True}
+REMOVER = {'plugin_cls': 'MessageRemoverFactory', 'whitelist': False,
+        'nukemode': True, 'replace': 'Zero', 'filter': 'GPS|PARM'}
+SFDC = {'plugin_cls': 'SFDataCompFactory', 'popup': False, 'coop': True,
+        'lines': ['IMU.GyrX', 'ATT.Roll'], 'mode': 1, 'unfloat': False,
+        'flags': {'mindiff': True, 'maxdiff': True, 'avgdiff': True,
+            'stddev': True, 'rmsdiff': True, 'r2': False, 'avg-avg': True,
+            'rawdiff': False}}
+
+
+def write_master(directory, filenames=(), factories=(), directories=(),
+        **options):
+    """
+    Write a master config, and the configs it points to, into directory.
+    options go in the global config.  Returns the master config's filename.
+    """
+    def write(name, data):
+        filename = os.path.join(directory, name)
+        with open(filename, 'w') as fh:
+            json.dump(data, fh)
+        return filename
+
+    glob = dict({'__uuid': str(uuid.uuid4()),
+        '__scope': config.SCOPE_GLOBAL, 'debug': False}, **options)
+    inputs = {'__uuid': str(uuid.uuid4()), '__scope': config.SCOPE_INPUTS,
+            'filenames': list(filenames), 'directories': list(directories),
+            'rawtext': ''}
+    plugins = {'__uuid': str(uuid.uuid4()), '__scope': config.SCOPE_PLUGIN,
+            'factories': [dict(copy.deepcopy(f), uuid=str(uuid.uuid4()),
+                plugin_name='test') for f in factories]}
+    slots = []
+    for name, data in (('global.json', glob), ('inputs.json', inputs),
+            ('plugins.json', plugins)):
+        slots.append({'filename': write(name, data), 'readonly': False,
+            'uuid': data['__uuid']})
+    return write('master.json', {'__uuid': str(uuid.uuid4()),
+        '__scope': config.SCOPE_GLOBAL, 'slots': slots})
+
+
+def run(directory, filenames=(), factories=(), directories=(), **options):
+    """
+    Run a batch to the end.  Returns the MainExecutor, for its processor's
+    coop data and progress.
+    """
+    import src.processor.main as main
+    master = write_master(directory, filenames, factories, directories,
+            **options)
+    executor = main.MainExecutor(master, opermode='headless')
+    executor.processor.process.join()
+    return executor
+
+
+def coopdata(executor):
+    """
+    Everything the plugins published over the batch, as a plain dict.
+    """
+    data = executor.processor.data._data
+    return {key: val for key, val in data.items() if key != 'base'}
+
+
+class FakeFactory(object):
+    """
+    Stands in for a plugin factory, for running plugins on their own.
+    """
+
+    def __init__(self):
+        self.debug = False
+        self.work = 0
+
+    def notify_work_done(self, amt=1):
+        self.work += amt
+
+
+class FakeProcessor(object):
+    """
+    Stands in for a processor, for running a Worker's stages on their own.
+    """
+
+    def __init__(self, factories=(), filenames=()):
+        import src.processor.cancel as cancel
+        self.data = {}
+        self.cancel = cancel.CancelToken()
+        self.factories = list(factories)
+        self.filenames = list(filenames)
+        self.reader_options = {}
+        self.result_cache = None
+        self.done = False
+
+    def iter_inputs(self):
+        return iter(self.filenames)
+
+    def notify_done(self):
+        self.done = True
+
+
+def run_plugins(filename, plugins, processor):
+    """
+    Put one log through every stage of a Worker with the given plugins, as
+    Worker.process_one_log does with the plugins from its factories.
+    """
+    import src.logutils.DFReader as dfr
+    import src.processor.singlethread as singlethread
+    worker = singlethread.Worker(processor)
+    worker.stage_filename(filename, plugins)
+    with open(filename, 'r') as filehandle:
+        worker.stage_filehandle(filehandle, plugins)
+    dfl = dfr.DFReader_auto(filename, **processor.reader_options)
+    worker.stage_parsedlog(dfl, plugins)
+    msgs = worker.stage_stream(dfl, plugins)
+    worker.stage_messages(msgs, plugins)
@@ -0,0 +1,48 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Shared setup for the tests.
+
+The tests run headless: tkinter is swapped for the stubs before anything
+imports it, as start.py does.  Plugins are found relative to the current
+directory, so every test runs from the top of the repository.
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.tkstubs import tb_override_tkinter
+tb_override_tkinter('headless')
+
+import logfiles
+
+
+@pytest.fixture(autouse=True)
+def in_repo_root(monkeypatch):
+    monkeypatch.chdir(ROOT)
+
+
+@pytest.fixture
+def bin_log(tmp_path):
+    """
+    A small binary log, written fresh for each test.
+    """
+    filename = str(tmp_path / 'small.bin')
+    logfiles.write_bin(filename)
+    return filename
+
+
+@pytest.fixture
+def text_log(tmp_path):
+    """
+    The same log as bin_log, as text.
+    """
+    filename = str(tmp_path / 'small.log')
+    logfiles.write_text(filename)
+    return filename
@@ -0,0 +1,106 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Small made-up logs for the tests, as binary or text.
+
+Both forms hold the same messages.  Every field value survives being written
+out and read back exactly (floats are multiples of 1/8, no multipliers), so
+the two can be compared field for field.
+"""
+
+import struct
+
+# name -> (type id, format, columns, struct format)
+FORMATS = {
+        'FMT': (128, 'BBnNZ', 'Type,Length,Name,Format,Columns',
+            'BB4s16s64s'),
+        'PARM': (130, 'QNf', 'TimeUS,Name,Value', 'Q16sf'),
+        'GPS': (131, 'QBIHii', 'TimeUS,Status,GMS,GWk,Lat,Lng', 'QBIHii'),
+        'IMU': (132, 'QBffff', 'TimeUS,I,GyrX,GyrY,GyrZ,AccZ', 'QBffff'),
+        'MSG': (133, 'QZ', 'TimeUS,Message', 'Q64s'),
+        'MODE': (134, 'QBB', 'TimeUS,ModeNum,Rsn', 'QBB'),
+        'ATT': (135, 'Qhhh', 'TimeUS,Roll,Pitch,Yaw', 'Qhhh'),
+    }
+
+HEADER = b'\xa3\x95'
+
+DEFAULT_LENGTH = 2000
+
+# parameters set at the start of every log.  P_1 is set again at the end
+PARAMS = 20
+
+
+def messages(n=DEFAULT_LENGTH):
+    """
+    The messages of a log with n IMU samples, as a list of (name, values),
+    not counting the FMTs.
+    """
+    msgs = [('MSG', (1000, 'Test log'))]
+    for i in range(PARAMS):
+        msgs.append(('PARM', (2000 + i, 'P_{}'.format(i), float(i))))
+    t = 10000
+    for i in range(n):
+        t += 2500
+        msgs.append(('IMU', (t, i % 2, (i % 16) / 8.0, (i % 7) / 8.0,
+            -(i % 5) / 8.0, 9.75)))
+        if i % 4 == 0:
+            msgs.append(('ATT', (t + 10, (i % 200) - 100, (i % 90) - 45,
+                i % 360)))
+        if i % 40 == 0:
+            msgs.append(('GPS', (t + 20, 3, 100000 + t // 1000, 2100,
+                473977000 + i, 85455000 - i)))
+        if i % 500 == 0:
+            msgs.append(('MODE', (t + 30, (i // 500) % 5, 1)))
+    msgs.append(('PARM', (t + 40, 'P_1', 99.0)))
+    return msgs
+
+
+def counts(n=DEFAULT_LENGTH):
+    """
+    How many of each type of message a log of length n holds, FMTs included.
+    """
+    result = {'FMT': len(FORMATS)}
+    for name, values in messages(n):
+        result[name] = result.get(name, 0) + 1
+    return result
+
+
+def _field(value):
+    if isinstance(value, str):
+        return value.encode('ascii')
+    return value
+
+
+def write_bin(filename, n=DEFAULT_LENGTH):
+    write_bin_messages(filename, FORMATS, messages(n))
+
+
+def write_bin_messages(filename, formats, msgs):
+    """
+    Write a binary log of the given formats (as FORMATS) and messages (as
+    messages()).
+    """
+    out = []
+    for name, (mtype, fmt, cols, sfmt) in formats.items():
+        length = 3 + struct.calcsize('<' + sfmt)
+        out.append(HEADER + struct.pack('<BBB4s16s64s', 128, mtype, length,
+            name.encode('ascii'), fmt.encode('ascii'), cols.encode('ascii')))
+    for name, values in msgs:
+        mtype, fmt, cols, sfmt = formats[name]
+        out.append(HEADER + bytes([mtype]) +
+                struct.pack('<' + sfmt, *[_field(v) for v in values]))
+    with open(filename, 'wb') as fh:
+        fh.write(b''.join(out))
+
+
+def write_text(filename, n=DEFAULT_LENGTH):
+    lines = []
+    for name, (mtype, fmt, cols, sfmt) in FORMATS.items():
+        length = 3 + struct.calcsize('<' + sfmt)
+        lines.append('FMT, {}, {}, {}, {}, {}'.format(mtype, length, name, fmt,
+            cols))
+    for name, values in messages(n):
+        lines.append(', '.join([name] + [str(v) for v in values]))
+    with open(filename, 'w') as fh:
+        fh.write('\n'.join(lines) + '\n')
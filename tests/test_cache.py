@@ -0,0 +1,122 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import copy
+import os
+import time
+
+import batch
+import logfiles
+import src.logutils.DFReader as dfr
+import src.processor.cache as cache
+
+
+def _inputs(tmp_path):
+    filenames = []
+    for i in range(2):
+        filename = str(tmp_path / 'log{}.bin'.format(i))
+        logfiles.write_bin(filename, n=200 + 100 * i)
+        filenames.append(filename)
+    return filenames
+
+
+def _run(tmp_path, filenames, factories):
+    # every run writes a new master config, so the factories get new uuids
+    return batch.run(str(tmp_path), filenames, factories, result_cache=True,
+            result_cache_dir=str(tmp_path / 'cache'))
+
+
+def _opened(monkeypatch):
+    opened = []
+    auto = dfr.DFReader_auto
+
+    def _auto(filename, *args, **kwargs):
+        opened.append(filename)
+        return auto(filename, *args, **kwargs)
+    monkeypatch.setattr(dfr, 'DFReader_auto', _auto)
+    return opened
+
+
+def test_hits_across_sessions(tmp_path, monkeypatch):
+    filenames = _inputs(tmp_path)
+    factories = [batch.PARAM, batch.SFDC]
+    first = _run(tmp_path, filenames, factories)
+    opened = _opened(monkeypatch)
+    second = _run(tmp_path, filenames, factories)
+
+    assert opened == []
+    assert batch.coopdata(second) == batch.coopdata(first)
+    assert second.progress == first.progress
+
+
+def test_changed_settings_rerun(tmp_path, monkeypatch):
+    filenames = _inputs(tmp_path)
+    sfdc = copy.deepcopy(batch.SFDC)
+    _run(tmp_path, filenames, [batch.PARAM, sfdc])
+    opened = _opened(monkeypatch)
+    sfdc['lines'] = ['IMU.GyrY', 'ATT.Pitch']
+    coop = batch.coopdata(_run(tmp_path, filenames, [batch.PARAM, sfdc]))
+
+    # only the comparison is run again, and both are published
+    assert sorted(opened) == filenames
+    results = [val for key, val in coop.items() if key.startswith('sfdc-')]
+    assert sorted([r['lineB'] for r in results]) == [['ATT', 'Pitch']] * 2
+    assert 'params' in coop
+
+
+def test_changed_log_rerun(tmp_path, monkeypatch):
+    filenames = _inputs(tmp_path)
+    _run(tmp_path, filenames, [batch.PARAM])
+    opened = _opened(monkeypatch)
+    logfiles.write_bin(filenames[0], n=100)
+    _run(tmp_path, filenames, [batch.PARAM])
+    assert opened == filenames[:1]
+
+
+def test_deleted_output_rewritten(tmp_path, monkeypatch):
+    filenames = _inputs(tmp_path)
+    first = _run(tmp_path, filenames, [batch.PARAM])
+    param = str(tmp_path / 'log0.param')
+    os.remove(param)
+    opened = _opened(monkeypatch)
+    second = _run(tmp_path, filenames, [batch.PARAM])
+
+    assert opened == filenames[:1]
+    assert os.path.exists(param)
+    assert batch.coopdata(second) == batch.coopdata(first)
+
+
+def test_recording_data():
+    data = {'base': 1}
+    published = {}
+    recording = cache.RecordingData(data, published)
+    recording['a'] = 2
+    assert recording.setdefault('b', []) == []
+    recording.setdefault('a', 5)
+    recording.update(c=3)
+    assert recording.get('base') == 1
+    assert recording.get('missing') is None
+    assert sorted(recording) == ['a', 'b', 'base', 'c']
+    assert len(recording) == 4
+    assert published == {'a': 2, 'b': [], 'c': 3}
+    del recording['c']
+    assert 'c' not in data and 'c' not in published
+
+
+def test_prune(tmp_path):
+    results = cache.ResultCache(str(tmp_path), max_bytes=1000, max_age=3600)
+    for i in range(5):
+        results.put('key{}'.format(i), {'data': 'x' * 400})
+    old = time.time() - 7200
+    os.utime(results._path('key4', '.result'), (old, old))
+    # keep key0 from being the least recently used
+    time.sleep(0.01)
+    assert results.get('key0') is not None
+    results.prune()
+
+    kept = [key for key in ['key{}'.format(i) for i in range(5)]
+            if results.get(key) is not None]
+    assert 'key4' not in kept
+    assert 'key0' in kept
+    assert sum([os.path.getsize(results._path(key, '.result'))
+        for key in kept]) <= 1000
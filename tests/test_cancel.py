@@ -0,0 +1,133 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+import batch
+import src.logutils.DFReader as dfr
+import src.logutils.DFWriter as dfwriter
+import src.logutils.message_remover as message_remover
+import src.plugins.columnar_export as columnar_export
+import src.plugins.log_file_converter as log_file_converter
+import src.plugins.pluginbase as pluginbase
+import src.processor.cancel as cancel
+import src.processor.singlethread as singlethread
+
+
+class Canceller(pluginbase.TrashBinPlugin):
+    # stops the batch once it has seen some messages
+    def __init__(self, processor, after):
+        super().__init__(batch.FakeFactory(), processor)
+        self.after = after
+        self.seen = 0
+        self.cancelled = False
+
+    def run_message(self, message):
+        self.seen += 1
+        if self.seen == self.after:
+            self.processor.cancel.cancel()
+
+    def run_cancelled(self):
+        self.cancelled = True
+
+
+class Factory(object):
+    # hands out plugins made up front
+    def __init__(self, plugin):
+        self.plugin = plugin
+
+    def give_plugin(self, processor=None):
+        return self.plugin
+
+
+def test_token():
+    token = cancel.CancelToken()
+    token.check()
+    token.cancel()
+    assert token.cancelled
+    with pytest.raises(cancel.Cancelled):
+        token.check()
+    token.reset()
+    assert not token.cancelled
+    token.check()
+
+
+def _cancelled():
+    token = cancel.CancelToken()
+    token.cancel()
+    return token
+
+
+@pytest.mark.parametrize('cls', [dfwriter.DFWriter_text,
+        dfwriter.DFWriter_binary, dfwriter.DFWriter_csv])
+def test_writers_discard(bin_log, tmp_path, cls):
+    msgs = list(dfr.DFReader_binary(bin_log).iter_messages())
+    assert len(msgs) > dfwriter.CANCEL_CHECK_EVERY
+    out = str(tmp_path / 'out')
+    with pytest.raises(cancel.Cancelled):
+        cls(msgs, out, bufsize=1024, cancel=_cancelled())
+    assert os.listdir(str(tmp_path)) == ['small.bin']
+
+
+def test_redact_discards(bin_log, tmp_path, monkeypatch):
+    monkeypatch.setattr(message_remover, 'COPY_CHUNK', 1024)
+    log = dfr.DFReader_binary(bin_log)
+    out = str(tmp_path / 'out.bin')
+    with pytest.raises(cancel.Cancelled):
+        message_remover.redact_packet_types(log, out, set(['IMU', 'FMT']),
+                cancel=_cancelled())
+    assert not os.path.exists(out)
+
+
+def _worker(bin_log, after):
+    processor = batch.FakeProcessor(filenames=[bin_log])
+    converter = log_file_converter.LogConvPlugin(batch.FakeFactory(),
+            processor, log_file_converter.LFMT_TEXT, False)
+    canceller = Canceller(processor, after)
+    processor.factories = [Factory(converter), Factory(canceller)]
+    return processor, singlethread.Worker(processor), canceller
+
+
+def test_worker_stops(bin_log):
+    processor, worker, canceller = _worker(bin_log, 100)
+    worker.run()
+
+    assert not processor.done
+    assert canceller.cancelled
+    # stopped at the next check, not the end of the log
+    assert canceller.seen < 100 + cancel.CHECK_EVERY
+    # the converter's half-written output was thrown away
+    assert not os.path.exists(bin_log[:-4] + '.log')
+
+
+def test_worker_finishes(bin_log):
+    processor, worker, canceller = _worker(bin_log, -1)
+    worker.run()
+
+    assert processor.done
+    assert not canceller.cancelled
+    assert os.path.exists(bin_log[:-4] + '.log')
+
+
+def test_columnar_export_discards(bin_log):
+    pytest.importorskip('numpy')
+    pytest.importorskip('pyarrow')
+    processor = batch.FakeProcessor(filenames=[bin_log])
+    exporter = columnar_export.ColumnarExportPlugin(batch.FakeFactory(),
+            processor, columnar_export.CFMT_PARQUET, False, '', 100)
+    export_type = exporter.export_type
+
+    def export_type_then_cancel(name):
+        # stopped once two tables are finished
+        export_type(name)
+        if len(exporter.outputs) == 2:
+            processor.cancel.cancel()
+    exporter.export_type = export_type_then_cancel
+    processor.factories = [Factory(exporter)]
+    singlethread.Worker(processor).run()
+
+    assert not processor.done
+    assert exporter.outputs == []
+    assert os.listdir(os.path.dirname(bin_log)) == ['small.bin']
@@ -0,0 +1,83 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+
+import pytest
+
+import batch
+import logfiles
+import src.logutils.DFReader as dfr
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    # enough chunks to spread out, from a log that's quick to write
+    monkeypatch.setattr(dfr, 'CHUNK_BYTES', 16 << 10)
+    yield
+    dfr.close_chunk_pool()
+
+
+def _read(filename, types=None, workers=0):
+    log = dfr.DFReader_binary(filename, parse_workers=workers)
+    msgs = [(m.get_type(), m._timestamp, m.to_dict())
+            for m in log.iter_messages(types)]
+    return msgs, log.params, log.flightmode
+
+
+@pytest.mark.parametrize('types', [None, set(['IMU', 'GPS'])])
+def test_same_as_serial(bin_log, types):
+    serial = _read(bin_log, types)
+    assert len(dfr.DFReader_binary(bin_log)._chunk_bounds(0)) > 3
+    assert _read(bin_log, types, 2) == serial
+    assert dfr._chunk_workers is not None
+
+
+def test_pool_shared_between_logs(tmp_path):
+    first = str(tmp_path / 'first.bin')
+    second = str(tmp_path / 'second.bin')
+    logfiles.write_bin(first)
+    logfiles.write_bin(second, 3000)
+
+    assert _read(first, workers=2) == _read(first)
+    pool = dfr._chunk_workers
+    assert _read(second, workers=2) == _read(second)
+    assert dfr._chunk_workers is pool
+    # the first log's reader is swapped out in the workers for the second's
+    assert _read(first, workers=2) == _read(first)
+    assert dfr._chunk_workers is pool
+
+    dfr.close_chunk_pool()
+    assert dfr._chunk_workers is None
+
+
+def test_not_in_daemons(bin_log, monkeypatch):
+    monkeypatch.setattr(multiprocessing.current_process(), 'daemon', True,
+            raising=False)
+    assert _read(bin_log, workers=2) == _read(bin_log)
+    assert dfr._chunk_workers is None
+
+
+def test_batch(tmp_path, monkeypatch):
+    started = []
+    def pool(workers, start=dfr._chunk_pool):
+        started.append(workers)
+        return start(workers)
+    monkeypatch.setattr(dfr, '_chunk_pool', pool)
+
+    outputs = {}
+    for workers in (0, 2):
+        directory = tmp_path / 'w{}'.format(workers)
+        directory.mkdir()
+        filenames = []
+        for i in range(2):
+            filename = str(directory / 'log{}.bin'.format(i))
+            logfiles.write_bin(filename, 2000 + 500 * i)
+            filenames.append(filename)
+        batch.run(str(directory), filenames, [batch.LOGCONV_TEXT],
+                parse_workers=workers)
+        outputs[workers] = [open(f[:-4] + '.log').read() for f in filenames]
+    assert outputs[2] == outputs[0]
+    assert started == [2, 2]
+    # the batch's workers are stopped when it's done
+    assert dfr._chunk_workers is None
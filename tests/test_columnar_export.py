@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+import batch
+import logfiles
+import src.logutils.DFReader as dfr
+import src.plugins.columnar_export as columnar_export
+import src.processor.cancel as cancel
+
+pa = pytest.importorskip('pyarrow')
+import pyarrow.ipc
+import pyarrow.parquet
+
+
+def _export(filename, mode, types='', batch_rows=300, processor=None):
+    if processor is None:
+        processor = batch.FakeProcessor()
+    plugin = columnar_export.ColumnarExportPlugin(batch.FakeFactory(),
+            processor, mode, True, types, batch_rows)
+    batch.run_plugins(filename, [plugin], processor)
+    return plugin
+
+
+def _read(filename, mode):
+    if mode == columnar_export.CFMT_ARROW:
+        with pa.ipc.open_file(filename) as reader:
+            return reader.read_all()
+    return pa.parquet.read_table(filename)
+
+
+@pytest.mark.parametrize('mode', [columnar_export.CFMT_PARQUET,
+    columnar_export.CFMT_ARROW])
+def test_tables_match_messages(bin_log, mode):
+    plugin = _export(bin_log, mode)
+
+    msgs = list(dfr.DFReader_binary(bin_log).iter_messages(set(['IMU'])))
+    table = _read(plugin.type_filename('IMU'), mode)
+    assert table.num_rows == logfiles.counts()['IMU']
+    assert table.column_names == ['timestamp'] + \
+            logfiles.FORMATS['IMU'][2].split(',')
+    assert table.column('GyrY').to_pylist() == [m.GyrY for m in msgs]
+    assert table.column('timestamp').to_pylist() == \
+            pytest.approx([m._timestamp for m in msgs])
+
+    parm = _read(plugin.type_filename('PARM'), mode)
+    assert parm.column('Name').to_pylist()[:2] == ['P_0', 'P_1']
+
+
+def test_types_filter_and_text_logs(bin_log, text_log):
+    _export(bin_log, columnar_export.CFMT_PARQUET, types='GPS|ATT')
+    written = sorted(f for f in os.listdir(os.path.dirname(bin_log))
+            if f.endswith('.parquet'))
+    assert written == ['small_ATT.parquet', 'small_GPS.parquet']
+
+    # only binary logs can be read as columns
+    plugin = _export(text_log, columnar_export.CFMT_ARROW)
+    assert not os.path.exists(plugin.type_filename('IMU'))
+
+
+def test_cancelled_export_leaves_nothing(bin_log):
+    processor = batch.FakeProcessor()
+    plugin = columnar_export.ColumnarExportPlugin(batch.FakeFactory(),
+            processor, columnar_export.CFMT_PARQUET, False, '', 100)
+    plugin.run_filename(bin_log)
+    plugin.run_parsedlog(dfr.DFReader_binary(bin_log))
+    original = plugin._make_table
+
+    def cancel_after_first(fmt, cols):
+        processor.cancel.cancel()
+        return original(fmt, cols)
+
+    plugin._make_table = cancel_after_first
+    with pytest.raises(cancel.Cancelled):
+        plugin.export_type('IMU')
+    assert not os.path.exists(plugin.type_filename('IMU'))
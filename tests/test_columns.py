@@ -0,0 +1,58 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import pytest
+
+import logfiles
+import src.logutils.DFReader as dfr
+
+np = pytest.importorskip('numpy')
+
+
+def _iterated(filename, name):
+    # iter_messages carries on from where the last read stopped
+    log = dfr.DFReader_binary(filename)
+    return list(log.iter_messages(set([name])))
+
+
+def test_columns_match_messages(bin_log):
+    log = dfr.DFReader_binary(bin_log)
+    for name in ('IMU', 'ATT', 'GPS', 'PARM'):
+        msgs = _iterated(bin_log, name)
+        cols = log.get_columns(name)
+        assert len(cols) == len(msgs) == logfiles.counts()[name]
+        for col in log.formats[log.name_to_id[name]].columns:
+            values = [getattr(m, col) for m in msgs]
+            if isinstance(values[0], str):
+                values = [v.encode('ascii') for v in values]
+            assert list(cols[col]) == values, (name, col)
+
+
+def test_dict_and_slices(bin_log):
+    log = dfr.DFReader_binary(bin_log)
+    whole = log.get_columns('IMU')
+    as_dict = log.get_columns('IMU', as_dict=True)
+    part = log.get_columns('IMU', start=100, stop=250)
+
+    assert sorted(as_dict) == sorted(whole.dtype.names)
+    assert np.array_equal(as_dict['GyrX'], whole['GyrX'])
+    assert np.array_equal(part['TimeUS'], whole['TimeUS'][100:250])
+    with pytest.raises(ValueError):
+        log.get_columns('NOSUCHTYPE')
+
+
+def test_multipliers_applied(tmp_path):
+    filename = str(tmp_path / 'mult.bin')
+    formats = {
+            'FMT': logfiles.FORMATS['FMT'],
+            'POS': (140, 'QLc', 'TimeUS,Lat,Alt', 'Qih'),
+        }
+    logfiles.write_bin_messages(filename, formats,
+            [('POS', (i, 473977000 + i, 150 + i)) for i in range(10)])
+    log = dfr.DFReader_binary(filename)
+
+    cols = log.get_columns('POS')
+    msgs = _iterated(filename, 'POS')
+    assert cols['Lat'].dtype == np.float64
+    assert list(cols['Lat']) == [m.Lat for m in msgs]
+    assert list(cols['Alt']) == [m.Alt for m in msgs]
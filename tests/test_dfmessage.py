@@ -0,0 +1,120 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import array
+import pickle
+import struct
+
+import pytest
+
+import logfiles
+import src.logutils.DFReader as dfr
+
+# a format with multiplied, string and array fields
+MIXED = (136, 'QcLnaM', 'TimeUS,Roll,Lat,Nm,Arr,Mode', 'Qhi4s64sb')
+ARRAY = list(range(-16, 16))
+N = 50
+
+
+@pytest.fixture
+def mixed_log(tmp_path):
+    formats = {'FMT': logfiles.FORMATS['FMT'], 'MIX': MIXED}
+    msgs = [('MIX', (1000 + i, -1234 + i, 473977000 + i, 'AB',
+        struct.pack('<32h', *ARRAY), i % 3)) for i in range(N)]
+    filename = str(tmp_path / 'mixed.bin')
+    logfiles.write_bin_messages(filename, formats, msgs)
+    return filename
+
+
+def _read(filename, type='MIX'):
+    log = dfr.DFReader_binary(filename)
+    return log, list(log.iter_messages(set([type])))
+
+
+def test_fields(mixed_log):
+    log, msgs = _read(mixed_log)
+    assert len(msgs) == N
+    for i, m in enumerate(msgs):
+        assert m.TimeUS == 1000 + i
+        assert m.Roll == (-1234 + i) * 0.01
+        assert m.Lat == (473977000 + i) * 1.0e-7
+        assert m.Nm == 'AB'
+        assert m.Arr == array.array('h', ARRAY)
+        assert m.Mode == i % 3
+
+
+def test_decoders_agree(mixed_log):
+    log, msgs = _read(mixed_log)
+    fmt = msgs[0].fmt
+    for m in msgs:
+        fields = [getattr(m, col) for col in fmt.columns]
+        elements = m._elements
+        assert fmt.decoder(True, True)(elements) == fields
+        assert fmt.decoder(True, False)(elements) == fields
+        assert list(m.to_dict().values())[1:] == fields
+        # the raw values, without multipliers
+        raw = fmt.decoder(False, True)(elements)
+        assert raw[1] == -1234 + m.TimeUS - 1000
+
+
+def test_slots_and_classes(mixed_log):
+    log, msgs = _read(mixed_log)
+    assert not hasattr(msgs[0], '__dict__')
+    assert all(type(m) is type(msgs[0]) for m in msgs)
+    assert type(msgs[0]).__name__ == 'DFMessage_MIX'
+    with pytest.raises(AttributeError):
+        msgs[0].NotAField
+
+
+def test_compact(mixed_log):
+    log, msgs = _read(mixed_log)
+    before = [m.to_dict() for m in msgs]
+    for m in msgs:
+        m.compact()
+        assert m._raw is None
+    assert [m.to_dict() for m in msgs] == before
+
+
+def test_set_field(mixed_log):
+    log, msgs = _read(mixed_log)
+    m = msgs[5]
+    assert m.Roll == pytest.approx(-12.29)
+    m.compact()
+    m.Roll = 3.5
+    m.Nm = 'CD'
+    assert m._dirty
+    assert m.Roll == 3.5
+    assert m.Nm == 'CD'
+    # changed messages aren't dropped back to the file
+    m.compact()
+    assert m.Roll == 3.5
+    assert m.to_dict()['Roll'] == 3.5
+
+    buf = m.get_msgbuf()
+    elements = struct.unpack('<' + MIXED[3], buf[3:])
+    assert elements[1] == 350
+    assert elements[3] == b'CD\0\0'
+
+
+def test_msgbuf_round_trip(mixed_log):
+    with open(mixed_log, 'rb') as fh:
+        data = fh.read()
+    log, msgs = _read(mixed_log)
+    for m in msgs:
+        assert data[m._offset:m._offset + m.fmt.len] == m.get_msgbuf()
+
+
+def test_text_matches_binary(bin_log, text_log):
+    binary = dfr.DFReader_binary(bin_log)
+    text = dfr.DFReader_text(text_log)
+    for b, t in zip(binary.iter_messages(), text.iter_messages()):
+        assert b.get_type() == t.get_type()
+        if b.get_type() != 'FMT':
+            assert b.to_dict() == t.to_dict()
+
+
+def test_format_pickles(mixed_log):
+    log, msgs = _read(mixed_log)
+    fmt = pickle.loads(pickle.dumps(msgs[0].fmt))
+    assert fmt.decoder(True, True)(msgs[0]._elements) == \
+            [getattr(msgs[0], col) for col in fmt.columns]
@@ -0,0 +1,132 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import array
+
+import pytest
+
+import logfiles
+import src.logutils.DFReader as dfr
+import src.logutils.mavutil as mavutil
+
+
+def _clock_log(filename, kind, n=300):
+    """
+    Write a log whose clock has to be worked out the given way: 'msec'
+    (TimeMS fields), 'px4' (GPSTime and TIME), 'interp' (GPS but no
+    timestamps on anything else) or 'none'.
+    """
+    formats = {'FMT': logfiles.FORMATS['FMT'],
+            'MSG': (134, 'Z', 'Message', '64s')}
+    if kind == 'msec':
+        formats['GPS'] = (131, 'BIHI', 'Status,TimeMS,Week,T', 'BIHI')
+        formats['IMU'] = (132, 'Iff', 'TimeMS,GyrX,GyrY', 'Iff')
+    elif kind == 'interp':
+        formats['GPS'] = (131, 'BIH', 'Status,TimeMS,Week', 'BIH')
+        formats['IMU'] = (132, 'ff', 'GyrX,GyrY', 'ff')
+    elif kind == 'px4':
+        formats['GPS'] = (131, 'Q', 'GPSTime', 'Q')
+        formats['TIME'] = (133, 'Q', 'StartTime', 'Q')
+        formats['IMU'] = (132, 'ff', 'GyrX,GyrY', 'ff')
+    else:
+        formats['IMU'] = (132, 'ff', 'GyrX,GyrY', 'ff')
+
+    msgs = [('MSG', ('ArduRover V4',))]
+    t = 5000
+    for i in range(n):
+        t += 20
+        if kind == 'msec':
+            msgs.append(('IMU', (t, i / 8, 0.25)))
+            if i % 10 == 0:
+                msgs.append(('GPS', (3, 100000 + t, 2100, t + 3)))
+            continue
+        msgs.append(('IMU', (i / 8, 0.25)))
+        if kind == 'interp' and i % 10 == 0:
+            msgs.append(('GPS', (3, 100000 + t, 2100)))
+        elif kind == 'px4' and i % 10 == 0:
+            if i == 0:
+                msgs.append(('TIME', (123456789,)))
+            msgs.append(('GPS', (1600000000000000 + t * 1000,)))
+    logfiles.write_bin_messages(filename, formats, msgs)
+
+
+def _non_decreasing(values):
+    return all(a <= b for a, b in zip(values, values[1:]))
+
+
+def test_usec_clock(bin_log):
+    log = dfr.DFReader_binary(bin_log)
+    assert isinstance(log.clock, dfr.DFReaderClock_usec)
+    assert log.all_messages == []
+
+    msgs = list(log.iter_messages())
+    imu = [m for m in msgs if m.get_type() == 'IMU']
+    assert [m._timestamp for m in imu] == \
+            [log.clock.timebase + m.TimeUS * 1.0e-6 for m in imu]
+    assert _non_decreasing([m._timestamp for m in msgs])
+
+
+@pytest.mark.parametrize('kind,clock', [
+        ('msec', dfr.DFReaderClock_msec),
+        ('px4', dfr.DFReaderClock_px4),
+        ('interp', dfr.DFReaderClock_gps_interpolated),
+        ('none', dfr.DFReaderClock_gps_interpolated),
+    ])
+def test_other_clocks(tmp_path, kind, clock):
+    filename = str(tmp_path / 'clock.bin')
+    _clock_log(filename, kind)
+    log = dfr.DFReader_binary(filename)
+
+    assert type(log.clock) is clock
+    assert log.mav_type == mavutil.mavlink.MAV_TYPE_GROUND_ROVER
+    # working out the clock doesn't leave messages behind
+    assert log.all_messages == []
+    msgs = list(log.iter_messages())
+    assert len(msgs) == sum(log.counts)
+    if kind in ('msec', 'px4'):
+        # interpolated clocks step back a little at each GPS message
+        assert _non_decreasing([m._timestamp for m in msgs])
+    if kind == 'msec':
+        imu = [m for m in msgs if m.get_type() == 'IMU']
+        assert [m._timestamp for m in imu] == \
+                [log.clock.timebase + m.TimeMS * 0.001 for m in imu]
+
+
+def test_counts_and_offsets(bin_log):
+    log = dfr.DFReader_binary(bin_log)
+    counts = logfiles.counts()
+    for name, count in counts.items():
+        mtype = log.name_to_id[name]
+        assert log.counts[mtype] == count
+        assert len(log.offsets[mtype]) == count
+
+
+def _all_arrays(log):
+    return all(isinstance(o, array.array) and o.typecode == 'Q'
+            for o in log.offsets)
+
+
+@pytest.mark.parametrize('use_numpy', [True, False])
+def test_offsets_are_arrays(bin_log, monkeypatch, use_numpy):
+    if not use_numpy:
+        monkeypatch.setattr(dfr, 'np', None)
+    assert _all_arrays(dfr.DFReader_binary(bin_log))
+    # written out to the sidecar, then read back from it
+    dfr.DFReader_binary(bin_log, use_sidecar=True)
+    assert _all_arrays(dfr.DFReader_binary(bin_log, use_sidecar=True))
+
+
+def test_reads_through_offsets(bin_log):
+    log = dfr.DFReader_binary(bin_log)
+    gps = []
+    while True:
+        m = log.recv_match(type='GPS')
+        if m is None:
+            break
+        gps.append(m.TimeUS)
+    expected = [values[0] for name, values in logfiles.messages()
+            if name == 'GPS']
+    assert gps == expected
+
+    last = logfiles.messages()[-1][1][0]
+    assert log.last_timestamp() == log.clock.timebase + last * 1.0e-6
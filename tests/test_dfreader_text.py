@@ -0,0 +1,129 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import array
+
+import pytest
+
+import logfiles
+import src.logutils.DFReader as dfr
+
+
+def test_offsets_are_arrays(text_log):
+    log = dfr.DFReader_text(text_log)
+    assert all(isinstance(o, array.array) and o.typecode == 'Q'
+            for o in log.offsets.values())
+    for name, count in logfiles.counts().items():
+        assert log.counts[name] == len(log.offsets[name]) == count
+
+
+def test_reads_through_offsets(text_log):
+    log = dfr.DFReader_text(text_log)
+    gps = []
+    while True:
+        m = log.recv_match(type='GPS')
+        if m is None:
+            break
+        gps.append(m.TimeUS)
+    expected = [values[0] for name, values in logfiles.messages()
+            if name == 'GPS']
+    assert gps == expected
+
+
+def _fields(m):
+    values = []
+    for col in m.get_fieldnames():
+        try:
+            values.append(getattr(m, col))
+        except ValueError:
+            # a number that didn't parse; read as it was in the line
+            values.append(('bad', m._elements[m.fmt.colhash[col]]))
+    return (m.get_type(), m._timestamp, values)
+
+
+def _line_at_a_time(filename):
+    log = dfr.DFReader_text(filename)
+    msgs = []
+    while True:
+        m = log.recv_msg()
+        if m is None:
+            break
+        msgs.append(_fields(m))
+    return msgs, log.params, log.flightmode
+
+
+def _in_blocks(filename):
+    log = dfr.DFReader_text(filename)
+    msgs = [_fields(m) for m in log.iter_messages()]
+    return msgs, log.params, log.flightmode
+
+
+def _messy(filename, newline='\n'):
+    with open(filename) as fh:
+        lines = fh.read().splitlines()
+    middle = len(lines) // 2
+    lines[middle:middle] = [
+            'garbage',
+            '',
+            'IMU, 1',
+            'IMU, 12500, 0, 0.5, 0.25, 0.0, 9.75, 7',
+            'IMU, 12501, x, 0.5, 0.25, 0.0, 9.75',
+            'FMT, 140, 12, XTRA, Qf, TimeUS,Val',
+            'XTRA, 12502, 1.5',
+            'XTRA, 12503, 2.5',
+        ]
+    with open(filename, 'w', newline='') as fh:
+        fh.write(newline.join(lines) + newline)
+
+
+def test_blocks_match_lines(text_log):
+    expected = _line_at_a_time(text_log)
+    assert len(expected[0]) == sum(logfiles.counts().values())
+    assert _in_blocks(text_log) == expected
+
+
+@pytest.mark.parametrize('newline', ['\n', '\r\n'])
+@pytest.mark.parametrize('block', [50, 4096, dfr.TEXT_BLOCK_BYTES])
+def test_messy_blocks_match_lines(text_log, monkeypatch, newline, block):
+    _messy(text_log, newline)
+    monkeypatch.setattr(dfr, 'TEXT_BLOCK_BYTES', block)
+    expected = _line_at_a_time(text_log)
+    # the format defined mid-log is picked up
+    assert [v for name, t, v in expected[0] if name == 'XTRA'] == \
+            [[12502, 1.5], [12503, 2.5]]
+    assert _in_blocks(text_log) == expected
+
+
+def test_numbers_converted(text_log):
+    log = dfr.DFReader_text(text_log)
+    imu = next(m for m in log.iter_messages() if m.get_type() == 'IMU')
+    assert [type(e) for e in imu._elements] == [int, int, float, float,
+            float, float]
+
+
+def test_index_by_name(text_log):
+    _messy(text_log)
+    log = dfr.DFReader_text(text_log)
+    assert all(isinstance(name, str) for name in log.counts)
+    # every format is known straight after opening, even one from mid-log
+    assert 'XTRA' in log.formats
+    assert log.counts['XTRA'] == 2
+    assert log.counts['GPS'] == logfiles.counts()['GPS']
+
+
+@pytest.mark.parametrize('types', [set(['GPS']), set(['MODE', 'PARM']),
+        set(['XTRA', 'ATT']), set(['NONE'])])
+def test_typed_reads(text_log, types):
+    _messy(text_log)
+    everything = _in_blocks(text_log)[0]
+    log = dfr.DFReader_text(text_log)
+    typed = [_fields(m) for m in log.iter_messages(types)]
+    assert typed == [m for m in everything if m[0] in types]
+
+
+def test_fmt_timestamps(text_log):
+    log = dfr.DFReader_text(text_log)
+    msgs = list(log.iter_messages())
+    first = next(m._timestamp for m in msgs if m.get_type() != 'FMT')
+    assert all(m._timestamp == first for m in msgs
+            if m.get_type() == 'FMT')
@@ -0,0 +1,107 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import csv
+
+import logfiles
+import src.logutils.DFReader as dfr
+import src.logutils.DFWriter as dfwriter
+
+
+def _read(filename):
+    return list(dfr.DFReader_auto(filename).iter_messages())
+
+
+def _fields(msgs):
+    return [(m.get_type(), tuple(m._decode_all())) for m in msgs]
+
+
+def test_binary_copy_is_identical(tmp_path, bin_log):
+    out = str(tmp_path / 'copy.bin')
+    dfwriter.DFWriter_binary(_read(bin_log), out)
+
+    with open(bin_log, 'rb') as a, open(out, 'rb') as b:
+        assert a.read() == b.read()
+
+
+def test_binary_changed_messages_encoded(tmp_path, bin_log):
+    msgs = _read(bin_log)
+    for m in msgs:
+        if m.get_type() == 'PARM':
+            m.Value = m.Value + 0.5
+    out = str(tmp_path / 'changed.bin')
+    dfwriter.DFWriter_binary(msgs, out)
+
+    written = _read(out)
+    assert _fields(written) == _fields(msgs)
+    assert [m.Value for m in written if m.get_type() == 'PARM'][:2] == \
+            [0.5, 1.5]
+
+
+def test_binary_from_text(tmp_path, bin_log, text_log):
+    out = str(tmp_path / 'fromtext.bin')
+    dfwriter.DFWriter_binary(_read(text_log), out)
+
+    assert _fields(_read(out)) == _fields(_read(bin_log))
+    assert len(_read(out)) == sum(logfiles.counts().values())
+
+
+def test_text_round_trip(tmp_path, bin_log, text_log):
+    out = str(tmp_path / 'copy.log')
+    dfwriter.DFWriter_text(_read(bin_log), out, bufsize=100)
+
+    assert _fields(_read(out)) == _fields(_read(text_log))
+
+
+def test_text_written_one_at_a_time(tmp_path, bin_log):
+    out = str(tmp_path / 'streamed.log')
+    writer = dfwriter.DFWriter_text(None, out)
+    for msg in dfr.DFReader_auto(bin_log).iter_messages():
+        writer.write_message(msg)
+    writer.close_file()
+
+    assert _fields(_read(out)) == _fields(_read(bin_log))
+
+
+def _csv(filename):
+    with open(filename, newline='') as fh:
+        return list(csv.reader(fh))
+
+
+def test_csv_one_file_per_type(tmp_path, bin_log):
+    base = str(tmp_path / 'out')
+    writer = dfwriter.DFWriter_csv(_read(bin_log), base)
+
+    counts = logfiles.counts()
+    assert sorted(writer.filenames) == sorted(
+            [writer.type_filename(name) for name in counts])
+    rows = _csv(base + '_IMU.csv')
+    assert rows[0] == logfiles.FORMATS['IMU'][2].split(',')
+    assert len(rows) == counts['IMU'] + 1
+    first = [v for n, v in logfiles.messages() if n == 'IMU'][0]
+    assert [float(x) for x in rows[1]] == [float(x) for x in first]
+
+
+def test_csv_types_and_timestamps(tmp_path, bin_log):
+    base = str(tmp_path / 'out')
+    writer = dfwriter.DFWriter_csv(_read(bin_log), base,
+            types=set(['GPS']), timestamps=True)
+
+    assert writer.filenames == [base + '_GPS.csv']
+    rows = _csv(base + '_GPS.csv')
+    assert rows[0][:2] == ['timestamp', 'TimeUS']
+    assert len(rows) == logfiles.counts()['GPS'] + 1
+
+
+def test_csv_buffers_stay_small(tmp_path, bin_log, monkeypatch):
+    buffers = []
+
+    def recording_open(*args, **kwargs):
+        buffers.append(kwargs.get('buffering', -1))
+        return open(*args, **kwargs)
+
+    monkeypatch.setattr(dfwriter, 'open', recording_open, raising=False)
+    dfwriter.DFWriter_csv(_read(bin_log), str(tmp_path / 'out'))
+
+    assert len(buffers) == len(logfiles.counts())
+    assert max(buffers) <= dfwriter.CSV_TYPE_BUFSIZE
@@ -0,0 +1,81 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+import batch
+import logfiles
+import src.processor.discovery as discovery
+
+
+def _touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as fh:
+        fh.write(path)
+    return path
+
+
+def _names(paths, top):
+    return sorted(os.path.relpath(p, top) for p in paths)
+
+
+def test_include_exclude(tmp_path):
+    top = str(tmp_path)
+    for name in ('a.bin', 'b.LOG', 'c.txt', 'sub/d.bin', 'old/e.bin',
+            'sub/f_test.bin', 'sub/g.BIN'):
+        _touch(os.path.join(top, name))
+
+    found = discovery.iter_inputs([], [top])
+    assert _names(found, top) == ['a.bin', 'b.LOG', 'old/e.bin', 'sub/d.bin',
+            'sub/f_test.bin', 'sub/g.BIN']
+    found = discovery.iter_inputs([], [top], include=['*.bin'],
+            exclude=['*_test*', 'old'])
+    assert _names(found, top) == ['a.bin', 'sub/d.bin', 'sub/g.BIN']
+
+
+def test_outputs_excluded(tmp_path):
+    top = str(tmp_path)
+    for name in ('a.bin', 'a.tb.bin', 'a.tb.log', 'a.tb.tb.bin'):
+        _touch(os.path.join(top, name))
+    # whatever the config's own excludes are
+    for exclude in (None, ['nothing']):
+        found = discovery.iter_inputs([], [top], exclude=exclude)
+        assert _names(found, top) == ['a.bin']
+    # but one asked for by name is still given
+    named = os.path.join(top, 'a.tb.bin')
+    assert list(discovery.iter_inputs([named], [])) == [named]
+
+
+def test_each_file_once(tmp_path):
+    top = str(tmp_path / 'top')
+    log = _touch(os.path.join(top, 'sub', 'a.bin'))
+    os.link(log, os.path.join(top, 'hard.bin'))
+    os.symlink(log, os.path.join(top, 'soft.bin'))
+    # a loop, and the same directory reached two ways
+    os.symlink(top, os.path.join(top, 'sub', 'loop'))
+    os.symlink(os.path.join(top, 'sub'), str(tmp_path / 'other'))
+
+    found = list(discovery.iter_inputs([log, log],
+        [top, str(tmp_path / 'other'), top]))
+    assert found == [log]
+
+
+def test_unreadable(tmp_path, capsys):
+    missing = str(tmp_path / 'missing')
+    assert list(discovery.iter_inputs([missing + '.bin'], [missing])) == \
+            [missing + '.bin']
+    assert "Can't read directory" in capsys.readouterr().out
+
+
+def test_rerun_skips_outputs(tmp_path):
+    directory = str(tmp_path)
+    logfiles.write_bin(os.path.join(directory, 'a.bin'))
+    remover = dict(batch.REMOVER, outformat=1)
+    batch.run(directory, factories=[remover], directories=[directory])
+    # the remover's output would get a parameter file of its own if it was
+    # picked up this time
+    batch.run(directory, factories=[batch.PARAM], directories=[directory])
+    assert sorted(n for n in os.listdir(directory)
+            if not n.endswith('.json')) == ['a.bin', 'a.param', 'a.tb.bin']
@@ -0,0 +1,66 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import threading
+
+import src.processor.events as events
+
+
+def test_drain():
+    bus = events.EventBus()
+    bus.post_progress(3)
+    bus.post(events.EVENT_WORK_FOUND, 10)
+    bus.post_progress(4)
+    bus.post(events.EVENT_DONE)
+    assert bus.drain() == (7, [(events.EVENT_WORK_FOUND, 10),
+        (events.EVENT_DONE, None)])
+    assert bus.drain() == (0, [])
+
+    bus.post_progress(1)
+    bus.clear()
+    assert bus.drain() == (0, [])
+
+
+def test_many_posters():
+    bus = events.EventBus()
+    start = threading.Event()
+
+    def post():
+        start.wait()
+        for i in range(10000):
+            bus.post_progress(1)
+
+    threads = [threading.Thread(target=post) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    start.set()
+    total = 0
+    # drained while the posting is still going on, as the GUI would
+    while any(thread.is_alive() for thread in threads):
+        total += bus.drain()[0]
+    for thread in threads:
+        thread.join()
+    total += bus.drain()[0]
+    assert total == 40000
+
+
+def test_throttle(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(events.time, 'monotonic', lambda: now[0])
+    sunk = []
+    throttle = events.Throttle(sunk.append, interval=0.5)
+
+    throttle.add(1)
+    throttle.add(2)
+    assert sunk == []
+    now[0] += 0.5
+    throttle.add(3)
+    assert sunk == [6]
+    now[0] += 0.1
+    throttle.add(4)
+    assert sunk == [6]
+    throttle.flush()
+    assert sunk == [6, 4]
+    # nothing left, so nothing more is handed over
+    throttle.flush()
+    assert sunk == [6, 4]
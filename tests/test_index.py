@@ -0,0 +1,99 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import struct
+
+import pytest
+
+import logfiles
+import src.logutils.DFReader as dfr
+
+np = pytest.importorskip('numpy')
+
+FMTU = (129, 'QBNN', 'TimeUS,FmtType,UnitIds,MultIds', 'QB16s16s')
+
+
+def _index(filename, monkeypatch, use_numpy):
+    with monkeypatch.context() as m:
+        if not use_numpy:
+            m.setattr(dfr, 'np', None)
+        log = dfr.DFReader_binary(filename)
+    return log
+
+
+def _same_index(filename, monkeypatch):
+    fast = _index(filename, monkeypatch, True)
+    slow = _index(filename, monkeypatch, False)
+    assert fast.counts == slow.counts
+    assert [list(o) for o in fast.offsets] == [list(o) for o in slow.offsets]
+    assert fast.name_to_id == slow.name_to_id
+    assert sorted(fast.formats) == sorted(slow.formats)
+    for mtype, fmt in fast.formats.items():
+        assert fmt.len == slow.formats[mtype].len
+        assert fmt.instance_field == slow.formats[mtype].instance_field
+    return fast
+
+
+def _splice(filename, at, junk):
+    with open(filename, 'rb') as fh:
+        data = fh.read()
+    with open(filename, 'wb') as fh:
+        fh.write(data[:at] + junk + data[at:])
+
+
+def test_clean_log(bin_log, monkeypatch):
+    log = _same_index(bin_log, monkeypatch)
+    for name, count in logfiles.counts().items():
+        assert log.counts[log.name_to_id[name]] == count
+
+
+def test_numpy_used_on_clean_log(bin_log, monkeypatch):
+    log = dfr.DFReader_binary(bin_log)
+    log.offsets = [type(o)('Q') for o in log.offsets]
+    log.counts = [0] * 256
+    assert log._init_arrays_numpy()
+
+
+def test_units(tmp_path, monkeypatch):
+    filename = str(tmp_path / 'units.bin')
+    formats = dict(logfiles.FORMATS, FMTU=FMTU)
+    msgs = [('FMTU', (0, logfiles.FORMATS['IMU'][0], 's#EEEo', 'F-0000'))]
+    logfiles.write_bin_messages(filename, formats,
+            msgs + logfiles.messages())
+    log = _same_index(filename, monkeypatch)
+    assert log.formats[log.name_to_id['IMU']].instance_field == 'I'
+
+
+@pytest.mark.parametrize('junk', [
+        b'\x00' * 37,
+        # a bare header, whose type is then the next header's first byte
+        b'\xa3\x95',
+        # an IMU header, cut short
+        b'\xa3\x95\x84\x00\x00\x00',
+    ])
+def test_corrupt_middle(bin_log, monkeypatch, junk):
+    with open(bin_log, 'rb') as fh:
+        data = fh.read()
+    _splice(bin_log, data.index(logfiles.HEADER, len(data) // 2), junk)
+    _same_index(bin_log, monkeypatch)
+
+
+def test_headers_inside_messages(tmp_path, monkeypatch):
+    # GyrX of IMU packed so its bytes hold a header for the IMU type
+    fake = struct.unpack('<f', b'\x00' + logfiles.HEADER + b'\x84')[0]
+    msgs = logfiles.messages(200)
+    msgs = [(name, values[:2] + (fake,) + values[3:])
+            if name == 'IMU' and i % 3 == 0 else (name, values)
+            for i, (name, values) in enumerate(msgs)]
+    filename = str(tmp_path / 'fakes.bin')
+    logfiles.write_bin_messages(filename, logfiles.FORMATS, msgs)
+    log = _same_index(filename, monkeypatch)
+    assert log.counts[log.name_to_id['IMU']] == 200
+
+
+def test_truncated(bin_log, monkeypatch):
+    with open(bin_log, 'rb') as fh:
+        data = fh.read()
+    with open(bin_log, 'wb') as fh:
+        fh.write(data[:-7])
+    _same_index(bin_log, monkeypatch)
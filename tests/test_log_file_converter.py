@@ -0,0 +1,74 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+import batch
+import logfiles
+import src.logutils.DFReader as dfr
+import src.plugins.log_file_converter as log_file_converter
+
+
+def _types(filename):
+    counts = {}
+    for m in dfr.DFReader_auto(filename).iter_messages():
+        counts[m.get_type()] = counts.get(m.get_type(), 0) + 1
+    return counts
+
+
+class Subscriber(log_file_converter.LogConvPlugin):
+    # a plugin that only wants one type, run next to the converter
+    def __init__(self, processor):
+        super().__init__(batch.FakeFactory(), processor,
+                log_file_converter.LFMT_TEXT, False)
+        self.message_types = set(['PARM'])
+
+    def run_filename(self, filename):
+        self.outfilename = filename + '.parm.log'
+
+
+@pytest.mark.parametrize('mode,ext', [
+        (log_file_converter.LFMT_BINARY, '.bin'),
+        (log_file_converter.LFMT_TEXT, '.log'),
+    ])
+@pytest.mark.parametrize('alone', [True, False])
+def test_converts_every_message(tmp_path, mode, ext, alone):
+    # from the other kind of log, so the output has somewhere to go
+    if mode == log_file_converter.LFMT_BINARY:
+        filename = str(tmp_path / 'small.log')
+        logfiles.write_text(filename)
+    else:
+        filename = str(tmp_path / 'small.bin')
+        logfiles.write_bin(filename)
+    processor = batch.FakeProcessor()
+    plugins = [log_file_converter.LogConvPlugin(batch.FakeFactory(),
+        processor, mode, False)]
+    if not alone:
+        plugins.append(Subscriber(processor))
+    batch.run_plugins(filename, plugins, processor)
+
+    out = str(tmp_path / ('small' + ext))
+    assert _types(out) == logfiles.counts()
+    if not alone:
+        # no FMT lines, as those weren't subscribed to
+        with open(filename + '.parm.log') as fh:
+            names = [line.split(',')[0] for line in fh]
+        assert names == ['PARM'] * logfiles.counts()['PARM']
+
+
+def test_batch_text_to_binary(tmp_path, text_log):
+    batch.run(str(tmp_path), [text_log], [batch.LOGCONV_BINARY])
+
+    out = str(tmp_path / 'small.bin')
+    assert os.path.getsize(out) > 0
+    assert sum(_types(out).values()) == sum(logfiles.counts().values())
+
+
+def test_batch_csv(tmp_path, bin_log):
+    batch.run(str(tmp_path), [bin_log], [dict(batch.LOGCONV_CSV,
+        types='IMU|ATT')])
+
+    assert sorted(f for f in os.listdir(str(tmp_path))
+            if f.endswith('.csv')) == ['small_ATT.csv', 'small_IMU.csv']
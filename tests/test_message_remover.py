@@ -0,0 +1,87 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+import batch
+import logfiles
+import src.logutils.DFReader as dfr
+import src.processor.singlethread as singlethread
+import src.plugins.message_remover as message_remover
+
+REMOVED = set(['GPS', 'PARM'])
+
+
+def _remover(processor, outformat, whitelist=False, nukemode=True):
+    return message_remover.MessageRemoverPlugin(batch.FakeFactory(),
+            processor, whitelist, nukemode, 0, 'GPS|PARM', False, outformat)
+
+
+def _types(filename):
+    counts = {}
+    for m in dfr.DFReader_auto(filename).iter_messages():
+        counts[m.get_type()] = counts.get(m.get_type(), 0) + 1
+    return counts
+
+
+def _expected(keep_matching):
+    return {name: count for name, count in logfiles.counts().items()
+            if name == 'FMT' or (name in REMOVED) == keep_matching}
+
+
+@pytest.mark.parametrize('outformat', [message_remover.OUT_TEXT,
+    message_remover.OUT_BINARY])
+@pytest.mark.parametrize('log', ['bin_log', 'text_log'])
+@pytest.mark.parametrize('whitelist', [False, True])
+def test_nuke_mode(outformat, log, whitelist, request):
+    filename = request.getfixturevalue(log)
+    processor = batch.FakeProcessor()
+    plugin = _remover(processor, outformat, whitelist)
+    batch.run_plugins(filename, [plugin], processor)
+
+    assert os.path.exists(plugin.outfilename)
+    assert _types(plugin.outfilename) == _expected(whitelist)
+
+
+@pytest.mark.parametrize('log', ['bin_log', 'text_log'])
+def test_nuke_mode_streams_text_output(log, request):
+    filename = request.getfixturevalue(log)
+    processor = batch.FakeProcessor()
+    plugin = _remover(processor, message_remover.OUT_TEXT)
+    written = []
+
+    class Writer(object):
+        # stands in for DFWriter_text, to see what's passed when
+        def __init__(self, wrapped):
+            self.wrapped = wrapped
+
+        def write_message(self, message):
+            written.append(message.get_type())
+            self.wrapped.write_message(message)
+
+        def close_file(self):
+            self.wrapped.close_file()
+
+    worker = singlethread.Worker(processor)
+    worker.stage_filename(filename, [plugin])
+    dfl = dfr.DFReader_auto(filename)
+    worker.stage_parsedlog(dfl, [plugin])
+    plugin.writer = Writer(plugin.writer)
+    assert worker.stage_stream(dfl, [plugin]) == []
+
+    assert REMOVED.isdisjoint(written)
+    assert len(written) == sum(_expected(False).values())
+    assert plugin.writer is None
+
+
+def test_cancelled_stream_leaves_nothing(bin_log):
+    processor = batch.FakeProcessor()
+    plugin = _remover(processor, message_remover.OUT_TEXT)
+    plugin.run_filename(bin_log)
+    plugin.run_parsedlog(dfr.DFReader_auto(bin_log))
+    assert os.path.exists(plugin.outfilename)
+
+    plugin.run_cancelled()
+    assert not os.path.exists(plugin.outfilename)
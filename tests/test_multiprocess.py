@@ -0,0 +1,58 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+
+import batch
+import logfiles
+
+
+def _inputs(tmp_path, count=3):
+    filenames = []
+    for i in range(count):
+        filename = str(tmp_path / 'log{}.bin'.format(i))
+        logfiles.write_bin(filename, n=200 + 100 * i)
+        filenames.append(filename)
+    return filenames
+
+
+def _sfdc_results(coop):
+    # the same logs are in different directories for each run
+    results = []
+    for key, val in coop.items():
+        if key.startswith('sfdc-'):
+            results.append(dict(val,
+                filename=os.path.basename(val['filename'])))
+    return sorted(results, key=repr)
+
+
+def test_same_results_as_singlethread(tmp_path):
+    single = tmp_path / 'single'
+    multi = tmp_path / 'multi'
+    single.mkdir()
+    multi.mkdir()
+    factories = [batch.PARAM, batch.SFDC]
+
+    ex_single = batch.run(str(single), _inputs(single), factories)
+    ex_multi = batch.run(str(multi), _inputs(multi), factories,
+            processor='multiprocess', processor_workers=2)
+
+    coop_single = batch.coopdata(ex_single)
+    coop_multi = batch.coopdata(ex_multi)
+    assert coop_multi['params'] == coop_single['params']
+    assert _sfdc_results(coop_multi) == _sfdc_results(coop_single)
+    assert ex_multi.progress == ex_single.progress
+    for i in range(3):
+        assert os.path.exists(str(multi / 'log{}.param'.format(i)))
+
+
+def test_bad_log_does_not_stop_batch(tmp_path, capsys):
+    filenames = _inputs(tmp_path, 2)
+    bad = str(tmp_path / 'missing.bin')
+    ex = batch.run(str(tmp_path), [bad] + filenames, [batch.PARAM],
+            processor='multiprocess', processor_workers=2)
+
+    assert 'missing.bin failed' in capsys.readouterr().out
+    for i in range(2):
+        assert os.path.exists(str(tmp_path / 'log{}.param'.format(i)))
+    assert not ex.processor.active
@@ -0,0 +1,71 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import collections
+
+import pytest
+
+import batch
+import logfiles
+import src.logutils.DFReader as dfr
+import src.logutils.extract_params as extract_params
+import src.plugins.param_extracter as param_extracter
+import src.processor.singlethread as singlethread
+
+Parm = collections.namedtuple('Parm', ['Name', 'Value'])
+
+
+def _expected(last):
+    params = {'P_{}'.format(i): float(i) for i in range(logfiles.PARAMS)}
+    if last:
+        params['P_1'] = 99.0
+    return params
+
+
+def _plugin(processor, multivalhandle=extract_params.MULTIVAL_FIRST):
+    return param_extracter.ParamExtractPlugin(batch.FakeFactory(), processor,
+            multivalhandle, ['.*'], True, True)
+
+
+@pytest.mark.parametrize('log', ['bin_log', 'text_log'])
+def test_params_streamed_without_keeping_messages(log, request):
+    filename = request.getfixturevalue(log)
+    processor = batch.FakeProcessor()
+    plugin = _plugin(processor)
+    worker = singlethread.Worker(processor)
+    plugin.run_filename(filename)
+
+    kept = worker.stage_stream(dfr.DFReader_auto(filename), [plugin])
+
+    assert kept == []
+    assert processor.data['params'] == _expected(last=False)
+    with open(plugin.outfilename) as fh:
+        assert fh.read().splitlines()[0] == 'P_0,0.0'
+
+
+def test_duplicate_handling():
+    log = [Parm('A', 1), Parm('B', 2), Parm('A', 3)]
+
+    first = extract_params.ParamCollector(extract_params.MULTIVAL_FIRST)
+    last = extract_params.ParamCollector(extract_params.MULTIVAL_LAST)
+    for msg in log:
+        first.add(msg)
+        last.add(msg)
+    assert first.params == {'A': 1, 'B': 2}
+    assert last.params == {'A': 3, 'B': 2}
+
+    with pytest.raises(ValueError):
+        extract_params.grab_params_from_messages(log,
+                extract_params.MULTIVAL_FAIL)
+    filtered = extract_params.grab_params_from_messages(log,
+            extract_params.MULTIVAL_LAST, ['B'])
+    assert filtered == {'B': 2}
+
+
+def test_batch_writes_param_file(tmp_path, bin_log):
+    ex = batch.run(str(tmp_path), [bin_log], [dict(batch.PARAM,
+        multivalhandle=extract_params.MULTIVAL_LAST)])
+
+    assert batch.coopdata(ex)['params'] == _expected(last=True)
+    with open(str(tmp_path / 'small.param')) as fh:
+        assert len(fh.read().splitlines()) == logfiles.PARAMS
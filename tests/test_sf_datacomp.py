@@ -0,0 +1,99 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import math
+
+import pytest
+
+import batch
+import logfiles
+import src.logutils.DFReader as dfr
+import src.plugins.sf_datacomp as sf_datacomp
+import src.processor.singlethread as singlethread
+
+FLAGS = {'mindiff': True, 'maxdiff': True, 'avgdiff': True, 'stddev': True,
+        'rmsdiff': True, 'r2': True, 'avg-avg': True, 'rawdiff': True}
+
+MODE_MOSTRECENT = 0
+MODE_LININTERP = 1
+MODE_NEAREST = 2
+
+
+def _compare(filename, lineA, lineB, mode, vectorised):
+    processor = batch.FakeProcessor()
+    plugin = sf_datacomp.SFDataCompPlugin(batch.FakeFactory(), processor,
+            False, True, lineA, lineB, mode, False, dict(FLAGS))
+    plugin.batch = vectorised
+    batch.run_plugins(filename, [plugin], processor)
+    return processor.data[plugin.coop_key()]
+
+
+def _assert_same(result, expected):
+    assert result['num_points'] == expected['num_points']
+    for key, val in expected['data'].items():
+        assert result['data'][key] == pytest.approx(val, rel=1e-9,
+                abs=1e-9), key
+
+
+def test_same_packet_stats(bin_log):
+    result = _compare(bin_log, 'IMU.GyrX', 'IMU.GyrY', MODE_LININTERP, False)
+
+    diffs = [m[1][3] - m[1][2] for m in logfiles.messages()
+            if m[0] == 'IMU']
+    n = len(diffs)
+    mean = sum(diffs) / n
+    std = math.sqrt(sum([(d - mean) ** 2 for d in diffs]) / (n - 1))
+    assert result['num_points'] == n
+    assert result['data']['mindiff'] == min(diffs)
+    assert result['data']['maxdiff'] == max(diffs)
+    assert result['data']['avgdiff'] == pytest.approx(mean)
+    assert result['data']['stddev'] == pytest.approx(std)
+    assert result['data']['rawdiff'] == pytest.approx(diffs)
+
+
+@pytest.mark.parametrize('lines,mode', [
+        (('IMU.GyrX', 'IMU.GyrY'), MODE_LININTERP),
+        (('IMU.GyrX', 'ATT.Roll'), MODE_MOSTRECENT),
+        (('IMU.GyrX', 'ATT.Roll'), MODE_LININTERP),
+        (('IMU.GyrX', 'ATT.Roll'), MODE_NEAREST),
+    ])
+@pytest.mark.parametrize('log', ['bin_log', 'text_log'])
+def test_vectorised_matches_rolling(lines, mode, log, request):
+    pytest.importorskip('numpy')
+    filename = request.getfixturevalue(log)
+    rolling = _compare(filename, lines[0], lines[1], mode, False)
+    vectorised = _compare(filename, lines[0], lines[1], mode, True)
+
+    assert rolling['num_points'] > 0
+    _assert_same(vectorised, rolling)
+
+
+@pytest.mark.parametrize('log', ['bin_log', 'text_log'])
+def test_mostrecent_streams(log, request):
+    filename = request.getfixturevalue(log)
+    processor = batch.FakeProcessor()
+    plugin = sf_datacomp.SFDataCompPlugin(batch.FakeFactory(), processor,
+            False, True, 'IMU.GyrX', 'ATT.Roll', MODE_MOSTRECENT, False,
+            dict(FLAGS))
+    worker = singlethread.Worker(processor)
+    dfl = dfr.DFReader_auto(filename)
+    worker.stage_parsedlog(dfl, [plugin])
+    msgs = worker.stage_stream(dfl, [plugin])
+
+    # nothing is kept for run_messages
+    assert not plugin.random_access
+    assert msgs == []
+    diffs = []
+    gyr = roll = None
+    for name, values in logfiles.messages():
+        if name == 'IMU':
+            gyr = values[2]
+        elif name == 'ATT':
+            roll = values[1]
+        else:
+            continue
+        if gyr is not None and roll is not None:
+            diffs.append(roll - gyr)
+    result = processor.data[plugin.coop_key()]
+    assert result['num_points'] == len(diffs)
+    assert result['data']['rawdiff'] == pytest.approx(diffs)
@@ -0,0 +1,91 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import batch
+import logfiles
+import src.logutils.DFReader as dfr
+import src.plugins.pluginbase as pluginbase
+import src.processor.singlethread as singlethread
+
+
+class Streaming(pluginbase.TrashBinPlugin):
+
+    def __init__(self, processor, types):
+        super().__init__(batch.FakeFactory(), processor)
+        self.message_types = types
+        self.seen = []
+
+    def run_message(self, message):
+        self.seen.append(message.get_type())
+
+
+class RandomAccess(pluginbase.TrashBinPlugin):
+
+    random_access = True
+
+    def __init__(self, processor, types=None):
+        super().__init__(batch.FakeFactory(), processor)
+        self.message_types = types
+        self.seen = None
+
+    def run_messages(self, messages):
+        self.seen = [m.get_type() for m in messages]
+
+
+def _run(filename, plugins, processor):
+    worker = singlethread.Worker(processor)
+    msgs = worker.stage_stream(dfr.DFReader_auto(filename), plugins)
+    worker.stage_messages(msgs, plugins)
+    return msgs
+
+
+def test_subset_only_gets_its_types(bin_log):
+    processor = batch.FakeProcessor()
+    parm = Streaming(processor, set(['PARM']))
+    imu_att = Streaming(processor, set(['IMU|ATT']))
+
+    msgs = _run(bin_log, [parm, imu_att], processor)
+
+    counts = logfiles.counts()
+    assert msgs == []
+    assert parm.seen == ['PARM'] * counts['PARM']
+    assert sorted(set(imu_att.seen)) == ['ATT', 'IMU']
+    assert len(imu_att.seen) == counts['IMU'] + counts['ATT']
+
+
+def test_random_access_gets_its_types(bin_log, text_log):
+    counts = logfiles.counts()
+    total = sum(counts.values())
+    for filename in (bin_log, text_log):
+        for types, expected in ((None, total), (set(['GPS']), counts['GPS']),
+                (set(), 0)):
+            processor = batch.FakeProcessor()
+            parm = Streaming(processor, set(['PARM']))
+            listing = RandomAccess(processor, types)
+
+            msgs = _run(filename, [parm, listing], processor)
+
+            # PARM is only streamed, not kept
+            assert len(msgs) == expected, (filename, types)
+            assert len(listing.seen) == expected, (filename, types)
+            assert len(parm.seen) == counts['PARM']
+
+
+def test_random_access_types_combined(bin_log):
+    processor = batch.FakeProcessor()
+    gps = RandomAccess(processor, set(['GPS']))
+    mode = RandomAccess(processor, set(['MODE']))
+
+    _run(bin_log, [gps, mode], processor)
+
+    counts = logfiles.counts()
+    assert sorted(set(gps.seen)) == ['GPS', 'MODE']
+    assert len(gps.seen) == counts['GPS'] + counts['MODE']
+
+
+def test_no_subscribers_reads_nothing(bin_log):
+    processor = batch.FakeProcessor()
+    nothing = Streaming(processor, set(['NOSUCHTYPE']))
+
+    assert _run(bin_log, [nothing], processor) == []
+    assert nothing.seen == []
@@ -0,0 +1,102 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+import logfiles
+import src.logutils.DFReader as dfr
+import src.logutils.tbindex as tbindex
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """
+    Records whether each open found a usable sidecar.
+    """
+    results = []
+    original = tbindex.load_index
+
+    def recording(log, filename, options):
+        results.append(original(log, filename, options))
+        return results[-1]
+
+    monkeypatch.setattr(tbindex, 'load_index', recording)
+    return results
+
+
+@pytest.fixture
+def big_log(tmp_path):
+    """
+    A log with plenty in between its first and last few hundred KB.
+    """
+    filename = str(tmp_path / 'big.bin')
+    logfiles.write_bin(filename, n=20000)
+    return filename
+
+
+def _contents(log):
+    return [(m.get_type(), tuple(m._decode_all()), m._timestamp)
+            for m in log.iter_messages()]
+
+
+def test_sidecar_saved_and_reused(bin_log, loads):
+    first = dfr.DFReader_binary(bin_log, use_sidecar=True)
+    assert os.path.exists(tbindex.sidecar_path(bin_log))
+    second = dfr.DFReader_binary(bin_log, use_sidecar=True)
+
+    assert loads == [False, True]
+    assert second.counts == first.counts
+    assert [list(o) for o in second.offsets] == \
+            [list(o) for o in first.offsets]
+    assert _contents(second) == _contents(dfr.DFReader_binary(bin_log))
+
+
+def test_edit_in_the_middle_rebuilds(big_log, loads):
+    bin_log = big_log
+    dfr.DFReader_binary(bin_log, use_sidecar=True)
+    st = os.stat(bin_log)
+    # turn the middle IMU message into an ATT one, same size and time
+    with open(bin_log, 'r+b') as fh:
+        data = bytearray(fh.read())
+        log = dfr.DFReader_binary(bin_log)
+        imu = log.offsets[log.name_to_id['IMU']]
+        ofs = imu[len(imu) // 2]
+        data[ofs + 2] = logfiles.FORMATS['ATT'][0]
+        fh.seek(0)
+        fh.write(data)
+    os.utime(bin_log, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    edited = dfr.DFReader_binary(bin_log, use_sidecar=True)
+    assert loads == [False, False]
+    assert edited.counts[log.name_to_id['ATT']] == \
+            logfiles.counts(20000)['ATT'] + 1
+
+
+def test_options_and_damage_rebuild(bin_log, loads):
+    dfr.DFReader_binary(bin_log, use_sidecar=True)
+    dfr.DFReader_binary(bin_log, use_sidecar=True, zero_time_base=True)
+    with open(tbindex.sidecar_path(bin_log), 'wb') as fh:
+        fh.write(b'junk')
+    log = dfr.DFReader_binary(bin_log, use_sidecar=True)
+
+    assert loads == [False, False, False]
+    assert _contents(log) == _contents(dfr.DFReader_binary(bin_log))
+
+
+def test_file_key_covers_whole_log(big_log):
+    bin_log = big_log
+    key = tbindex.file_key(bin_log)
+    with open(bin_log, 'rb') as fh:
+        data = bytearray(fh.read())
+    data[len(data) // 2] ^= 0xff
+    st = os.stat(bin_log)
+    with open(bin_log, 'wb') as fh:
+        fh.write(data)
+    os.utime(bin_log, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    changed = tbindex.file_key(bin_log)
+    assert (changed['size'], changed['mtime_ns']) == \
+            (key['size'], key['mtime_ns'])
+    assert changed['hash'] != key['hash']
@@ -0,0 +1,80 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import random
+
+import pytest
+
+import src.logutils.timealign as timealign
+
+
+def _nearest(times, values, t):
+    # earliest of the closest samples
+    best = min(range(len(times)), key=lambda i: (abs(times[i] - t), i))
+    return values[best]
+
+
+def _interp(times, values, t):
+    if t <= times[0]:
+        return values[0]
+    if t >= times[-1]:
+        return values[-1]
+    for i in range(1, len(times)):
+        if times[i] >= t:
+            frac = (t - times[i - 1]) / (times[i] - times[i - 1])
+            return values[i - 1] + frac * (values[i] - values[i - 1])
+
+
+def _reference(tA, vA, tB, vB, at):
+    pairs = [(t, 0, a, at(tB, vB, t)) for t, a in zip(tA, vA)] + \
+            [(t, 1, at(tA, vA, t), b) for t, b in zip(tB, vB)]
+    pairs.sort(key=lambda p: (p[0], p[1]))
+    return [p[2] for p in pairs], [p[3] for p in pairs]
+
+
+def _lines(seed):
+    rnd = random.Random(seed)
+    tA = sorted(rnd.sample(range(0, 100000, 5), 300))
+    tB = sorted(rnd.sample(range(0, 100000, 10), 120))
+    vA = [rnd.uniform(-10, 10) for t in tA]
+    vB = [rnd.uniform(-10, 10) for t in tB]
+    return tA, vA, tB, vB
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def impl(request, monkeypatch):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(timealign, 'np', None)
+    return request.param
+
+
+@pytest.mark.parametrize('align,at', [
+        (timealign.align_nearest, _nearest),
+        (timealign.align_lininterp, _interp),
+    ])
+def test_matches_brute_force(impl, align, at):
+    for seed in range(5):
+        tA, vA, tB, vB = _lines(seed)
+        outA, outB = align(tA, vA, tB, vB)
+        refA, refB = _reference(tA, vA, tB, vB, at)
+        assert list(outA) == pytest.approx(refA)
+        assert list(outB) == pytest.approx(refB)
+
+
+def test_edges(impl):
+    # halfway picks the earlier sample, ties keep A first, and the ends are
+    # held
+    outA, outB = timealign.align_nearest([10, 20], [1, 2], [15, 20, 30],
+            [5, 6, 7])
+    assert list(outA) == [1, 1, 2, 2, 2]
+    assert list(outB) == [5, 5, 6, 6, 7]
+
+    outA, outB = timealign.align_lininterp([0, 10], [0, 10], [5, 20],
+            [50, 200])
+    assert list(outA) == [0, 5, 10, 10]
+    assert list(outB) == [50, 50, 100, 200]
+
+    for align in (timealign.align_nearest, timealign.align_lininterp):
+        assert [list(x) for x in align([], [], [1], [1])] == [[], []]
@@ -0,0 +1,137 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+import time
+
+import batch
+import logfiles
+import src.processor.main as main
+import src.processor.watch as watch
+
+
+def _sig(path):
+    st = os.stat(path)
+    return (st.st_size, st.st_mtime_ns)
+
+
+def _wait(condition, timeout=60):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+def test_manifest(tmp_path, bin_log):
+    filename = str(tmp_path / 'manifest.json')
+    manifest = watch.Manifest(filename)
+    sig = _sig(bin_log)
+    assert not manifest.is_done(bin_log, sig)
+    manifest.add(bin_log, sig)
+    assert manifest.is_done(bin_log, sig)
+    assert not manifest.is_done(bin_log, (sig[0] + 1, sig[1]))
+    manifest.save()
+    assert watch.Manifest(filename).is_done(bin_log, sig)
+
+
+def test_failures_retried(tmp_path, bin_log):
+    filename = str(tmp_path / 'manifest.json')
+    manifest = watch.Manifest(filename)
+    sig = _sig(bin_log)
+    manifest.add(bin_log, sig, "ValueError: bad log")
+    manifest.save()
+    assert not manifest.is_done(bin_log, sig)
+    assert not watch.Manifest(filename).is_done(bin_log, sig)
+
+
+def test_outputs(tmp_path, bin_log, text_log):
+    manifest = watch.Manifest(str(tmp_path / 'manifest.json'))
+    manifest.add_output(text_log, bin_log)
+    manifest.add_output(str(tmp_path / 'never-written.log'), bin_log)
+    assert manifest.is_done(text_log, _sig(text_log))
+    assert manifest.entries[os.path.realpath(text_log)]['source'] == bin_log
+    assert len(manifest.entries) == 1
+
+
+def test_poll_waits_to_settle(tmp_path, bin_log):
+    manifest = watch.Manifest(str(tmp_path / 'manifest.json'))
+    watcher = watch.FolderWatcher([str(tmp_path)], manifest, settle=0)
+    # first seen, then complete once it's not changed between listings
+    assert watcher.poll() == []
+    assert watcher.poll() == [(bin_log, _sig(bin_log))]
+    assert watcher.poll() == []
+    logfiles.write_bin(bin_log, n=100)
+    assert watcher.poll() == []
+    assert watcher.poll() == [(bin_log, _sig(bin_log))]
+
+
+def test_outputs_not_dispatched(tmp_path, monkeypatch):
+    # the log converter writes small.log next to small.bin, in the watched
+    # directory; it mustn't be taken for a new log
+    logs = tmp_path / 'logs'
+    logs.mkdir()
+    log = str(logs / 'small.bin')
+    logfiles.write_bin(log)
+    manifest = str(tmp_path / 'manifest.json')
+    master = batch.write_master(str(tmp_path), factories=[batch.LOGCONV_TEXT],
+            watch_manifest=manifest, watch_settle=0.2, watch_interval=0.1,
+            processor_workers=1)
+    monkeypatch.setattr(main.MainExecutor, '_start_main_operations',
+            lambda self: None)
+    executor = main.MainExecutor(master, opermode='headless-watch',
+            watchdirs=[str(logs)])
+    processor = executor.processor
+    submitted = []
+    submit = processor._submit
+
+    def _submit(filename):
+        submitted.append(filename)
+        return submit(filename)
+    processor._submit = _submit
+
+    executor.go()
+    try:
+        _wait(lambda: os.path.exists(manifest))
+        # a few more listings, long enough for small.log to have settled
+        time.sleep(1.0)
+    finally:
+        executor.stop()
+    assert submitted == [log]
+    entries = watch.Manifest(manifest).entries
+    assert entries[os.path.realpath(log)]['error'] is None
+    output = entries[os.path.realpath(str(logs / 'small.log'))]
+    assert output['source'] == log
+
+
+def test_failed_log_retried(tmp_path, monkeypatch):
+    logs = tmp_path / 'logs'
+    logs.mkdir()
+    log = str(logs / 'small.bin')
+    logfiles.write_bin(log)
+    # the message remover won't write over an earlier output, so fails
+    leftover = str(logs / 'small.tb.log')
+    open(leftover, 'w').close()
+    manifest = str(tmp_path / 'manifest.json')
+    master = batch.write_master(str(tmp_path), factories=[batch.REMOVER],
+            watch_manifest=manifest, watch_settle=0.2, watch_interval=0.1,
+            processor_workers=1)
+    monkeypatch.setattr(main.MainExecutor, '_start_main_operations',
+            lambda self: None)
+
+    def run():
+        started = time.time()
+        executor = main.MainExecutor(master, opermode='headless-watch',
+                watchdirs=[str(logs)])
+        executor.go()
+        try:
+            _wait(lambda: watch.Manifest(manifest).entries.get(
+                os.path.realpath(log), {}).get('processed', 0) > started)
+        finally:
+            executor.stop()
+        return watch.Manifest(manifest).entries[os.path.realpath(log)]
+
+    assert 'FileExistsError' in run()['error']
+    # the log itself hasn't changed, but it's done again
+    os.remove(leftover)
+    assert run()['error'] is None
+    assert os.path.exists(leftover)